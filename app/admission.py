@@ -0,0 +1,130 @@
+# app/admission.py
+from __future__ import annotations
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from app.metrics import METRICS
+
+_REJECTED = METRICS.counter(
+    "mcp_http_admission_rejections_total",
+    "Requests shed before parsing, by reason",
+    ("client", "reason"),
+)
+_IN_FLIGHT = METRICS.gauge(
+    "mcp_http_requests_in_flight", "Admitted MCP requests in progress", ("client",)
+)
+
+
+@dataclass(frozen=True)
+class TokenPolicy:
+    """
+    Limits for one bearer token. `name` labels metrics and logs (never the token itself).
+    """
+
+    name: str
+    max_concurrency: int = 8      # admitted requests in progress (0 = unlimited)
+    rate_per_sec: float = 0.0     # token-bucket refill rate (0 = unlimited)
+    burst: int = 20               # bucket capacity
+
+
+@dataclass(frozen=True)
+class Rejection:
+    status: int          # 429 (this client) or 503 (server-wide cap)
+    reason: str          # "concurrency" | "rate" | "global"
+    retry_after: int     # seconds, for the Retry-After header
+
+
+class _TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp")
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.stamp = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Consume one token; returns 0 on success or the seconds until one is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Per-token concurrency + rate limits and a global in-flight cap, checked before the
+    request body is read. Requests over a limit are rejected at once rather than queued.
+    """
+
+    def __init__(self, policies: Dict[str, TokenPolicy], *, max_in_flight: int = 0):
+        self._policies = dict(policies)
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._per_client: Dict[str, int] = {}
+        self._buckets: Dict[str, _TokenBucket] = {
+            p.name: _TokenBucket(p.rate_per_sec, p.burst)
+            for p in self._policies.values() if p.rate_per_sec > 0
+        }
+
+    def identify(self, token: str) -> Optional[TokenPolicy]:
+        return self._policies.get(token)
+
+    def admit(self, policy: TokenPolicy) -> Optional[Rejection]:
+        """
+        Reserve a slot for `policy`; None means admitted (call `release` when done).
+        """
+        name = policy.name
+        with self._lock:
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                return self._reject(name, Rejection(503, "global", 1))
+            active = self._per_client.get(name, 0)
+            if policy.max_concurrency and active >= policy.max_concurrency:
+                return self._reject(name, Rejection(429, "concurrency", 1))
+            bucket = self._buckets.get(name)
+            if bucket is not None:
+                wait = bucket.take()
+                if wait > 0:
+                    return self._reject(name, Rejection(429, "rate", max(1, math.ceil(wait))))
+            self._in_flight += 1
+            self._per_client[name] = active + 1
+        _IN_FLIGHT.inc(name)
+        return None
+
+    def release(self, policy: TokenPolicy) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._per_client[policy.name] -= 1
+        _IN_FLIGHT.dec(policy.name)
+
+    def _reject(self, name: str, rejection: Rejection) -> Rejection:
+        _REJECTED.inc(name, rejection.reason)
+        return rejection
+
+
+def build_admission(settings: Any) -> AdmissionController:
+    """
+    Policies from settings: MCP_HTTP_TOKENS (token -> {name, max_concurrency,
+    rate_per_sec, burst}) plus MCP_HTTP_BEARER_TOKEN with the default limits.
+    """
+    defaults = {
+        "max_concurrency": settings.MCP_HTTP_TOKEN_MAX_CONCURRENCY,
+        "rate_per_sec": settings.MCP_HTTP_TOKEN_RATE_PER_SEC,
+        "burst": settings.MCP_HTTP_TOKEN_BURST,
+    }
+    policies: Dict[str, TokenPolicy] = {}
+    if settings.MCP_HTTP_BEARER_TOKEN:
+        policies[settings.MCP_HTTP_BEARER_TOKEN] = TokenPolicy(name="default", **defaults)
+    for i, (token, spec) in enumerate(settings.MCP_HTTP_TOKENS.items()):
+        policies[token] = TokenPolicy(**{"name": f"token-{i}", **defaults, **spec})
+    return AdmissionController(policies, max_in_flight=settings.MCP_HTTP_MAX_IN_FLIGHT)
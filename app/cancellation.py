@@ -0,0 +1,194 @@
+# app/cancellation.py
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class CallCancelled(Exception):
+    """
+    The caller gave up (MCP notifications/cancelled, client disconnect).
+    """
+
+
+class DeadlineExceeded(CallCancelled):
+    """
+    The call ran past its deadline.
+    """
+
+
+class CancelToken:
+    """
+    Cancellation + deadline for one tool call, shared between the transport (which
+    cancels) and services (which check it at natural stopping points).
+
+    Explicit cancellation runs registered callbacks (e.g. closing an in-flight HTTP
+    response); deadlines are enforced by services capping their own timeouts with
+    `remaining()` and by `check()`.
+    """
+
+    __slots__ = ("deadline", "reason", "_lock", "_callbacks", "_event")
+
+    def __init__(self, timeout_sec: Optional[float] = None):
+        self.deadline: Optional[float] = (
+            time.monotonic() + timeout_sec if timeout_sec is not None else None
+        )
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self._event = threading.Event()
+
+    def limit(self, timeout_sec: Optional[float]) -> "CancelToken":
+        """
+        Tighten the deadline to at most `timeout_sec` from now (None/<=0 leaves it).
+        """
+        if timeout_sec is not None and timeout_sec > 0:
+            candidate = time.monotonic() + timeout_sec
+            if self.deadline is None or candidate < self.deadline:
+                self.deadline = candidate
+        return self
+
+    def child(self) -> "CancelToken":
+        """
+        Token with this deadline that is also cancelled when this one is; cancelling
+        the child (e.g. to stop sibling work after a failure) leaves this one alone.
+        """
+        token = CancelToken()
+        token.deadline = self.deadline
+        self.on_cancel(lambda: token.cancel(self.reason or "cancelled"))
+        return token
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        self._event.set()
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                pass
+
+    def on_cancel(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """
+        Run `fn` on explicit cancellation (immediately if already cancelled).
+        Returns a function that unregisters it.
+        """
+        with self._lock:
+            if self.reason is None:
+                self._callbacks.append(fn)
+                return lambda: self._discard(fn)
+        fn()
+        return lambda: None
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None or self.expired
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self) -> None:
+        if self.reason is not None:
+            raise CallCancelled(self.reason)
+        if self.expired:
+            raise DeadlineExceeded("deadline exceeded")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until cancelled, the deadline passes or `timeout` elapses; True if cancelled.
+        """
+        remaining = self.remaining()
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        self._event.wait(timeout)
+        return self.cancelled
+
+    def _discard(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+
+_CURRENT: ContextVar[Optional[CancelToken]] = ContextVar("mcp_cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    """
+    Token of the tool call running in this context (None outside dispatch).
+    """
+    return _CURRENT.get()
+
+
+def checkpoint() -> None:
+    """
+    Raise if the current call was cancelled or ran out of time; no-op otherwise.
+    """
+    token = _CURRENT.get()
+    if token is not None:
+        token.check()
+
+
+@contextmanager
+def bind(token: Optional[CancelToken]) -> Iterator[Optional[CancelToken]]:
+    reset = _CURRENT.set(token)
+    try:
+        yield token
+    finally:
+        _CURRENT.reset(reset)
+
+
+def timeout_from(meta: Any = None, header: Optional[str] = None) -> Optional[float]:
+    """
+    Client-requested timeout in seconds from `params._meta.timeoutMs` or a header
+    value in milliseconds; invalid or non-positive values are ignored.
+    """
+    candidates: List[float] = []
+    for raw in ((meta or {}).get("timeoutMs") if isinstance(meta, dict) else None, header):
+        try:
+            ms = float(raw) if raw is not None else 0.0
+        except (TypeError, ValueError):
+            continue
+        if ms > 0:
+            candidates.append(ms / 1000)
+    return min(candidates) if candidates else None
+
+
+class InFlightCalls:
+    """
+    Tokens of in-flight requests by key, so `notifications/cancelled` can find them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens: Dict[Any, CancelToken] = {}
+
+    @contextmanager
+    def track(self, key: Any, token: CancelToken) -> Iterator[CancelToken]:
+        with self._lock:
+            self._tokens[key] = token
+        try:
+            yield token
+        finally:
+            with self._lock:
+                if self._tokens.get(key) is token:
+                    del self._tokens[key]
+
+    def cancel(self, key: Any, reason: str = "cancelled") -> bool:
+        with self._lock:
+            token = self._tokens.get(key)
+        if token is None:
+            return False
+        token.cancel(reason)
+        return True
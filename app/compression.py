@@ -0,0 +1,99 @@
+# app/compression.py
+from __future__ import annotations
+
+import gzip
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.metrics import METRICS
+
+try:  # optional: pip install zstandard
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+try:  # optional: pip install brotli
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+_RESPONSES = METRICS.counter(
+    "mcp_http_compressed_responses_total", "Responses sent compressed, by encoding", ("encoding",)
+)
+_SAVED = METRICS.counter(
+    "mcp_http_compression_saved_bytes_total", "Response bytes saved by compression", ("encoding",)
+)
+
+
+@dataclass(frozen=True)
+class Codec:
+    name: str                            # Content-Encoding token
+    compress: Callable[[bytes], bytes]
+
+
+def _codecs() -> Dict[str, Codec]:
+    # Levels favour speed: responses are compressed per request on the server's CPU
+    codecs = {"gzip": Codec("gzip", lambda data: gzip.compress(data, compresslevel=5, mtime=0))}
+    if zstandard is not None:
+        codecs["zstd"] = Codec("zstd", zstandard.ZstdCompressor(level=3).compress)
+    if brotli is not None:
+        codecs["br"] = Codec("br", lambda data: brotli.compress(data, quality=4))
+    return codecs
+
+
+AVAILABLE: Dict[str, Codec] = _codecs()
+
+
+def enabled_codecs(preference: Iterable[str]) -> List[Codec]:
+    """
+    Configured encodings in server preference order, skipping ones not installed.
+    """
+    return [AVAILABLE[n] for n in (p.strip().lower() for p in preference) if n in AVAILABLE]
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def negotiate(accept_encoding: Optional[str], codecs: List[Codec]) -> Optional[Codec]:
+    """
+    Pick the codec for an Accept-Encoding header: highest q-value the client gives,
+    ties going to the server's order. None means send the body as is.
+    """
+    if not accept_encoding or not codecs:
+        return None
+    accepted = _accepted(accept_encoding)
+    best: Optional[Codec] = None
+    best_q = 0.0
+    for codec in codecs:
+        q = accepted.get(codec.name, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = codec, q
+    return best
+
+
+def compress_body(codec: Codec, body: bytes) -> Optional[bytes]:
+    """
+    Compressed body, or None when it would not be smaller (already-compressed data).
+    """
+    out = codec.compress(body)
+    if len(out) >= len(body):
+        return None
+    _RESPONSES.inc(codec.name)
+    _SAVED.inc(codec.name, amount=len(body) - len(out))
+    return out
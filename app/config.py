@@ -1,18 +1,35 @@
 # app/config.py
 from pathlib import Path
+from typing import Any, Dict
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     # Filesystem sandbox
     SANDBOX_ROOT: Path = Path("./.sandbox")
 
+    # KV backend for kv_* tools: "redis" (needs REDIS_URL) or "embedded" (in-process)
+    KV_BACKEND: str = "redis"
+    KV_EMBEDDED_SHARDS: int = 16
+    KV_EMBEDDED_MAX_BYTES: int = 64_000_000       # approximate; LRU eviction beyond it
+    KV_EMBEDDED_AOF: bool = False                 # append-only file for restart recovery
+    KV_EMBEDDED_AOF_FSYNC: str = "everysec"       # always | everysec | no
+    KV_EMBEDDED_SUBDIR: str = ".kv"               # AOF directory under SANDBOX_ROOT
+
     # Redis (optional)
     REDIS_URL: str | None = "redis://127.0.0.1:6379/0"
+    KV_NEAR_CACHE_ENABLED: bool = False
+    KV_NEAR_CACHE_MAX_ENTRIES: int = 10_000
+    KV_NEAR_CACHE_TTL_SEC: float = 60.0           # while server-side invalidation is active
+    KV_NEAR_CACHE_FALLBACK_TTL_SEC: float = 1.0   # when it is not (bounds staleness)
+    KV_NEAR_CACHE_INVALIDATION: str = "tracking"  # tracking | keyspace | ttl
+    KV_NEAR_CACHE_PREFIXES: str = ""              # comma-separated tracking prefixes
 
     # HTTP safety
     HTTP_ALLOWLIST: str = "example.com, api.github.com"
     HTTP_TIMEOUT_SEC: float = 10.0
     HTTP_MAX_BYTES: int = 2_000_000
+    HTTP_MAX_CONNECTIONS: int = 20        # pooled outbound connections
+    HTTP_DNS_CACHE_TTL_SEC: float = 0.0   # opt-in SSRF-guard DNS verdict cache (0 = off)
 
     
     # HTTP MCP transport
@@ -26,13 +43,64 @@ class Settings(BaseSettings):
     MCP_HTTP_ALLOWED_ORIGINS: str = "http://localhost, http://127.0.0.1"
     MCP_HTTP_ALLOW_NO_ORIGIN: bool = True            # allow non-browser clients
 
+    # Admission control (checked before the request body is read)
+    # Extra tokens as JSON: {"<token>": {"name": "agent-a", "max_concurrency": 4,
+    #                                    "rate_per_sec": 10, "burst": 20}}
+    MCP_HTTP_TOKENS: Dict[str, Dict[str, Any]] = {}
+    MCP_HTTP_TOKEN_MAX_CONCURRENCY: int = 8          # per token, unless overridden
+    MCP_HTTP_TOKEN_RATE_PER_SEC: float = 0.0         # per token (0 = unlimited)
+    MCP_HTTP_TOKEN_BURST: int = 20
+    MCP_HTTP_MAX_IN_FLIGHT: int = 64                 # all tokens together (0 = unlimited)
+
+    # Deadlines: clients send a timeout in ms via this header or params._meta.timeoutMs
+    MCP_HTTP_TIMEOUT_HEADER: str = "X-Request-Timeout-Ms"
+    MCP_HTTP_DISCONNECT_POLL_SEC: float = 0.1        # how often to check for a hung-up client
+
+    # Request size and response compression
+    MCP_HTTP_MAX_REQUEST_BYTES: int = 8_000_000      # enforced while the body streams in
+    MCP_HTTP_COMPRESSION: str = "zstd, br, gzip"     # preference order; "" = off
+    MCP_HTTP_COMPRESS_MIN_BYTES: int = 1024          # smaller responses go out as is
+
+    # stdio transport: process requests concurrently, reply out of order
+    MCP_STDIO_CONCURRENT: bool = False
+    MCP_STDIO_MAX_CONCURRENCY: int = 8               # max tool calls in flight
+
     # Logging
     LOG_LEVEL: str = "INFO"
 
+    # Metrics (Prometheus text format)
+    METRICS_ENABLED: bool = True
+    METRICS_PATH: str = "/metrics"
+    METRICS_REQUIRE_AUTH: bool = True      # scrape with the Bearer token
+    METRICS_MULTIPROC_DIR: Path | None = None  # shared dir to aggregate uvicorn workers
+    METRICS_FLUSH_INTERVAL_SEC: float = 5.0
+
+    # Profiling (off by default); kept profiles are written as artifacts
+    PROFILE_SAMPLE_RATE: float = 0.0       # fraction of tool calls to profile (0..1)
+    PROFILE_SLOW_MS: float = 0.0           # also keep any call slower than this (0 disables)
+    PROFILE_CPROFILE: bool = False         # attach a cProfile snapshot to sampled calls
+    PROFILE_ARTIFACT_TAG: str = "profile:tool_call"
+
+    # Idempotent tools (fs_read, http_fetch GET, json_validate, artifact_list)
+    TOOL_SINGLE_FLIGHT: bool = True          # collapse concurrent identical calls
+    TOOL_CACHE_MAX_BYTES: int = 32_000_000   # memoized results (0 disables memoization)
+    # Per-tool memo TTL in seconds, JSON in env, e.g. {"json_validate": 300, "fs_read": 5}
+    TOOL_CACHE_TTL_SEC: Dict[str, float] = {"json_validate": 300.0}
+    # Per-tool server-side timeout in seconds, JSON in env, e.g. {"http_fetch": 15}
+    TOOL_TIMEOUT_SEC: Dict[str, float] = {}
+    PIPELINE_MAX_PARALLEL: int = 4           # concurrent steps within one tool_pipeline call
+
     
     # Artifacts (append-only audit)
     ARTIFACTS_SUBDIR: str = "artifacts"   # under SANDBOX_ROOT
     ARTIFACT_MAX_BYTES: int = 10_000_000  # rotate when file exceeds this size
+    ARTIFACT_BLOB_MIN_BYTES: int = 65_536   # larger contents go to the blob store (0 = inline all)
+    ARTIFACT_BLOB_COMPRESS: bool = True     # gzip blobs
+    # Retention per tag (0 disables a rule), enforced by a background compaction job
+    ARTIFACT_RETENTION_DAYS: float = 0.0
+    ARTIFACT_RETENTION_MAX_BYTES_PER_TAG: int = 0
+    ARTIFACT_RETENTION_MAX_RECORDS_PER_TAG: int = 0
+    ARTIFACT_COMPACT_INTERVAL_SEC: float = 3600.0
 
     class Config:
         env_file = ".env"
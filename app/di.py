@@ -3,9 +3,11 @@ from dataclasses import dataclass
 from app.config import Settings
 from app.services.filesystem import FileSystemService
 from app.services.kvstore import KvService
+from app.services.kvembedded import EmbeddedKvBackend
+from app.services.nearcache import NearCacheConfig
 from app.services.httpclient import SafeHttpService
 from app.services.validator import JsonValidatorService
-from app.services.artifacts import ArtifactService
+from app.services.artifacts import ArtifactService, RetentionPolicy
 
 @dataclass
 class Container:
@@ -20,17 +22,47 @@ def build_container() -> Container:
     s = Settings()
     fs = FileSystemService(s.SANDBOX_ROOT)
 
-    kv = KvService(s.REDIS_URL) if s.REDIS_URL else None
+    kv = None
+    if s.KV_BACKEND.strip().lower() == "embedded":
+        aof = None
+        if s.KV_EMBEDDED_AOF:
+            aof = s.SANDBOX_ROOT / s.KV_EMBEDDED_SUBDIR / "appendonly.aof"
+        kv = KvService(backend=EmbeddedKvBackend(
+            shards=s.KV_EMBEDDED_SHARDS,
+            max_bytes=s.KV_EMBEDDED_MAX_BYTES,
+            aof_path=aof,
+            aof_fsync=s.KV_EMBEDDED_AOF_FSYNC.strip().lower(),
+        ))
+    elif s.REDIS_URL:
+        near = None
+        if s.KV_NEAR_CACHE_ENABLED:
+            near = NearCacheConfig(
+                max_entries=s.KV_NEAR_CACHE_MAX_ENTRIES,
+                ttl_sec=s.KV_NEAR_CACHE_TTL_SEC,
+                fallback_ttl_sec=s.KV_NEAR_CACHE_FALLBACK_TTL_SEC,
+                invalidation=s.KV_NEAR_CACHE_INVALIDATION.strip().lower(),
+                prefixes=tuple(p.strip() for p in s.KV_NEAR_CACHE_PREFIXES.split(",") if p.strip()),
+            )
+        kv = KvService(s.REDIS_URL, near_cache=near)
 
     allow = {d.strip().lower() for d in s.HTTP_ALLOWLIST.split(",") if d.strip()}
     http = SafeHttpService(allowlist_domains=allow, timeout_sec=s.HTTP_TIMEOUT_SEC, 
-                           max_bytes=s.HTTP_MAX_BYTES)
+                           max_bytes=s.HTTP_MAX_BYTES, max_connections=s.HTTP_MAX_CONNECTIONS,
+                           dns_cache_ttl_sec=s.HTTP_DNS_CACHE_TTL_SEC)
 
     validator = JsonValidatorService()
     artifact = ArtifactService(
         sandbox_root=s.SANDBOX_ROOT,
         subdir_name=s.ARTIFACTS_SUBDIR,
         max_bytes=s.ARTIFACT_MAX_BYTES,
+        blob_min_bytes=s.ARTIFACT_BLOB_MIN_BYTES,
+        blob_compress=s.ARTIFACT_BLOB_COMPRESS,
+        retention=RetentionPolicy(
+            max_age_days=s.ARTIFACT_RETENTION_DAYS,
+            max_bytes_per_tag=s.ARTIFACT_RETENTION_MAX_BYTES_PER_TAG,
+            max_records_per_tag=s.ARTIFACT_RETENTION_MAX_RECORDS_PER_TAG,
+        ),
+        compact_interval_sec=s.ARTIFACT_COMPACT_INTERVAL_SEC,
     )
 
     return Container(s, fs, kv, http, validator, artifact)
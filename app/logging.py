@@ -5,7 +5,9 @@ import os
 import re
 from typing import Any, Dict
 
-PII_RE = re.compile(r"([\w\.-]+)@([\w\.-]+)")  # naive email redaction
+# Naive email redaction; the lookbehind starts matches only at the start of a word run,
+# so long runs without "@" are scanned once instead of once per character
+PII_RE = re.compile(r"(?<![\w\.-])([\w\.-]+)@([\w\.-]+)")
 
 
 def configure_logging():
@@ -16,6 +18,8 @@ def configure_logging():
 
 
 def redact_str(s: str) -> str:
+    if "@" not in s:
+        return s
     return PII_RE.sub("[redacted-email]", s)
 
 
@@ -27,5 +31,18 @@ def redact_args(args: Dict[str, Any]) -> Dict[str, Any]:
     return safe
 
 
-def log_tool_call(logger: logging.Logger, name: str, args: Dict[str, Any]):
-    logger.info("tool_call %s %s", name, redact_args(args))
+def log_tool_call(
+    logger: logging.Logger,
+    name: str,
+    args: Dict[str, Any],
+    *,
+    duration_ms: float | None = None,
+    outcome: str = "ok",
+    level: int = logging.INFO,
+):
+    if duration_ms is None:
+        logger.log(level, "tool_call %s %s", name, redact_args(args))
+    else:
+        logger.log(
+            level, "tool_call %s %s %.1fms %s", name, outcome, duration_ms, redact_args(args)
+        )
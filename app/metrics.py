@@ -0,0 +1,278 @@
+# app/metrics.py
+from __future__ import annotations
+
+import json
+import os
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) and payload-size buckets (bytes)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1_024, 4_096, 16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, Any] = {}
+
+    def _key(self, labels: Sequence[Any]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(v) for v in labels)
+
+    def samples(self) -> List[List[Any]]:
+        with self._lock:
+            return [[list(k), _copy(v)] for k, v in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels: Any, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: Any, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels: Any, value: float) -> None:
+        key = self._key(labels)
+        # Per-bucket (non-cumulative) counts; the last slot is +Inf
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self._values[key] = state
+            state["buckets"][idx] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+
+class MetricsRegistry:
+    """
+    Process-local metrics with Prometheus text exposition.
+
+    Recording is a dict update under a per-metric lock (no I/O). For multi-worker
+    deployments (uvicorn --workers N), each process periodically writes a JSON snapshot
+    into a shared directory and `render()` merges every snapshot, so any worker can
+    answer a scrape with totals for the whole server.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._multiproc_dir: Optional[Path] = None
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+
+    # ---------- Declaration ----------
+
+    def counter(self, name: str, help_: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_, labelnames))
+
+    def gauge(self, name: str, help_: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_, labelnames))
+
+    def histogram(self, name: str, help_: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Idempotent: modules may be imported (and declare metrics) more than once
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    # ---------- Snapshots & multi-process aggregation ----------
+
+    def snapshot(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            entry: Dict[str, Any] = {
+                "type": m.kind,
+                "help": m.help,
+                "labelnames": list(m.labelnames),
+                "samples": m.samples(),
+            }
+            if isinstance(m, Histogram):
+                entry["buckets"] = list(m.buckets)
+            out[m.name] = entry
+        return out
+
+    def enable_multiprocess(self, directory: Path, flush_interval_sec: float = 5.0) -> None:
+        """
+        Share this process's metrics through `directory` (one file per pid).
+        A daemon thread rewrites the snapshot every `flush_interval_sec`.
+        """
+        self._multiproc_dir = Path(directory)
+        self._multiproc_dir.mkdir(parents=True, exist_ok=True)
+        self.flush()
+        if self._flusher is None and flush_interval_sec > 0:
+            def loop():
+                while not self._stop.wait(flush_interval_sec):
+                    self.flush()
+            self._flusher = threading.Thread(target=loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    def flush(self) -> None:
+        if self._multiproc_dir is None:
+            return
+        path = self._multiproc_dir / f"metrics-{os.getpid()}.json"
+        tmp = path.with_suffix(".tmp")
+        body = json.dumps({"pid": os.getpid(), "metrics": self.snapshot()})
+        with self._flush_lock:
+            tmp.write_text(body, encoding="utf-8")
+            os.replace(tmp, path)
+
+    def collect(self) -> Dict[str, Any]:
+        """
+        Metrics for this process, merged with the other workers' snapshots when enabled.
+        Counters and histograms are summed across all files (including exited workers);
+        gauges only across live processes.
+        """
+        if self._multiproc_dir is None:
+            return self.snapshot()
+        self.flush()
+        snapshots: List[Tuple[bool, Dict[str, Any]]] = []
+        for fp in self._multiproc_dir.glob("metrics-*.json"):
+            try:
+                data = json.loads(fp.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            snapshots.append((_pid_alive(int(data.get("pid", 0))), data.get("metrics", {})))
+        return _merge(snapshots)
+
+    # ---------- Exposition ----------
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        lines: List[str] = []
+        for name, entry in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {entry['help']}")
+            lines.append(f"# TYPE {name} {entry['type']}")
+            labelnames = entry["labelnames"]
+            for labels, value in entry["samples"]:
+                pairs = list(zip(labelnames, labels))
+                if entry["type"] == "histogram":
+                    cumulative = 0
+                    bounds = [*(_fmt(b) for b in entry["buckets"]), "+Inf"]
+                    for bound, n in zip(bounds, value["buckets"]):
+                        cumulative += n
+                        bucket = _labels(pairs + [("le", bound)])
+                        lines.append(f"{name}_bucket{bucket} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(pairs)} {_fmt(value['sum'])}")
+                    lines.append(f"{name}_count{_labels(pairs)} {value['count']}")
+                else:
+                    lines.append(f"{name}{_labels(pairs)} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _copy(v: Any) -> Any:
+    if isinstance(v, dict):
+        return {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]}
+    return v
+
+
+def _merge(snapshots: Iterable[Tuple[bool, Dict[str, Any]]]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {}
+    for alive, metrics in snapshots:
+        for name, entry in metrics.items():
+            if entry["type"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**entry, "samples": {}})
+            acc: Dict[LabelValues, Any] = target["samples"]
+            for labels, value in entry["samples"]:
+                key = tuple(labels)
+                if entry["type"] == "histogram":
+                    cur = acc.get(key)
+                    if cur is None:
+                        acc[key] = _copy(value)
+                    else:
+                        cur["buckets"] = [a + b for a, b in zip(cur["buckets"], value["buckets"])]
+                        cur["sum"] += value["sum"]
+                        cur["count"] += value["count"]
+                else:
+                    acc[key] = acc.get(key, 0.0) + value
+    for entry in merged.values():
+        entry["samples"] = [[list(k), v] for k, v in entry["samples"].items()]
+    return merged
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if pid == os.getpid() or os.name == "nt":
+        # os.kill(pid, 0) is not a liveness probe on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but owned by someone else (or unsupported platform): assume alive
+        return True
+    return True
+
+
+def _labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v: float) -> str:
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+# Process-wide default registry used by services and transports
+METRICS = MetricsRegistry()
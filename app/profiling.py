@@ -0,0 +1,124 @@
+# app/profiling.py
+from __future__ import annotations
+
+import cProfile
+import io
+import logging
+import pstats
+import random
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("mcp.profiling")
+
+
+class CallProfile:
+    """
+    Phase timings for one tool call (parse, validate, handler, serialize).
+    Transports and dispatch add phases; the profiler decides whether to keep it.
+    """
+
+    __slots__ = ("tool", "sampled", "outcome", "phases", "_start", "_cprofile")
+
+    def __init__(self, tool: str, *, sampled: bool, cprofile: bool):
+        self.tool = tool
+        self.sampled = sampled
+        self.outcome = "ok"
+        self.phases: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._cprofile: Optional[cProfile.Profile] = cProfile.Profile() if cprofile else None
+
+    def mark(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def start_cprofile(self) -> None:
+        if self._cprofile is not None:
+            try:
+                self._cprofile.enable()
+            except ValueError:
+                # Another profiler is active on this thread; keep the phase timings only
+                self._cprofile = None
+
+    def stop_cprofile(self) -> None:
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def cprofile_report(self, limit: int = 25) -> Optional[str]:
+        if self._cprofile is None:
+            return None
+        buf = io.StringIO()
+        pstats.Stats(self._cprofile, stream=buf).sort_stats("cumulative").print_stats(limit)
+        return buf.getvalue()
+
+
+class RequestProfiler:
+    """
+    Opt-in profiling of tool calls.
+
+    A call is profiled when it is sampled (PROFILE_SAMPLE_RATE) or when it exceeds
+    PROFILE_SLOW_MS; kept profiles are written as artifact records under a dedicated
+    tag. Sampled calls can also capture a cProfile snapshot of validation + handler.
+    Disabled (the default), `begin()` returns None and callers skip all bookkeeping.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.slow_ms = 0.0
+        self.capture_cprofile = False
+        self.tag = "profile:tool_call"
+        self._artifacts: Any = None
+
+    def configure(
+        self,
+        artifact_service: Any,
+        *,
+        sample_rate: float = 0.0,
+        slow_ms: float = 0.0,
+        capture_cprofile: bool = False,
+        tag: str = "profile:tool_call",
+    ) -> None:
+        self._artifacts = artifact_service
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.slow_ms = max(0.0, slow_ms)
+        self.capture_cprofile = capture_cprofile
+        self.tag = tag
+        self.enabled = artifact_service is not None and (self.sample_rate > 0 or self.slow_ms > 0)
+
+    def begin(self, tool: str) -> Optional[CallProfile]:
+        if not self.enabled:
+            return None
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled and self.slow_ms <= 0:
+            return None
+        return CallProfile(tool, sampled=sampled, cprofile=sampled and self.capture_cprofile)
+
+    def finish(self, profile: Optional[CallProfile]) -> None:
+        if profile is None:
+            return
+        total_ms = profile.elapsed_ms()
+        slow = self.slow_ms > 0 and total_ms >= self.slow_ms
+        if not (profile.sampled or slow):
+            return
+        content: Dict[str, Any] = {
+            "tool": profile.tool,
+            "outcome": profile.outcome,
+            "reason": "slow" if slow else "sampled",
+            "total_ms": round(total_ms, 3),
+            "phases_ms": {k: round(v * 1000, 3) for k, v in profile.phases.items()},
+        }
+        report = profile.cprofile_report()
+        if report is not None:
+            content["cprofile"] = report
+        try:
+            self._artifacts.append(self.tag, content, tool=profile.tool)
+        except Exception:
+            # Profiling must never fail the call it observed
+            logger.exception("failed to write profile artifact for %s", profile.tool)
+
+
+# Process-wide profiler; configured when the tool registry is built
+PROFILER = RequestProfiler()
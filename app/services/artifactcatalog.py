@@ -0,0 +1,375 @@
+# app/services/artifactcatalog.py
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+MANIFEST_NAME = "_catalog.json"
+_MONTH_DIR = re.compile(r"^\d{4}-\d{2}$")
+_SEGMENT_FILE = re.compile(r"^(?P<tag>.+)-(?P<index>\d{4,})\.ndjson$")
+# A directory mtime this recent may hide a change made in the same timestamp tick
+# (coarse filesystem clocks), so it is not trusted until it is older
+_RACY_NS = 2_000_000_000
+
+
+def _mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class FileLock:
+    """
+    Advisory lock on a sidecar file, shared by every process using the directory.
+    Each instance has its own handle, so two instances exclude each other like two
+    processes do; callers serialize their own threads (ArtifactCatalog.lock).
+    Windows has no shared mode, so `shared` is exclusive there.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fh = open(path, "a+b")
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        with self._held(fcntl.LOCK_SH if fcntl is not None else None):
+            yield
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        with self._held(fcntl.LOCK_EX if fcntl is not None else None):
+            yield
+
+    def try_exclusive(self) -> bool:
+        """
+        Take the lock exclusively without waiting; False if another holder has it.
+        Release with `release`.
+        """
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:  # pragma: no cover - Windows
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def release(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        else:  # pragma: no cover - Windows
+            self._fh.seek(0)
+            msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+    @contextmanager
+    def _held(self, mode: Optional[int]) -> Iterator[None]:
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), mode)
+        else:  # pragma: no cover - Windows (LK_LOCK retries for about 10 s, then raises)
+            self._fh.seek(0)
+            msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+@dataclass
+class Segment:
+    """
+    One NDJSON file of a tag: <month>/<tag>-NNNN.ndjson.
+    """
+
+    month: str
+    file: str
+    records: int = 0
+    bytes: int = 0
+    min_ts: Optional[str] = None
+    max_ts: Optional[str] = None
+    blobs: List[str] = field(default_factory=list)  # blob hashes its records reference
+
+    @property
+    def index(self) -> int:
+        return int(self.file.rsplit("-", 1)[1].split(".", 1)[0])
+
+    def note(self, nbytes: int, ts: str, blob: Optional[str] = None) -> None:
+        self.records += 1
+        self.bytes += nbytes
+        if self.min_ts is None or ts < self.min_ts:
+            self.min_ts = ts
+        if self.max_ts is None or ts > self.max_ts:
+            self.max_ts = ts
+        if blob is not None and blob not in self.blobs:
+            self.blobs.append(blob)
+
+
+def scan_segment(month: str, path: Path) -> Segment:
+    """
+    Rebuild a segment's catalog entry from its file (used when no manifest covers it).
+    """
+    with open(path, "rb") as f:
+        return segment_from_lines(month, path.name, f)
+
+
+def segment_from_lines(month: str, name: str, lines: Iterable[bytes]) -> Segment:
+    seg = Segment(month=month, file=name)
+    for raw in lines:
+        try:
+            rec = json.loads(raw)
+        except ValueError:
+            seg.bytes += len(raw)  # torn line: count its bytes, not a record
+            continue
+        blob = rec.get("content_blob") or {}
+        seg.note(len(raw), rec.get("ts") or "", blob.get("sha256"))
+    return seg
+
+
+class ArtifactCatalog:
+    """
+    Which segments exist per tag, with record counts, sizes, timestamp range and blob
+    references, persisted as one manifest per month (<month>/_catalog.json).
+
+    The catalog is loaded (and reconciled against the files) once, then kept in memory:
+    listing walks a tag's segments newest-first and opens only those it needs.
+    Manifests are rewritten when a segment is created or compacted, and by `flush` for
+    counts of segments still being appended to; a stale manifest is corrected on load
+    by re-scanning the segments whose size no longer matches.
+
+    Other processes (uvicorn workers, a stdio and an HTTP server on one sandbox) can
+    create segments too: `refresh` stats the base and month directories and re-lists
+    any whose mtime changed, so their segments show up without a reload. Segment
+    writes hold `file_lock` (.lock): shared to append, exclusive to rewrite or delete,
+    so a compaction in one process never drops lines another process just appended.
+    """
+
+    def __init__(self, base: Path):
+        self.base = base
+        self.lock = threading.RLock()
+        self.file_lock = FileLock(base / ".lock")
+        self._tags: Dict[str, List[Segment]] = {}  # tag -> segments, oldest first
+        self._dirty: set = set()                   # months whose manifest is behind
+        self._seen: Dict[str, Optional[int]] = {}  # month ("" = base) -> synced dir mtime
+        self._files: Dict[str, set] = {}           # month -> segment file names known
+        self.load()
+
+    # ---------- Queries ----------
+
+    def segments(self, tag: str, *, since_month: str = "") -> List[Segment]:
+        with self.lock:
+            return [s for s in self._tags.get(tag, ()) if s.month >= since_month]
+
+    def tags(self) -> List[str]:
+        with self.lock:
+            return list(self._tags)
+
+    def blobs(self) -> set:
+        with self.lock:
+            return {b for segs in self._tags.values() for s in segs for b in s.blobs}
+
+    def path(self, seg: Segment) -> Path:
+        return self.base / seg.month / seg.file
+
+    def refresh(self, *, since_month: str = "") -> None:
+        """
+        Pick up segments created or removed by other processes in months >= since_month
+        (one stat per month while nothing changed).
+        """
+        with self.lock:
+            mtime = _mtime_ns(self.base)
+            if mtime != self._seen.get(""):
+                months = {d.name for d in self._iter_dirs() if _MONTH_DIR.match(d.name)}
+                for month in set(self._seen) - months - {""}:
+                    self._sync_month(month, None)  # month directory removed
+                for month in months - set(self._seen):
+                    self._seen[month] = None
+                self._mark_seen("", mtime)
+            for month in [m for m in self._seen if m and m >= since_month]:
+                mtime = _mtime_ns(self.base / month)
+                if mtime is None or mtime != self._seen[month]:
+                    self._sync_month(month, mtime)
+
+    def _sync_month(self, month: str, mtime: Optional[int]) -> None:
+        """
+        Match a month's segments to the files in its directory (mtime taken beforehand).
+        Segments already known keep their entries: listing reads their files anyway.
+        """
+        on_disk: Dict[str, str] = {}
+        if mtime is not None:
+            try:
+                for entry in os.scandir(self.base / month):
+                    m = _SEGMENT_FILE.match(entry.name)
+                    if m is not None:
+                        on_disk[entry.name] = m.group("tag")
+            except FileNotFoundError:
+                mtime = None
+        known = self._files.get(month, set())
+        files = set(known)
+        for name in known - on_disk.keys():
+            files.discard(name)
+            tag = _SEGMENT_FILE.match(name).group("tag")
+            kept = [s for s in self._tags.get(tag, ()) if not (s.month == month and s.file == name)]
+            if kept:
+                self._tags[tag] = kept
+            else:
+                self._tags.pop(tag, None)
+        for name in on_disk.keys() - known:
+            try:
+                seg = scan_segment(month, self.base / month / name)
+            except FileNotFoundError:
+                continue
+            segs = self._tags.setdefault(on_disk[name], [])
+            segs.append(seg)
+            segs.sort(key=lambda s: (s.month, s.index))
+            files.add(name)
+        if files:
+            self._files[month] = files
+        else:
+            self._files.pop(month, None)
+        if mtime is None:
+            self._seen.pop(month, None)
+        else:
+            self._mark_seen(month, mtime)
+
+    def _mark_seen(self, month: str, mtime: Optional[int]) -> None:
+        # Leave a too-recent mtime unrecorded so the next refresh looks again
+        if mtime is not None and time.time_ns() - mtime < _RACY_NS:
+            mtime = None
+        self._seen[month] = mtime
+
+    # ---------- Updates (caller holds `lock`) ----------
+
+    def current(self, tag: str, month: str, max_bytes: int) -> Segment:
+        """
+        Segment to append to for `tag` this month, rotating once it reaches max_bytes.
+        """
+        segs = self._tags.setdefault(tag, [])
+        last = segs[-1] if segs and segs[-1].month == month else None
+        if last is not None and last.bytes < max_bytes:
+            return last
+        index = last.index + 1 if last is not None else 1
+        seg = Segment(month=month, file=f"{tag}-{index:04d}.ndjson")
+        segs.append(seg)
+        self._files.setdefault(month, set()).add(seg.file)
+        (self.base / month).mkdir(parents=True, exist_ok=True)
+        self.save(month)
+        return seg
+
+    def appended(self, seg: Segment, nbytes: int, ts: str, blob: Optional[str]) -> None:
+        seg.note(nbytes, ts, blob)
+        self._dirty.add(seg.month)
+
+    def replace(self, tag: str, old: Segment, new: Optional[Segment]) -> None:
+        segs = self._tags.get(tag, [])
+        i = segs.index(old)
+        if new is None:
+            del segs[i]
+            if not segs:
+                del self._tags[tag]
+            self._files.get(old.month, set()).discard(old.file)
+        else:
+            segs[i] = new
+        self.save(old.month)
+
+    # ---------- Persistence ----------
+
+    def flush(self) -> None:
+        with self.lock:
+            for month in sorted(self._dirty):
+                self.save(month)
+
+    def save(self, month: str) -> None:
+        month_dir = self.base / month
+        entries = {
+            tag: [asdict(s) for s in segs if s.month == month]
+            for tag, segs in self._tags.items()
+        }
+        entries = {tag: segs for tag, segs in entries.items() if segs}
+        self._dirty.discard(month)
+        if not entries:
+            # Month emptied by compaction: drop the manifest and the directory
+            try:
+                (month_dir / MANIFEST_NAME).unlink()
+            except FileNotFoundError:
+                pass
+            try:
+                month_dir.rmdir()
+            except OSError:
+                pass
+            return
+        month_dir.mkdir(parents=True, exist_ok=True)
+        tmp = month_dir / f"{MANIFEST_NAME}.{os.getpid()}-{threading.get_ident()}.tmp"
+        tmp.write_text(json.dumps({"version": 1, "tags": entries}), encoding="utf-8")
+        os.replace(tmp, month_dir / MANIFEST_NAME)
+
+    def load(self) -> None:
+        """
+        Read every month's manifest and reconcile it with the files on disk: segments
+        whose size changed (or that no manifest lists) are re-scanned, missing ones dropped.
+        """
+        with self.lock:
+            self._load()
+
+    def _load(self) -> None:
+        tags: Dict[str, List[Segment]] = {}
+        seen: Dict[str, Optional[int]] = {"": _mtime_ns(self.base)}
+        months = sorted(d.name for d in self._iter_dirs() if _MONTH_DIR.match(d.name))
+        for month in months:
+            month_dir = self.base / month
+            seen[month] = _mtime_ns(month_dir)
+            known: Dict[str, Segment] = {}
+            try:
+                manifest = json.loads((month_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+                for tag, segs in manifest.get("tags", {}).items():
+                    for raw in segs:
+                        known[raw["file"]] = Segment(**raw)
+            except (FileNotFoundError, ValueError, TypeError, KeyError):
+                known = {}
+            changed = False
+            for entry in os.scandir(month_dir):
+                m = _SEGMENT_FILE.match(entry.name)
+                if m is None:
+                    continue
+                seg = known.pop(entry.name, None)
+                if seg is None or seg.bytes != entry.stat().st_size:
+                    seg = scan_segment(month, Path(entry.path))
+                    changed = True
+                tags.setdefault(m.group("tag"), []).append(seg)
+            if known:
+                changed = True  # listed segments whose files are gone
+            if changed:
+                self._dirty.add(month)
+        for segs in tags.values():
+            segs.sort(key=lambda s: (s.month, s.index))
+        self._tags = tags
+        self._files = {}
+        for segs in tags.values():
+            for s in segs:
+                self._files.setdefault(s.month, set()).add(s.file)
+        self._seen = {}
+        for month, mtime in seen.items():
+            self._mark_seen(month, mtime)
+        self.flush()
+
+    def _iter_dirs(self) -> Iterable[os.DirEntry]:
+        try:
+            return [e for e in os.scandir(self.base) if e.is_dir()]
+        except FileNotFoundError:
+            return []
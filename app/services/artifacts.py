@@ -1,14 +1,46 @@
 # app/services/artifacts.py
 from __future__ import annotations
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
+import gzip
+import hashlib
 import json
+import logging
+import os
 import re
-import glob
+import threading
+import time
+from app.cancellation import checkpoint
 from app.logging import redact_args
+from app.metrics import METRICS
+from app.services.artifactcatalog import ArtifactCatalog, FileLock, Segment, segment_from_lines
 
+logger = logging.getLogger("mcp.artifacts")
+
+_BYTES_WRITTEN = METRICS.counter(
+    "mcp_artifact_bytes_written_total", "Bytes appended to artifact NDJSON files"
+)
+_RECORDS_WRITTEN = METRICS.counter("mcp_artifact_records_total", "Artifact records appended")
+_BLOBS = METRICS.counter(
+    "mcp_artifact_blobs_total",
+    "Large artifact payloads by outcome (stored, deduplicated, collected)",
+    ("result",),
+)
+_BLOB_BYTES_WRITTEN = METRICS.counter(
+    "mcp_artifact_blob_bytes_written_total",
+    "Bytes written to the artifact blob store (after compression)",
+)
+_RETENTION_DROPPED = METRICS.counter(
+    "mcp_artifact_retention_dropped_records_total",
+    "Records removed by retention, by rule",
+    ("rule",),
+)
+
+
+# Cancellation is checked between files and every this many lines of a scan
+_CHECK_EVERY_LINES = 1024
 
 SAFE_TAG = re.compile(r"[^a-zA-Z0-9:_\-]+")
 
@@ -18,8 +50,60 @@ def _safe_tag(tag: str) -> str:
     return s or "untagged"
 
 
-def _iso_now() -> str:
-    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+def _iso(dt: datetime) -> str:
+    return dt.isoformat(timespec="milliseconds")
+
+
+def _month_key(dt: datetime) -> str:
+    return f"{dt.year:04d}-{dt.month:02d}"
+
+
+def _line_ts(raw: bytes) -> str:
+    try:
+        return json.loads(raw).get("ts") or ""
+    except ValueError:
+        return ""
+
+
+def _age_cut(cutoff: str):
+    """
+    Cut function for _trim: how many leading lines are older than `cutoff`.
+    """
+    def cut(lines: List[bytes]) -> int:
+        return next((i for i, line in enumerate(lines) if _line_ts(line) >= cutoff), len(lines))
+    return cut
+
+
+def _partial_cut(rule: str, excess: int):
+    """
+    Cut function for _trim: how many leading lines cover `excess` records or bytes.
+    """
+    def cut(lines: List[bytes]) -> int:
+        if rule == "records":
+            return min(excess, len(lines))
+        total = 0
+        for i, line in enumerate(lines):
+            if total >= excess:
+                return i
+            total += len(line)
+        return len(lines)
+    return cut
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """
+    Per-tag retention enforced by ArtifactService.compact (0 disables a rule).
+    Records go oldest first; whole segments are deleted, a partly kept one is rewritten.
+    """
+
+    max_age_days: float = 0.0
+    max_bytes_per_tag: int = 0
+    max_records_per_tag: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age_days > 0 or self.max_bytes_per_tag > 0 or self.max_records_per_tag > 0
 
 
 @dataclass
@@ -29,15 +113,37 @@ class ArtifactService:
       .sandbox/<ARTIFACTS_SUBDIR>/<YYYY-MM>/<tag>-NNNN.ndjson
 
     Rotation: create a new file when current file exceeds max_bytes.
+    Catalog: a manifest per month (<YYYY-MM>/_catalog.json, see ArtifactCatalog) lists
+      each tag's segments, so listing opens only the newest segments it needs.
+    Retention: with a RetentionPolicy, a background job runs `compact` every
+      compact_interval_sec and drops unreferenced blobs.
     Redaction: applies to all string fields in 'content' and 'meta'.
+    Blobs: a (redacted) content of blob_min_bytes or more of JSON is stored once under
+      .sandbox/<ARTIFACTS_SUBDIR>/blobs/<ab>/<sha256>.json[.gz]
+    and the record holds {"content_blob": {"sha256", "bytes"}} instead of "content".
     """
     sandbox_root: Path
     subdir_name: str = "artifacts"
     max_bytes: int = 10_000_000  # ~10MB per file
+    blob_min_bytes: int = 0      # 0 = always inline
+    blob_compress: bool = True
+    retention: Optional[RetentionPolicy] = None
+    compact_interval_sec: float = 3600.0
+    blob_grace_sec: float = 600.0  # unreferenced blobs younger than this are kept
 
     def __post_init__(self):
         self.base = (self.sandbox_root / self.subdir_name).resolve()
         self.base.mkdir(parents=True, exist_ok=True)
+        self.blob_dir = self.base / "blobs"
+        self.catalog = ArtifactCatalog(self.base)
+        self._compact_lock = FileLock(self.base / ".compact.lock")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if self.retention is not None and self.retention.enabled and self.compact_interval_sec > 0:
+            self._thread = threading.Thread(
+                target=self._compact_forever, name="artifact-retention", daemon=True
+            )
+            self._thread.start()
 
     # ---------- Public API ----------
 
@@ -52,11 +158,10 @@ class ArtifactService:
         tool: Optional[str] = None,
     ) -> Dict[str, Any]:
         tag_safe = _safe_tag(tag)
-        month_dir = self._month_dir()
-        month_dir.mkdir(parents=True, exist_ok=True)
+        now = datetime.now(timezone.utc)
 
         record = {
-            "ts": _iso_now(),
+            "ts": _iso(now),
             "tag": tag_safe,
             **({"corr": corr} if corr else {}),
             **({"actor": actor} if actor else {}),
@@ -64,11 +169,25 @@ class ArtifactService:
             "content": self._redact_obj(content),
             "meta": self._redact_obj(meta) if meta is not None else None,
         }
+        if self.blob_min_bytes > 0:
+            payload = json.dumps(record["content"], ensure_ascii=False).encode("utf-8")
+            if len(payload) >= self.blob_min_bytes:
+                del record["content"]
+                record["content_blob"] = {"sha256": self._put_blob(payload), "bytes": len(payload)}
 
-        # Determine current index file and rotate by size if needed
-        path = self._ensure_current_file(month_dir, tag_safe)
-        with path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        blob = record["content_blob"]["sha256"] if "content_blob" in record else None
+        with self.catalog.lock:
+            # Current segment of this tag and month, rotated by size (after picking up
+            # segments another process may have rotated to)
+            self.catalog.refresh(since_month=_month_key(now))
+            seg = self.catalog.current(tag_safe, _month_key(now), self.max_bytes)
+            path = self.catalog.path(seg)
+            with self.catalog.file_lock.shared(), path.open("ab") as f:
+                f.write(line)
+            self.catalog.appended(seg, len(line), record["ts"], blob)
+        _BYTES_WRITTEN.inc(amount=len(line))
+        _RECORDS_WRITTEN.inc()
 
         return {"ok": True, "file": str(path), "ts": record["ts"]}
 
@@ -79,72 +198,216 @@ class ArtifactService:
         limit: int = 50,
         order: str = "desc",  # "desc" (newest first) or "asc"
         months_back: int = 12,  # how many months to scan backwards
+        resolve_blobs: bool = False,  # inline blob-stored content (else keep the reference)
     ) -> Dict[str, Any]:
         tag_safe = _safe_tag(tag)
-        files = self._files_for_tag(tag_safe, months_back=months_back)
-        lines: List[str] = []
-        # Read newest files first for "desc"
-        for fp in files:
+        now = datetime.now(timezone.utc)
+        y, m = divmod(now.year * 12 + now.month - 1 - (months_back - 1), 12)
+        since_month = f"{y:04d}-{m + 1:02d}"
+        self.catalog.refresh(since_month=since_month)
+        segments = self.catalog.segments(tag_safe, since_month=since_month)
+        if order == "desc":
+            segments.reverse()
+
+        # Walk segments in the requested order and stop once `limit` lines are collected
+        chosen: List[bytes] = []
+        for seg in segments:
+            checkpoint()
+            lines = self._read_lines(self.catalog.path(seg))
+            if order == "desc":
+                lines.reverse()
+            chosen.extend(lines[: limit - len(chosen)])
+            if len(chosen) >= limit:
+                break
+
+        checkpoint()
+        records = [json.loads(x) for x in chosen]
+        if resolve_blobs:
+            # Repeated payloads are read once per call (records then share the object)
+            resolved: Dict[str, Any] = {}
+            for rec in records:
+                ref = rec.pop("content_blob", None)
+                if ref is not None:
+                    checkpoint()
+                    if ref["sha256"] not in resolved:
+                        resolved[ref["sha256"]] = self.read_blob(ref["sha256"])
+                    rec["content"] = resolved[ref["sha256"]]
+        return {"count": len(records), "records": records}
+
+    def read_blob(self, sha256: str) -> Any:
+        """
+        Content of a blob-stored record (raises FileNotFoundError if it is gone).
+        """
+        if not re.fullmatch(r"[0-9a-f]{64}", sha256):
+            raise ValueError("Invalid blob id")
+        for path in self._blob_paths(sha256):
             try:
-                with open(fp, "r", encoding="utf-8") as f:
-                    file_lines = f.readlines()
-                    lines.extend(file_lines)
-                    if len(lines) >= limit:
-                        break
+                if path.suffix == ".gz":
+                    with gzip.open(path, "rb") as f:
+                        return json.loads(f.read())
+                return json.loads(path.read_bytes())
             except FileNotFoundError:
                 continue
+        raise FileNotFoundError(f"Artifact blob not found: {sha256}")
 
-        # Build records (take last N lines collected for desc)
-        if order == "desc":
-            chosen = list(reversed(lines))[:limit]
-        else:
-            chosen = lines[:limit]
-        records = [json.loads(x) for x in chosen]
-        return {"count": len(records), "records": records}
+    def compact(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Enforce the retention policy on every tag, then delete blobs no record references.
+        Re-reads the catalog first so segments written by other processes are included.
+        One process compacts a sandbox at a time: while another holds .compact.lock the
+        pass is skipped (all counts 0), as its counts would be stale after that one's.
+        """
+        if not self._compact_lock.try_exclusive():
+            return {"age": 0, "bytes": 0, "records": 0, "blobs": 0}
+        try:
+            return self._compact(self.retention or RetentionPolicy(),
+                                 now or datetime.now(timezone.utc))
+        finally:
+            self._compact_lock.release()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.catalog.flush()
 
     # ---------- Internals ----------
 
-    def _month_dir(self, dt: Optional[datetime] = None) -> Path:
-        dt = dt or datetime.now(timezone.utc)
-        return self.base / f"{dt.year:04d}-{dt.month:02d}"
+    def _compact(self, policy: RetentionPolicy, now: datetime) -> Dict[str, int]:
+        self.catalog.load()
+        dropped = {"age": 0, "bytes": 0, "records": 0}
+        for tag in self.catalog.tags():
+            if policy.max_age_days > 0:
+                cutoff = _iso(now - timedelta(days=policy.max_age_days))
+                for seg in self.catalog.segments(tag):
+                    if seg.min_ts is not None and seg.min_ts >= cutoff:
+                        break
+                    dropped["age"] += self._trim(tag, seg, _age_cut(cutoff))
+            for rule, limit, size in (
+                ("records", policy.max_records_per_tag, lambda seg: seg.records),
+                ("bytes", policy.max_bytes_per_tag, lambda seg: seg.bytes),
+            ):
+                if limit <= 0:
+                    continue
+                excess = sum(size(seg) for seg in self.catalog.segments(tag)) - limit
+                for seg in self.catalog.segments(tag):
+                    if excess <= 0:
+                        break
+                    before = size(seg)
+                    if before <= excess:
+                        dropped[rule] += self._trim(tag, seg, len)
+                    else:
+                        dropped[rule] += self._trim(tag, seg, _partial_cut(rule, excess))
+                    excess -= before
+        for rule, count in dropped.items():
+            if count:
+                _RETENTION_DROPPED.inc(rule, amount=count)
+        blobs = self._collect_blobs()
+        self.catalog.flush()
+        return {**dropped, "blobs": blobs}
+
+    def _compact_forever(self) -> None:
+        while not self._stop.wait(self.compact_interval_sec):
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("artifact retention pass failed")
+
+    def _trim(self, tag: str, seg: Segment, cut) -> int:
+        """
+        Drop the first `cut(lines)` lines of a segment (all of them deletes the file);
+        returns the number of records dropped. Appends from every process wait until
+        the rewrite is in place, so none lands in the file being replaced.
+        """
+        with self.catalog.lock, self.catalog.file_lock.exclusive():
+            current = next((s for s in self.catalog.segments(tag) if s.file == seg.file
+                            and s.month == seg.month), None)
+            if current is None:
+                return 0
+            path = self.catalog.path(current)
+            lines = self._read_lines(path)
+            start = cut(lines)
+            if start <= 0:
+                return 0
+            kept = lines[start:]
+            if kept:
+                tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+                tmp.write_bytes(b"".join(kept))
+                os.replace(tmp, path)
+                new = segment_from_lines(current.month, current.file, kept)
+            else:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                new = None
+            self.catalog.replace(tag, current, new)
+            # Counted from the file: it may hold lines another process appended since
+            return len(lines) - len(kept)
+
+    def _collect_blobs(self) -> int:
+        if not self.blob_dir.exists():
+            return 0
+        referenced = self.catalog.blobs()
+        cutoff = time.time() - self.blob_grace_sec
+        removed = 0
+        for path in self.blob_dir.glob("*/*.json*"):
+            if path.name.split(".", 1)[0] in referenced or path.name.endswith(".tmp"):
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            _BLOBS.inc("collected", amount=removed)
+        return removed
 
-    def _glob_indices(self, month_dir: Path, tag_safe: str) -> List[Path]:
-        return sorted(month_dir.glob(f"{tag_safe}-*.ndjson"))
+    def _blob_paths(self, sha256: str) -> List[Path]:
+        # Preferred name first; the other covers blobs written with the other setting
+        folder = self.blob_dir / sha256[:2]
+        names = [f"{sha256}.json.gz", f"{sha256}.json"]
+        if not self.blob_compress:
+            names.reverse()
+        return [folder / n for n in names]
 
-    def _ensure_current_file(self, month_dir: Path, tag_safe: str) -> Path:
-        existing = self._glob_indices(month_dir, tag_safe)
-        if not existing:
-            return month_dir / f"{tag_safe}-0001.ndjson"
+    def _put_blob(self, payload: bytes) -> str:
+        """
+        Store payload under its SHA-256 unless an identical blob exists; returns the hash.
+        """
+        digest = hashlib.sha256(payload).hexdigest()
+        paths = self._blob_paths(digest)
+        for existing in paths:
+            try:
+                # Refresh mtime so a concurrent retention pass keeps it (blob_grace_sec)
+                os.utime(existing)
+            except FileNotFoundError:
+                continue
+            _BLOBS.inc("deduplicated")
+            return digest
+        path = paths[0]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = gzip.compress(payload, compresslevel=6, mtime=0) if self.blob_compress else payload
+        # Write-then-rename so a reader never sees a partial blob
+        tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        _BLOBS.inc("stored")
+        _BLOB_BYTES_WRITTEN.inc(amount=len(data))
+        return digest
 
-        current = existing[-1]
+    def _read_lines(self, path: Path) -> List[bytes]:
+        lines: List[bytes] = []
         try:
-            sz = current.stat().st_size
+            with open(path, "rb") as f:
+                for i, line in enumerate(f):
+                    if i % _CHECK_EVERY_LINES == 0:
+                        checkpoint()
+                    lines.append(line)
         except FileNotFoundError:
-            return month_dir / f"{tag_safe}-0001.ndjson"
-
-        if sz >= self.max_bytes:
-            # Rotate
-            idx = int(current.stem.split("-")[-1])
-            next_idx = f"{idx+1:04d}"
-            return month_dir / f"{tag_safe}-{next_idx}.ndjson"
-        return current
-
-    def _files_for_tag(self, tag_safe: str, months_back: int) -> List[Path]:
-        # Scan current month back to N months, newest first
-        files: List[Path] = []
-        now = datetime.now(timezone.utc)
-        for k in range(months_back):
-            y = now.year
-            m = now.month - k
-            while m <= 0:
-                y -= 1
-                m += 12
-            month_dir = self.base / f"{y:04d}-{m:02d}"
-            # Add in reverse index order so newest file first
-            idx_files = sorted(glob.glob(str(month_dir / f"{tag_safe}-*.ndjson")))
-            if idx_files:
-                files.extend(reversed([Path(p) for p in idx_files]))
-        return files
+            pass  # removed by retention since the catalog was read
+        return lines
 
     def _redact_obj(self, obj: Any) -> Any:
         if obj is None:
@@ -1,11 +1,28 @@
 # app/services/httpclient.py
 import ipaddress
 import socket
-from typing import Dict, Optional
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
 from urllib.parse import urlparse
 
+import httpcore
 import httpx
 
+from app.cancellation import CallCancelled, current_token
+from app.metrics import METRICS
+
+_POOL_IN_USE = METRICS.gauge(
+    "mcp_http_pool_in_use", "Outbound http_fetch requests currently holding a pooled connection"
+)
+_POOL_MAX = METRICS.gauge("mcp_http_pool_max_connections", "Outbound connection pool size limit")
+_FETCH_TOTAL = METRICS.counter(
+    "mcp_http_fetch_requests_total", "Outbound http_fetch requests by status class", ("status",)
+)
+_DNS_LOOKUPS = METRICS.counter(
+    "mcp_http_dns_cache_lookups_total", "SSRF-guard DNS checks by cache result", ("result",)
+)
+
 
 def _host_resolves_to_private(host: str) -> bool:
     """
@@ -24,19 +41,136 @@ def _host_resolves_to_private(host: str) -> bool:
         return True
 
 
+class _DnsCache:
+    """
+    Short-lived cache of SSRF-guard verdicts per host (bounded, thread-safe).
+    Off unless a TTL is configured: while a verdict is cached, a host re-pointed at a
+    private address is not noticed, so every fetch resolves by default.
+    """
+
+    def __init__(self, ttl_sec: float, max_entries: int = 1024):
+        self.ttl = ttl_sec
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, bool]] = {}
+        self._lock = threading.Lock()
+
+    def resolves_to_private(self, host: str) -> bool:
+        if self.ttl <= 0:
+            _DNS_LOOKUPS.inc("disabled")
+            return _host_resolves_to_private(host)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(host)
+        if hit is not None and hit[0] > now:
+            _DNS_LOOKUPS.inc("hit")
+            return hit[1]
+        _DNS_LOOKUPS.inc("miss")
+        verdict = _host_resolves_to_private(host)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first; if still full, start over
+                self._entries = {h: e for h, e in self._entries.items() if e[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[host] = (now + self.ttl, verdict)
+        return verdict
+
+
+class _CancellableStream(httpcore.NetworkStream):
+    """
+    Network stream whose blocking reads the calling tool's cancellation interrupts:
+    each read registers a callback on the current token that shuts the socket down,
+    so a request still waiting for response headers stops at once.
+    """
+
+    def __init__(self, stream: httpcore.NetworkStream):
+        self._stream = stream
+
+    def read(self, max_bytes: int, timeout: Optional[float] = None) -> bytes:
+        token = current_token()
+        if token is None:
+            return self._stream.read(max_bytes, timeout)
+        unregister = token.on_cancel(self._abort)
+        try:
+            return self._stream.read(max_bytes, timeout)
+        finally:
+            unregister()
+
+    def write(self, buffer: bytes, timeout: Optional[float] = None) -> None:
+        self._stream.write(buffer, timeout)
+
+    def close(self) -> None:
+        self._stream.close()
+
+    def start_tls(self, ssl_context, server_hostname: Optional[str] = None,
+                  timeout: Optional[float] = None) -> httpcore.NetworkStream:
+        return _CancellableStream(self._stream.start_tls(ssl_context, server_hostname, timeout))
+
+    def get_extra_info(self, info: str):
+        return self._stream.get_extra_info(info)
+
+    def _abort(self) -> None:
+        # Runs on the cancelling thread; the blocked recv returns and the connection
+        # is discarded by the pool as broken
+        sock = self._stream.get_extra_info("socket")
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class _CancellableBackend(httpcore.NetworkBackend):
+    def __init__(self):
+        self._backend = httpcore.SyncBackend()
+
+    def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                    local_address: Optional[str] = None,
+                    socket_options: Optional[Iterable] = None) -> httpcore.NetworkStream:
+        return _CancellableStream(
+            self._backend.connect_tcp(host, port, timeout, local_address, socket_options)
+        )
+
+    def connect_unix_socket(self, path: str, timeout: Optional[float] = None,
+                            socket_options: Optional[Iterable] = None) -> httpcore.NetworkStream:
+        return _CancellableStream(self._backend.connect_unix_socket(path, timeout, socket_options))
+
+    def sleep(self, seconds: float) -> None:
+        self._backend.sleep(seconds)
+
+
 class SafeHttpService:
     """
     Minimal but safe HTTP client for MCP tools:
     - Allowlist of domains (exact or subdomain).
     - Deny private/loopback/meta addresses.
     - Enforce timeouts and response size caps.
+    - Reuse one pooled client across calls (keep-alive, no per-call TLS setup).
+    - Honor the calling tool's deadline/cancellation: the timeout never outlives the
+      deadline, and cancelling shuts the connection's socket down, even while the
+      request is still waiting for response headers.
     """
 
     def __init__(self, allowlist_domains: set[str], timeout_sec: float = 10.0, 
-                 max_bytes: int = 2_000_000):
+                 max_bytes: int = 2_000_000, max_connections: int = 20,
+                 dns_cache_ttl_sec: float = 0.0):
         self.allowlist = {d.lower() for d in allowlist_domains}
         self.timeout = timeout_sec
         self.max_bytes = max_bytes
+        self._dns = _DnsCache(dns_cache_ttl_sec)
+        transport = httpx.HTTPTransport(limits=httpx.Limits(max_connections=max_connections))
+        # httpx has no public hook for the network backend; swap the pool's so that
+        # cancellation can interrupt a request before its response headers arrive
+        transport._pool._network_backend = _CancellableBackend()
+        self._client = httpx.Client(
+            timeout=self.timeout,
+            follow_redirects=True,
+            transport=transport,
+        )
+        _POOL_MAX.set(value=max_connections)
+
+    def close(self) -> None:
+        self._client.close()
 
     def _check_url(self, url: str):
         u = urlparse(url)
@@ -51,18 +185,49 @@ class SafeHttpService:
             raise PermissionError("Domain not allowlisted")
 
         # DNS to private networks not allowed
-        if _host_resolves_to_private(host):
+        if self._dns.resolves_to_private(host):
             raise PermissionError("Private/loopback addresses not allowed")
 
     def fetch(self, url: str, method: str = "GET", headers: Optional[Dict[str, str]] = None, 
               body: Optional[str] = None):
         self._check_url(url)
-        with httpx.Client(timeout=self.timeout, follow_redirects=True) as client:
-            resp = client.request(method.upper(), url, headers=headers, content=body)
-            # Cap size to protect memory; decode as UTF-8 replacement
-            content = resp.content[: self.max_bytes]
-            return {
-                "status": resp.status_code,
-                "headers": dict(resp.headers),
-                "body": content.decode("utf-8", "replace"),
-            }
+        token = current_token()
+        timeout = self.timeout
+        if token is not None:
+            token.check()
+            remaining = token.remaining()
+            if remaining is not None:
+                timeout = max(0.001, min(timeout, remaining))
+        _POOL_IN_USE.inc()
+        try:
+            # Explicit cancellation shuts the socket down (see _CancellableStream), both
+            # while waiting for headers and between body chunks
+            with self._client.stream(method.upper(), url, headers=headers, content=body,
+                                     timeout=timeout) as resp:
+                # Cap size to protect memory; stop reading once the cap is reached
+                content = bytearray()
+                for chunk in resp.iter_bytes():
+                    if token is not None:
+                        token.check()
+                    content += chunk
+                    if len(content) >= self.max_bytes:
+                        break
+        except CallCancelled:
+            _FETCH_TOTAL.inc("cancelled")
+            raise
+        except Exception:
+            if token is not None and token.cancelled:
+                # Closed under us by cancellation, or timed out at the deadline
+                _FETCH_TOTAL.inc("cancelled")
+                token.check()
+            _FETCH_TOTAL.inc("error")
+            raise
+        finally:
+            _POOL_IN_USE.dec()
+        _FETCH_TOTAL.inc(f"{resp.status_code // 100}xx")
+        # Decode as UTF-8 replacement
+        return {
+            "status": resp.status_code,
+            "headers": dict(resp.headers),
+            "body": bytes(content[: self.max_bytes]).decode("utf-8", "replace"),
+        }
@@ -0,0 +1,477 @@
+# app/services/kvembedded.py
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app.metrics import METRICS
+from app.services.kvstore import KvBackend, KvItem
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger("mcp.kv.embedded")
+
+_EVICTIONS = METRICS.counter(
+    "mcp_kv_embedded_evictions_total", "Embedded KV entries removed by reason", ("reason",)
+)
+_BYTES = METRICS.gauge("mcp_kv_embedded_bytes", "Approximate bytes held by the embedded KV")
+
+# Rough per-entry cost on top of key/value characters (tuple, dict slot, str headers)
+_ENTRY_OVERHEAD = 96
+
+AOF_FSYNC_POLICIES = ("always", "everysec", "no")
+
+
+def _entry_size(key: str, value: str) -> int:
+    return len(key) + len(value) + _ENTRY_OVERHEAD
+
+
+def _to_wall(expires: Optional[float]) -> Optional[float]:
+    return None if expires is None else round(expires - time.monotonic() + time.time(), 3)
+
+
+def _from_wall(wall: Optional[float]) -> Optional[float]:
+    return None if wall is None else wall - time.time() + time.monotonic()
+
+
+class _Shard:
+    __slots__ = ("lock", "data", "bytes")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (value, monotonic expiry or None); insertion order doubles as LRU order
+        self.data: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self.bytes = 0
+
+
+class _TimerWheel:
+    """
+    Hashed timer wheel: a key is filed under the first tick at or after its expiry
+    (modulo the slot count). Expiries more than one revolution away share a slot with
+    nearer ones; they are rescheduled when the slot comes round, so each tick only
+    touches keys that are (nearly) due.
+    """
+
+    def __init__(self, tick_sec: float = 0.1, slots: int = 512):
+        self.tick_sec = tick_sec
+        self._slots: List[Set[str]] = [set() for _ in range(slots)]
+        self._lock = threading.Lock()
+        self._cursor = int(time.monotonic() / tick_sec)
+
+    def schedule(self, key: str, expires: float) -> None:
+        idx = math.ceil(expires / self.tick_sec) % len(self._slots)
+        with self._lock:
+            self._slots[idx].add(key)
+
+    def advance(self, now: float) -> List[str]:
+        """
+        Return keys filed under the ticks elapsed since the last call (candidates only).
+        """
+        target = int(now / self.tick_sec)
+        due: List[str] = []
+        with self._lock:
+            ticks = min(target - self._cursor + 1, len(self._slots))
+            for tick in range(target - ticks + 1, target + 1):
+                idx = tick % len(self._slots)
+                if self._slots[idx]:
+                    due.extend(self._slots[idx])
+                    self._slots[idx] = set()
+            self._cursor = target + 1
+        return due
+
+
+def _lock_exclusive(path: Path):
+    """
+    Open `path` and take a non-blocking exclusive lock on it, held until the handle
+    is closed. Raises RuntimeError if another process holds it.
+    """
+    fh = open(path, "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:  # pragma: no cover - Windows
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        fh.close()
+        raise RuntimeError(
+            f"embedded KV AOF {path.parent} is in use by another process; the embedded "
+            "backend is single-process (use KV_BACKEND=redis for several workers)"
+        ) from None
+    return fh
+
+
+class _AppendOnlyFile:
+    """
+    NDJSON append-only log of writes. Records carry wall-clock expiries so a replay
+    after restart drops keys that expired while the process was down.
+
+    A lock file next to the log is held for the lifetime of the object: a second
+    process on the same sandbox would interleave appends and replace the log under
+    this one, so it fails at startup instead.
+    """
+
+    def __init__(self, path: Path, fsync: str = "everysec"):
+        if fsync not in AOF_FSYNC_POLICIES:
+            raise ValueError(f"unknown AOF fsync policy: {fsync}")
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._buf: List[bytes] = []
+        self.base_size = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Separate file: rewrite() replaces the log's inode, which would drop a lock on it
+        self._lock_fh = _lock_exclusive(path.with_suffix(path.suffix + ".lock"))
+        self._fh = open(path, "ab")
+
+    def records(self) -> Iterator[list]:
+        with open(self.path, "rb") as f:
+            for n, line in enumerate(f, 1):
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A crash can leave a torn last line; everything before it is intact
+                    logger.warning("embedded KV AOF: ignoring unreadable record at line %d", n)
+                    return
+
+    def append(self, record: list) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            if self.fsync == "always":
+                self._fh.write(line)
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+            else:
+                self._buf.append(line)
+
+    def flush(self, sync: bool = False) -> None:
+        with self._lock:
+            if self._buf:
+                self._fh.write(b"".join(self._buf))
+                self._buf.clear()
+            self._fh.flush()
+            if sync:
+                os.fsync(self._fh.fileno())
+
+    def size(self) -> int:
+        with self._lock:
+            return self._fh.tell() + sum(len(b) for b in self._buf)
+
+    def rewrite(self, records: Iterable[list]) -> None:
+        """
+        Replace the log with `records` (a snapshot). Callers must block writers.
+        """
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            for record in records:
+                line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+                f.write(line.encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        with self._lock:
+            self._buf.clear()
+            self._fh.close()
+            os.replace(tmp, self.path)
+            self._fh = open(self.path, "ab")
+            self.base_size = self._fh.tell()
+
+    def close(self) -> None:
+        self.flush(sync=True)
+        with self._lock:
+            self._fh.close()
+            self._lock_fh.close()
+
+
+class EmbeddedKvBackend(KvBackend):
+    """
+    In-process KV for single-node deployments without Redis.
+
+    - Keys are spread over `shards` lock-striped dicts so unrelated keys never contend.
+    - TTLs expire lazily on access and proactively via a timer wheel ticked by a
+      background thread.
+    - `max_bytes` caps the approximate footprint; each shard evicts its least recently
+      used keys beyond its share (Redis allkeys-lru).
+    - With `aof_path`, writes are appended to an NDJSON log (fsync: always / everysec /
+      no) that is replayed and compacted on startup, and compacted again when it grows
+      past twice its post-compaction size. Evictions are not logged; the cap is
+      re-applied while replaying.
+    """
+
+    def __init__(
+        self,
+        *,
+        shards: int = 16,
+        max_bytes: int = 64_000_000,
+        aof_path: Optional[Path] = None,
+        aof_fsync: str = "everysec",
+        aof_rewrite_min_bytes: int = 1_000_000,
+        tick_sec: float = 0.1,
+    ):
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+        self._shard_cap = max_bytes // len(self._shards) if max_bytes > 0 else 0
+        self._wheel = _TimerWheel(tick_sec=tick_sec)
+        self._aof: Optional[_AppendOnlyFile] = None
+        self._aof_rewrite_min_bytes = aof_rewrite_min_bytes
+        if aof_path is not None:
+            self._aof = _AppendOnlyFile(Path(aof_path), aof_fsync)
+            self._replay()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._background, name="kv-embedded", daemon=True)
+        self._thread.start()
+
+    # ---------- KvBackend ----------
+
+    def put(self, key: str, value: str, ttl_sec: Optional[int] = None) -> str:
+        expires = time.monotonic() + int(ttl_sec) if ttl_sec else None
+        shard = self._shard(key)
+        with shard.lock:
+            self._write(shard, key, value, expires)
+            self._log(["set", key, value, _to_wall(expires)])
+        return "OK"
+
+    def get(self, key: str) -> Optional[str]:
+        shard = self._shard(key)
+        with shard.lock:
+            return self._read(shard, key, time.monotonic())
+
+    def mget(self, keys: Sequence[str]) -> Dict[str, Optional[str]]:
+        now = time.monotonic()
+        out: Dict[str, Optional[str]] = {}
+        for key in keys:
+            shard = self._shard(key)
+            with shard.lock:
+                out[key] = self._read(shard, key, now)
+        return out
+
+    def mset(self, items: Sequence[KvItem]) -> str:
+        """
+        All items become visible together: the touched shards are locked in index order.
+        """
+        now = time.monotonic()
+        rows = [(k, v, now + int(ttl) if ttl else None) for k, v, ttl in items]
+        with self._locked(k for k, _, _ in rows):
+            for key, value, expires in rows:
+                self._write(self._shard(key), key, value, expires)
+            self._log(["mset", [[k, v, _to_wall(e)] for k, v, e in rows]])
+        return "OK"
+
+    def delete(self, keys: Sequence[str]) -> int:
+        now = time.monotonic()
+        deleted = 0
+        with self._locked(keys):
+            for key in dict.fromkeys(keys):
+                shard = self._shard(key)
+                if self._read(shard, key, now) is not None:
+                    self._remove(shard, key)
+                    deleted += 1
+            if deleted:
+                self._log(["del", list(keys)])
+        return deleted
+
+    def incr(self, key: str, amount: int = 1, ttl_sec: Optional[int] = None) -> int:
+        """
+        Add `amount` atomically; TTL is applied only when the counter is created.
+        """
+        shard = self._shard(key)
+        with shard.lock:
+            now = time.monotonic()
+            current = self._read(shard, key, now)
+            try:
+                value = int(current or 0) + amount
+            except ValueError:
+                raise ValueError("value is not an integer or out of range")
+            if current is None:
+                expires = now + int(ttl_sec) if ttl_sec else None
+            else:
+                expires = shard.data[key][1]
+            self._write(shard, key, str(value), expires)
+            self._log(["set", key, str(value), _to_wall(expires)])
+        return value
+
+    def compare_and_set(
+        self, key: str, expected: Optional[str], value: str, ttl_sec: Optional[int] = None
+    ) -> Dict[str, Any]:
+        shard = self._shard(key)
+        with shard.lock:
+            current = self._read(shard, key, time.monotonic())
+            if current != expected:
+                return {"swapped": False, "current": current}
+            expires = time.monotonic() + int(ttl_sec) if ttl_sec else None
+            self._write(shard, key, value, expires)
+            self._log(["set", key, value, _to_wall(expires)])
+        return {"swapped": True, "current": current}
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        if self._aof is not None:
+            self._aof.close()
+
+    # ---------- Introspection ----------
+
+    def stats(self) -> Dict[str, Any]:
+        keys = 0
+        size = 0
+        for shard in self._shards:
+            with shard.lock:
+                keys += len(shard.data)
+                size += shard.bytes
+        return {"keys": keys, "bytes": size, "shards": len(self._shards)}
+
+    def ttl(self, key: str) -> int:
+        """
+        Redis TTL semantics: seconds left, -1 without expiry, -2 if missing.
+        """
+        shard = self._shard(key)
+        with shard.lock:
+            now = time.monotonic()
+            if self._read(shard, key, now) is None:
+                return -2
+            expires = shard.data[key][1]
+            return -1 if expires is None else int(expires - now + 0.999)
+
+    # ---------- Internals (callers hold the shard lock) ----------
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    @contextmanager
+    def _locked(self, keys: Iterable[str]):
+        idx = sorted({hash(k) % len(self._shards) for k in keys})
+        for i in idx:
+            self._shards[i].lock.acquire()
+        try:
+            yield
+        finally:
+            for i in reversed(idx):
+                self._shards[i].lock.release()
+
+    def _read(self, shard: _Shard, key: str, now: float) -> Optional[str]:
+        entry = shard.data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= now:
+            self._remove(shard, key)
+            _EVICTIONS.inc("ttl")
+            return None
+        shard.data.move_to_end(key)
+        return value
+
+    def _write(self, shard: _Shard, key: str, value: str, expires: Optional[float]) -> None:
+        old = shard.data.pop(key, None)
+        if old is not None:
+            shard.bytes -= _entry_size(key, old[0])
+        shard.data[key] = (value, expires)
+        shard.bytes += _entry_size(key, value)
+        if expires is not None:
+            self._wheel.schedule(key, expires)
+        if self._shard_cap:
+            # Never evict the key just written, even if it alone exceeds the share
+            while shard.bytes > self._shard_cap and len(shard.data) > 1:
+                old_key, (old_value, _) = shard.data.popitem(last=False)
+                shard.bytes -= _entry_size(old_key, old_value)
+                _EVICTIONS.inc("lru")
+
+    def _remove(self, shard: _Shard, key: str) -> None:
+        value, _ = shard.data.pop(key)
+        shard.bytes -= _entry_size(key, value)
+
+    def _log(self, record: list) -> None:
+        if self._aof is not None:
+            self._aof.append(record)
+
+    # ---------- Background work ----------
+
+    def _background(self) -> None:
+        last_flush = time.monotonic()
+        while not self._stop.wait(self._wheel.tick_sec):
+            try:
+                now = time.monotonic()
+                self._expire(self._wheel.advance(now), now)
+                if self._aof is not None and now - last_flush >= 1.0:
+                    last_flush = now
+                    self._aof.flush(sync=self._aof.fsync == "everysec")
+                    self._maybe_compact()
+                _BYTES.set(value=sum(s.bytes for s in self._shards))
+            except Exception:
+                logger.exception("embedded KV background task failed")
+
+    def _expire(self, keys: List[str], now: float) -> None:
+        for key in keys:
+            shard = self._shard(key)
+            with shard.lock:
+                entry = shard.data.get(key)
+                if entry is None or entry[1] is None:
+                    continue
+                if entry[1] <= now:
+                    self._remove(shard, key)
+                    _EVICTIONS.inc("ttl")
+                else:
+                    # Filed for a later revolution of the wheel
+                    self._wheel.schedule(key, entry[1])
+
+    def _snapshot(self) -> Iterator[list]:
+        now = time.monotonic()
+        for shard in self._shards:
+            for key, (value, expires) in shard.data.items():
+                if expires is None or expires > now:
+                    yield ["set", key, value, _to_wall(expires)]
+
+    def _maybe_compact(self) -> None:
+        size = self._aof.size()
+        if size < max(self._aof_rewrite_min_bytes, 2 * self._aof.base_size):
+            return
+        # Writers pause while the snapshot is written; bounded by the live data size
+        with self._all_locked():
+            self._aof.rewrite(self._snapshot())
+
+    @contextmanager
+    def _all_locked(self):
+        for shard in self._shards:
+            shard.lock.acquire()
+        try:
+            yield
+        finally:
+            for shard in reversed(self._shards):
+                shard.lock.release()
+
+    def _replay(self) -> None:
+        count = 0
+        for record in self._aof.records():
+            op = record[0]
+            if op == "set":
+                self._apply_set(record[1], record[2], record[3])
+            elif op == "mset":
+                for key, value, wall in record[1]:
+                    self._apply_set(key, value, wall)
+            elif op == "del":
+                for key in record[1]:
+                    shard = self._shard(key)
+                    if key in shard.data:
+                        self._remove(shard, key)
+            count += 1
+        if count:
+            logger.info("embedded KV: replayed %d AOF records", count)
+        self._aof.rewrite(self._snapshot())
+
+    def _apply_set(self, key: str, value: str, wall: Optional[float]) -> None:
+        expires = _from_wall(wall)
+        shard = self._shard(key)
+        if expires is not None and expires <= time.monotonic():
+            if key in shard.data:
+                self._remove(shard, key)
+            return
+        self._write(shard, key, value, expires)
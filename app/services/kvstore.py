@@ -1,23 +1,253 @@
 # app/services/kvstore.py
-from typing import Optional
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Sequence, Tuple
 
 import redis
 
+from app.metrics import METRICS
+from app.services.nearcache import NearCache, NearCacheConfig
+
+_ROUND_TRIPS = METRICS.counter(
+    "mcp_kv_redis_round_trips_total", "Redis round trips by operation", ("op",)
+)
+
+# (key, value, ttl_sec or None)
+KvItem = Tuple[str, str, Optional[int]]
+
+
+class KvBackend(ABC):
+    """
+    Storage behind KvService. Semantics follow Redis strings: a plain SET clears any
+    TTL, INCR keeps it, missing keys read as None.
+    """
+
+    @abstractmethod
+    def put(self, key: str, value: str, ttl_sec: Optional[int] = None) -> str: ...
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]: ...
+
+    @abstractmethod
+    def mget(self, keys: Sequence[str]) -> Dict[str, Optional[str]]: ...
+
+    @abstractmethod
+    def mset(self, items: Sequence[KvItem]) -> str: ...
+
+    @abstractmethod
+    def delete(self, keys: Sequence[str]) -> int: ...
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl_sec: Optional[int] = None) -> int: ...
+
+    @abstractmethod
+    def compare_and_set(
+        self, key: str, expected: Optional[str], value: str, ttl_sec: Optional[int] = None
+    ) -> Dict[str, Any]: ...
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        return None
+
+    def close(self) -> None:
+        pass
+
 
 class KvService:
+    """
+    KV facade used by the kv_* tools; delegates to a pluggable KvBackend
+    (Redis by default, see app/services/kvembedded.py for the in-process one).
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        *,
+        client: Optional[redis.Redis] = None,
+        near_cache: Optional[NearCacheConfig] = None,
+        backend: Optional[KvBackend] = None,
+    ):
+        self.backend = backend if backend is not None else RedisKvBackend(
+            url, client=client, near_cache=near_cache
+        )
+
+    def put(self, key: str, value: str, ttl_sec: Optional[int] = None) -> str:
+        return self.backend.put(key, value, ttl_sec)
+
+    def get(self, key: str) -> Optional[str]:
+        return self.backend.get(key)
+
+    def mget(self, keys: Sequence[str]) -> Dict[str, Optional[str]]:
+        return self.backend.mget(keys)
+
+    def mset(self, items: Sequence[KvItem]) -> str:
+        return self.backend.mset(items)
+
+    def delete(self, keys: Sequence[str]) -> int:
+        return self.backend.delete(keys)
+
+    def incr(self, key: str, amount: int = 1, ttl_sec: Optional[int] = None) -> int:
+        return self.backend.incr(key, amount, ttl_sec)
+
+    def compare_and_set(
+        self, key: str, expected: Optional[str], value: str, ttl_sec: Optional[int] = None
+    ) -> Dict[str, Any]:
+        return self.backend.compare_and_set(key, expected, value, ttl_sec)
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        return self.backend.cache_stats()
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+class RedisKvBackend(KvBackend):
     """
     Simple Redis-backed KV with optional TTL. Synchronous client for simplicity.
+    Batch operations use MGET / pipelines so N keys cost one round trip.
+    With `near_cache`, reads are served from a bounded local cache (see NearCache)
+    and every write through this backend invalidates the keys it touched.
     """
 
-    def __init__(self, url: str):
-        self._client = redis.from_url(url, decode_responses=True)
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        *,
+        client: Optional[redis.Redis] = None,
+        near_cache: Optional[NearCacheConfig] = None,
+    ):
+        # `client` lets tests (or callers with a shared pool) inject a ready client
+        self._client = client if client is not None else redis.from_url(url, decode_responses=True)
+        self._near = NearCache(self._client, near_cache) if near_cache is not None else None
 
     def put(self, key: str, value: str, ttl_sec: Optional[int] = None) -> str:
+        _ROUND_TRIPS.inc("put")
         if ttl_sec:
             self._client.set(key, value, ex=int(ttl_sec))
         else:
             self._client.set(key, value)
+        self._invalidate([key])
         return "OK"
 
     def get(self, key: str) -> Optional[str]:
-        return self._client.get(key)
+        if self._near is None:
+            _ROUND_TRIPS.inc("get")
+            return self._client.get(key)
+        hit, value = self._near.lookup(key)
+        if hit:
+            return value
+        # Read the value and its PTTL together so the local copy never outlives Redis
+        epoch = self._near.epoch()
+        _ROUND_TRIPS.inc("get")
+        pipe = self._client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        value, pttl = pipe.execute()
+        self._near.store(key, value, pttl, epoch)
+        return value
+
+    # ---------- Batch operations ----------
+
+    def mget(self, keys: Sequence[str]) -> Dict[str, Optional[str]]:
+        if self._near is None:
+            _ROUND_TRIPS.inc("mget")
+            values = self._client.mget(list(keys))
+            return dict(zip(keys, values))
+        out: Dict[str, Optional[str]] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            hit, value = self._near.lookup(key)
+            if hit:
+                out[key] = value
+            else:
+                missing.append(key)
+        if missing:
+            epoch = self._near.epoch()
+            _ROUND_TRIPS.inc("mget")
+            pipe = self._client.pipeline(transaction=False)
+            pipe.mget(missing)
+            for key in missing:
+                pipe.pttl(key)
+            values, *pttls = pipe.execute()
+            for key, value, pttl in zip(missing, values, pttls):
+                out[key] = value
+                self._near.store(key, value, pttl, epoch)
+        return {key: out[key] for key in keys}
+
+    def mset(self, items: Sequence[KvItem]) -> str:
+        """
+        Set many keys atomically (MULTI/EXEC) in one round trip; each key may carry its own TTL.
+        """
+        _ROUND_TRIPS.inc("mset")
+        pipe = self._client.pipeline(transaction=True)
+        for key, value, ttl_sec in items:
+            if ttl_sec:
+                pipe.set(key, value, ex=int(ttl_sec))
+            else:
+                pipe.set(key, value)
+        pipe.execute()
+        self._invalidate([key for key, _, _ in items])
+        return "OK"
+
+    def delete(self, keys: Sequence[str]) -> int:
+        _ROUND_TRIPS.inc("delete")
+        deleted = int(self._client.delete(*keys))
+        self._invalidate(keys)
+        return deleted
+
+    # ---------- Atomic operations ----------
+
+    def incr(self, key: str, amount: int = 1, ttl_sec: Optional[int] = None) -> int:
+        """
+        Atomically add `amount`. The TTL is applied only when the counter is created
+        (fixed window): SET NX with the TTL and INCRBY go in one MULTI/EXEC, so an
+        existing key keeps its TTL (or lack of one) whatever its value.
+        """
+        _ROUND_TRIPS.inc("incr")
+        if ttl_sec:
+            pipe = self._client.pipeline(transaction=True)
+            pipe.set(key, 0, ex=int(ttl_sec), nx=True)
+            pipe.incrby(key, amount)
+            value = int(pipe.execute()[1])
+        else:
+            value = int(self._client.incrby(key, amount))
+        self._invalidate([key])
+        return value
+
+    def compare_and_set(
+        self, key: str, expected: Optional[str], value: str, ttl_sec: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Set `key` to `value` only if its current value equals `expected`
+        (None = key must not exist). Optimistic WATCH/MULTI/EXEC; retried on conflict.
+        """
+        with self._client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    _ROUND_TRIPS.inc("cas")
+                    pipe.watch(key)
+                    current = pipe.get(key)
+                    if current != expected:
+                        pipe.unwatch()
+                        return {"swapped": False, "current": current}
+                    pipe.multi()
+                    if ttl_sec:
+                        pipe.set(key, value, ex=int(ttl_sec))
+                    else:
+                        pipe.set(key, value)
+                    pipe.execute()
+                    self._invalidate([key])
+                    return {"swapped": True, "current": current}
+                except redis.WatchError:
+                    continue
+
+    # ---------- Near cache ----------
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        return self._near.stats() if self._near is not None else None
+
+    def close(self) -> None:
+        if self._near is not None:
+            self._near.close()
+
+    def _invalidate(self, keys: Sequence[str]) -> None:
+        if self._near is not None:
+            self._near.invalidate(keys)
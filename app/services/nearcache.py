@@ -0,0 +1,236 @@
+# app/services/nearcache.py
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.metrics import METRICS
+
+logger = logging.getLogger("mcp.kv.nearcache")
+
+_LOOKUPS = METRICS.counter(
+    "mcp_kv_near_cache_lookups_total", "KV near-cache lookups by result", ("result",)
+)
+_INVALIDATIONS = METRICS.counter(
+    "mcp_kv_near_cache_invalidations_total", "KV near-cache invalidations by source", ("source",)
+)
+_SIZE = METRICS.gauge("mcp_kv_near_cache_entries", "Entries held in the KV near cache")
+
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+
+
+@dataclass(frozen=True)
+class NearCacheConfig:
+    max_entries: int = 10_000
+    ttl_sec: float = 60.0            # local TTL while server-side invalidation is active
+    fallback_ttl_sec: float = 1.0    # local TTL when invalidation is unavailable
+    max_value_bytes: int = 65_536    # larger values are not cached
+    invalidation: str = "tracking"   # "tracking" | "keyspace" | "ttl"
+    prefixes: Tuple[str, ...] = ()   # BCAST prefixes for tracking (empty = all keys)
+    reconnect_sec: float = 5.0
+
+
+class NearCache:
+    """
+    Bounded in-process cache of Redis string values (LRU, TTL-aware).
+
+    - Entries never outlive the key's Redis TTL (callers pass PTTL read with the value).
+    - Invalidation: RESP2 `CLIENT TRACKING ... REDIRECT <id> BCAST` on a dedicated
+      connection, or keyspace notifications (server must enable notify-keyspace-events);
+      if neither can be set up, or the listener drops, entries fall back to a short TTL.
+    - An invalidation epoch guards the read/invalidate race: a value fetched before an
+      invalidation arrived is not inserted afterwards.
+    """
+
+    def __init__(self, client: Any, config: NearCacheConfig = NearCacheConfig()):
+        self._client = client
+        self.config = config
+        self._entries: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.mode = "ttl"
+        self._stop = threading.Event()
+        self._listener: Optional[threading.Thread] = None
+        self._conns: list = []
+        if config.invalidation in ("tracking", "keyspace"):
+            self._listener = threading.Thread(
+                target=self._listen_forever, name="kv-near-cache", daemon=True
+            )
+            self._ready = threading.Event()
+            self._listener.start()
+            # Wait briefly so the first reads already benefit from invalidation
+            self._ready.wait(timeout=2.0)
+
+    # ---------- Cache operations ----------
+
+    @property
+    def local_ttl(self) -> float:
+        return self.config.ttl_sec if self.mode != "ttl" else self.config.fallback_ttl_sec
+
+    def epoch(self) -> int:
+        return self._epoch
+
+    def lookup(self, key: str) -> Tuple[bool, Optional[str]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                _LOOKUPS.inc("hit")
+                return True, entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        _LOOKUPS.inc("miss")
+        return False, None
+
+    def store(self, key: str, value: Optional[str], pttl_ms: int, epoch: int) -> None:
+        """
+        Cache a value read from Redis together with its PTTL (-1 = no TTL, -2 = missing).
+        """
+        if value is not None and len(value) > self.config.max_value_bytes:
+            return
+        ttl = self.local_ttl
+        if pttl_ms is not None and pttl_ms >= 0:
+            ttl = min(ttl, pttl_ms / 1000)
+        if ttl <= 0:
+            return
+        expires = time.monotonic() + ttl
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            _SIZE.set(value=len(self._entries))
+
+    def invalidate(self, keys: Optional[Iterable[str]], source: str = "local") -> None:
+        """
+        Drop keys (None = everything) and bump the epoch so in-flight reads are not cached.
+        """
+        with self._lock:
+            self._epoch += 1
+            if keys is None:
+                self._entries.clear()
+            else:
+                for k in keys:
+                    self._entries.pop(k, None)
+            self.invalidations += 1
+            _SIZE.set(value=len(self._entries))
+        _INVALIDATIONS.inc(source)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "entries": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        self._stop.set()
+        self._disconnect()
+
+    # ---------- Server-side invalidation ----------
+
+    def _listen_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn = self._subscribe()
+            except Exception as e:
+                logger.warning("near cache invalidation unavailable (%s); using local TTLs", e)
+                self._disconnect()
+                self._set_mode("ttl")
+                self._ready.set()
+                return
+            self._ready.set()
+            try:
+                while not self._stop.is_set():
+                    if conn.can_read(timeout=1.0):
+                        self._on_message(conn.read_response())
+            except Exception as e:
+                if self._stop.is_set():
+                    return
+                logger.warning("near cache invalidation stream lost (%s); reconnecting", e)
+            # Anything cached under the long TTL may now be stale
+            self._disconnect()
+            self._set_mode("ttl")
+            self.invalidate(None, source="reconnect")
+            self._stop.wait(self.config.reconnect_sec)
+
+    def _subscribe(self):
+        pool = self._client.connection_pool
+        kwargs = {**pool.connection_kwargs, "protocol": 2}
+        listener = pool.connection_class(**kwargs)
+        self._conns = [listener]
+        listener.connect()
+
+        if self.config.invalidation == "tracking":
+            listener.send_command("CLIENT", "ID")
+            client_id = listener.read_response()
+            listener.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+            listener.read_response()
+            # Tracking lives as long as this connection; keep it open (never used for data)
+            tracker = pool.connection_class(**kwargs)
+            self._conns.append(tracker)
+            tracker.connect()
+            prefixes = [a for p in self.config.prefixes for a in ("PREFIX", p)]
+            tracker.send_command(
+                "CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST", *prefixes
+            )
+            tracker.read_response()
+        else:
+            db = kwargs.get("db", 0)
+            listener.send_command("PSUBSCRIBE", f"__keyspace@{db}__:*")
+            listener.read_response()
+
+        self._set_mode(self.config.invalidation)
+        self.invalidate(None, source="reconnect")
+        return listener
+
+    def _on_message(self, msg: Any) -> None:
+        if not isinstance(msg, list) or not msg:
+            return
+        kind = _text(msg[0])
+        if kind == "message" and len(msg) >= 3 and _text(msg[1]) == INVALIDATE_CHANNEL:
+            payload = msg[2]
+            # A nil payload means FLUSHALL/FLUSHDB: drop everything
+            keys = None if payload is None else [_text(k) for k in payload]
+            self.invalidate(keys, source="server")
+        elif kind == "pmessage" and len(msg) >= 4:
+            channel = _text(msg[2])
+            self.invalidate([channel.split(":", 1)[1]], source="server")
+
+    def _set_mode(self, mode: str) -> None:
+        if mode != self.mode:
+            logger.info("near cache invalidation mode: %s", mode)
+        self.mode = mode
+
+    def _disconnect(self) -> None:
+        for conn in self._conns:
+            try:
+                conn.disconnect()
+            except Exception:
+                pass
+        self._conns = []
+
+
+def _text(v: Any) -> str:
+    return v.decode("utf-8", "replace") if isinstance(v, bytes) else str(v)
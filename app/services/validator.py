@@ -5,6 +5,8 @@ import json
 from jsonschema import Draft202012Validator, Draft7Validator, Draft201909Validator
 from jsonschema.exceptions import ValidationError
 
+from app.cancellation import checkpoint
+
 class JsonValidatorService:
     """
     Validate JSON instances against JSON Schema (default draft 2020-12).
@@ -37,7 +39,13 @@ class JsonValidatorService:
         Validator = self._DRAFTS[draft]
         validator = Validator(sch)
 
-        errors: List[ValidationError] = sorted(validator.iter_errors(inst), key=lambda e: e.path)
+        # Errors are produced lazily; stop between them if the call is cancelled
+        checkpoint()
+        errors: List[ValidationError] = []
+        for err in validator.iter_errors(inst):
+            errors.append(err)
+            checkpoint()
+        errors.sort(key=lambda e: e.path)
         if not errors:
             return {"valid": True, "errors": []}
 
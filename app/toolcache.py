@@ -0,0 +1,236 @@
+# app/toolcache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+from app.cancellation import CallCancelled, current_token
+from app.metrics import METRICS
+
+_LOOKUPS = METRICS.counter(
+    "mcp_tool_cache_lookups_total",
+    "Idempotent tool calls by cache result (hit, miss, coalesced)",
+    ("tool", "result"),
+)
+_EVICTIONS = METRICS.counter(
+    "mcp_tool_cache_evictions_total", "Memoized results dropped by reason", ("reason",)
+)
+_BYTES = METRICS.gauge("mcp_tool_cache_bytes", "Approximate size of memoized tool results")
+
+Tags = Callable[[BaseModel], Iterable[str]]
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    Declared on a ToolSpec whose calls are idempotent (same validated args -> same result
+    until something invalidates it).
+
+    - Concurrent identical calls are collapsed into one execution (single-flight).
+    - `ttl_sec` > 0 also memoizes successful results for that long.
+    - `tags` names what a call depends on (e.g. "fs:<path>"); tools that change those
+      resources declare the same tags in ToolSpec.invalidates.
+    - `cacheable` can exclude some calls (e.g. non-GET fetches).
+    """
+
+    ttl_sec: float = 0.0
+    tags: Optional[Tags] = None
+    cacheable: Optional[Callable[[BaseModel], bool]] = None
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "tags")
+
+    def __init__(self, tags: FrozenSet[str]):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.tags = tags
+
+
+class ToolCache:
+    """
+    Single-flight + TTL/byte-bounded LRU memo for idempotent tool calls.
+
+    Keys are a hash of the tool name and the canonical JSON of the validated arguments.
+    Invalidation bumps an epoch so results computed before it are never stored, and
+    detaches matching in-flight calls so later callers start a fresh execution.
+    Memoized results are shared between callers and must be treated as read-only.
+
+    Followers wait under their own deadline/cancellation; if the leader's call was
+    cancelled, a follower that is still live runs the call itself.
+    """
+
+    def __init__(self):
+        self.single_flight = True
+        self.max_bytes = 0
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        # key -> (result, expires, size, tags); order doubles as LRU order
+        self._memo: "OrderedDict[str, Tuple[Any, float, int, FrozenSet[str]]]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._epoch = 0
+
+    def configure(self, *, single_flight: bool = True, max_bytes: int = 0) -> None:
+        with self._lock:
+            self.single_flight = single_flight
+            self.max_bytes = max(0, max_bytes)
+            self._clear()
+
+    # ---------- Call path ----------
+
+    def call(
+        self,
+        tool: str,
+        policy: CachePolicy,
+        args: BaseModel,
+        handler: Callable[[BaseModel], Any],
+    ) -> Any:
+        if policy.cacheable is not None and not policy.cacheable(args):
+            return handler(args)
+        memoize = policy.ttl_sec > 0 and self.max_bytes > 0
+        if not (memoize or self.single_flight):
+            return handler(args)
+
+        key = call_key(tool, args)
+        tags = frozenset(policy.tags(args)) if policy.tags is not None else frozenset()
+        with self._lock:
+            if memoize:
+                entry = self._memo.get(key)
+                if entry is not None and entry[1] > time.monotonic():
+                    self._memo.move_to_end(key)
+                    _LOOKUPS.inc(tool, "hit")
+                    return entry[0]
+                if entry is not None:
+                    self._drop(key, "ttl")
+            flight = self._flights.get(key) if self.single_flight else None
+            if flight is None:
+                leader = True
+                flight = _Flight(tags)
+                epoch = self._epoch
+                if self.single_flight:
+                    self._flights[key] = flight
+            else:
+                leader = False
+
+        if not leader:
+            _LOOKUPS.inc(tool, "coalesced")
+            _wait(flight)
+            if isinstance(flight.error, CallCancelled):
+                with self._lock:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+                return self.call(tool, policy, args, handler)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        _LOOKUPS.inc(tool, "miss")
+        try:
+            flight.result = handler(args)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                if memoize and flight.error is None and epoch == self._epoch:
+                    self._store(key, flight.result, policy.ttl_sec, tags)
+            flight.done.set()
+        return flight.result
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        tags = set(tags)
+        if not tags:
+            return
+        with self._lock:
+            self._epoch += 1
+            for tag in tags:
+                for key in list(self._by_tag.get(tag, ())):
+                    self._drop(key, "invalidated")
+            for key, flight in list(self._flights.items()):
+                if flight.tags & tags:
+                    del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._memo),
+                "bytes": self._bytes,
+                "in_flight": len(self._flights),
+            }
+
+    # ---------- Memo internals (caller holds the lock) ----------
+
+    def _store(self, key: str, result: Any, ttl_sec: float, tags: FrozenSet[str]) -> None:
+        size = _result_size(result)
+        if size > self.max_bytes:
+            return
+        if key in self._memo:
+            self._drop(key, "replaced")
+        self._memo[key] = (result, time.monotonic() + ttl_sec, size, tags)
+        self._bytes += size
+        for tag in tags:
+            self._by_tag.setdefault(tag, set()).add(key)
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._memo)), "lru")
+        _BYTES.set(value=self._bytes)
+
+    def _drop(self, key: str, reason: str) -> None:
+        _, _, size, tags = self._memo.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+        _EVICTIONS.inc(reason)
+        _BYTES.set(value=self._bytes)
+
+    def _clear(self) -> None:
+        self._memo.clear()
+        self._by_tag.clear()
+        self._bytes = 0
+        self._epoch += 1
+        _BYTES.set(value=0)
+
+
+def _wait(flight: _Flight) -> None:
+    # Block until the leader finishes, or raise if this caller is cancelled first
+    token = current_token()
+    if token is None:
+        flight.done.wait()
+        return
+    while not flight.done.wait(0.05):
+        token.check()
+
+
+def call_key(tool: str, args: BaseModel) -> str:
+    """
+    Stable key for (tool, validated args): dict key order does not matter.
+    """
+    canonical = json.dumps(args.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return tool + ":" + hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _result_size(result: Any) -> int:
+    if isinstance(result, (str, bytes)):
+        return len(result) + 64
+    try:
+        return len(json.dumps(result, default=str)) + 64
+    except (TypeError, ValueError):
+        return 1024
+
+
+# Process-wide cache; configured when the tool registry is built
+TOOL_CACHE = ToolCache()
@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Performance and load-test suite (not shipped; run with `python -m benchmarks.run`).
@@ -0,0 +1,139 @@
+# benchmarks/artifacts.py
+"""
+ArtifactService with large payloads inlined in the NDJSON vs kept in the blob store:
+disk used after logging, and artifact_list latency (with and without resolving blobs).
+Payloads repeat (--distinct of them), as when the same page or report is logged often.
+
+--history instead measures artifact_list against a long history: --months month
+directories with --tags tags each (segments written directly), listing one tag with
+months_back=36. Its cost should not grow with the history kept.
+
+    python -m benchmarks.artifacts --records 2000 --payload-bytes 100000 --distinct 50
+    python -m benchmarks.artifacts --history --months 36 --tags 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.services.artifacts import ArtifactService
+from benchmarks.run import _percentile
+
+
+def _disk_bytes(root: Path) -> int:
+    return sum(p.stat().st_size for p in root.rglob("*") if p.is_file())
+
+
+def _payload(i: int, size: int) -> Dict[str, Any]:
+    # Text with some repetition, like an HTML page or a validation report
+    words = " ".join(f"item-{i}-{k}" for k in range(size // 12))
+    return {"source": f"https://example.com/page/{i}", "body": words[:size]}
+
+
+def run_mode(name: str, blob_min_bytes: int, opts: argparse.Namespace) -> List[Dict[str, Any]]:
+    root = Path(tempfile.mkdtemp(prefix="mcp-bench-artifacts-"))
+    svc = ArtifactService(sandbox_root=root, blob_min_bytes=blob_min_bytes)
+    payloads = [_payload(i, opts.payload_bytes) for i in range(opts.distinct)]
+
+    t0 = time.perf_counter()
+    for i in range(opts.records):
+        svc.append("bench", payloads[i % opts.distinct])
+    append_ms = (time.perf_counter() - t0) / opts.records * 1000
+    disk = _disk_bytes(root)
+
+    rows = []
+    for resolve in (False, True) if blob_min_bytes else (False,):
+        latencies = []
+        for _ in range(opts.lists):
+            t0 = time.perf_counter()
+            svc.list("bench", limit=opts.limit, resolve_blobs=resolve)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        ordered = sorted(latencies)
+        row = {"mode": name + ("+resolve" if resolve else ""), "disk_bytes": disk,
+               "append_ms": round(append_ms, 3),
+               "list_p50_ms": round(_percentile(ordered, 50), 3),
+               "list_p99_ms": round(_percentile(ordered, 99), 3)}
+        rows.append(row)
+        print(f"{row['mode']:14s} disk {disk:>12} B  append {row['append_ms']:>8} ms  "
+              f"list p50 {row['list_p50_ms']:>9} ms  p99 {row['list_p99_ms']:>9} ms",
+              file=sys.stderr)
+    return rows
+
+
+def run_history(opts: argparse.Namespace) -> List[Dict[str, Any]]:
+    root = Path(tempfile.mkdtemp(prefix="mcp-bench-artifacts-"))
+    base = root / "artifacts"
+    now = datetime.now(timezone.utc)
+    line = json.dumps({"ts": "", "tag": "", "content": {"note": "x" * 100}, "meta": None}) + "\n"
+    for k in range(opts.months):
+        y, m = divmod(now.year * 12 + now.month - 1 - k, 12)
+        month_dir = base / f"{y:04d}-{m + 1:02d}"
+        month_dir.mkdir(parents=True)
+        for t in range(opts.tags):
+            ts = f"{y:04d}-{m + 1:02d}-01T00:00:00.000+00:00"
+            (month_dir / f"tag{t}-0001.ndjson").write_text(
+                line.replace('"ts": ""', f'"ts": "{ts}"') * opts.per_segment, encoding="utf-8")
+
+    # First start scans every segment and writes the manifests; later starts read them
+    t0 = time.perf_counter()
+    ArtifactService(sandbox_root=root)
+    scan_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    svc = ArtifactService(sandbox_root=root)
+    load_ms = (time.perf_counter() - t0) * 1000
+    rows = []
+    # "fresh": right after the manifests were written, directories changed in the last
+    # ~2 s are re-listed on each call; "settled": once their mtimes can be trusted
+    for tag, phase in (("tag0", "fresh"), ("tag0", "settled"), ("missing", "settled")):
+        if phase == "settled" and rows[-1]["phase"] != "settled":
+            time.sleep(2.1)
+        latencies = []
+        for _ in range(opts.lists):
+            t0 = time.perf_counter()
+            svc.list(tag, limit=opts.limit, months_back=36)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        ordered = sorted(latencies)
+        row = {"tag": tag, "phase": phase, "months": opts.months, "tags": opts.tags,
+               "scan_ms": round(scan_ms, 3), "load_ms": round(load_ms, 3),
+               "list_p50_ms": round(_percentile(ordered, 50), 3),
+               "list_p99_ms": round(_percentile(ordered, 99), 3)}
+        rows.append(row)
+        print(f"{tag:8s} {phase:8s} months {opts.months} tags {opts.tags}  "
+              f"scan {row['scan_ms']} ms  load {row['load_ms']} ms  "
+              f"list p50 {row['list_p50_ms']} ms  p99 {row['list_p99_ms']} ms", file=sys.stderr)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--payload-bytes", type=int, default=100_000)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=50, help="artifact_list limit")
+    parser.add_argument("--lists", type=int, default=20, help="list calls to time")
+    parser.add_argument("--blob-min-bytes", type=int, default=65_536)
+    parser.add_argument("--history", action="store_true", help="list latency vs history kept")
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--per-segment", type=int, default=100, help="records per history segment")
+    opts = parser.parse_args()
+
+    if opts.history:
+        print(json.dumps({"results": run_history(opts)}, indent=2))
+        return
+
+    results = run_mode("inline", 0, opts) + run_mode("blobs", opts.blob_min_bytes, opts)
+    print(json.dumps({"records": opts.records, "payload_bytes": opts.payload_bytes,
+                      "distinct": opts.distinct, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/compare.py
+"""
+Compare two benchmark result files (e.g. baseline commit vs. candidate).
+
+    python -m benchmarks.compare base.json head.json [--fail-over 10]
+
+Prints p50/p99/throughput deltas per (transport, workload); with --fail-over, exits
+non-zero when any p99 regresses by more than that percentage.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, Tuple
+
+
+def _index(report: Dict[str, Any]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    return {(r["transport"], r["workload"]): r for r in report["results"]}
+
+
+def _delta(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--fail-over", type=float, default=None,
+                        help="fail if any p99 regresses by more than this percent")
+    opts = parser.parse_args()
+
+    with open(opts.base, encoding="utf-8") as f:
+        base = _index(json.load(f))
+    with open(opts.head, encoding="utf-8") as f:
+        head = _index(json.load(f))
+
+    worst = 0.0
+    print(f"{'transport':17s} {'workload':14s} {'p50 ms':>18s} {'p99 ms':>18s} {'rps':>18s}")
+    for key in sorted(base.keys() & head.keys()):
+        b, h = base[key], head[key]
+        p50 = _delta(b["latency_ms"]["p50"], h["latency_ms"]["p50"])
+        p99 = _delta(b["latency_ms"]["p99"], h["latency_ms"]["p99"])
+        rps = _delta(b["throughput_rps"] or 0, h["throughput_rps"] or 0)
+        worst = max(worst, p99)
+        print(
+            f"{key[0]:17s} {key[1]:14s} "
+            f"{h['latency_ms']['p50']:>9.3f} ({p50:+6.1f}%) "
+            f"{h['latency_ms']['p99']:>9.3f} ({p99:+6.1f}%) "
+            f"{h['throughput_rps'] or 0:>9.1f} ({rps:+6.1f}%)"
+        )
+
+    if opts.fail_over is not None and worst > opts.fail_over:
+        print(f"p99 regression {worst:.1f}% exceeds {opts.fail_over}%", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
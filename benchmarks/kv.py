@@ -0,0 +1,117 @@
+# benchmarks/kv.py
+"""
+KvService backends side by side: Redis (redis-py against a server) vs the embedded
+in-process backend, driven directly from threads (no MCP transport in the way).
+
+Without --redis-url the Redis backend talks to the local RESP stub, which measures the
+client and network path rather than a real server; pass a URL to compare against Redis.
+
+    python -m benchmarks.kv --ops 20000 --threads 8
+    python -m benchmarks.kv --redis-url redis://127.0.0.1:6379/15 --aof
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from app.services.kvembedded import EmbeddedKvBackend
+from app.services.kvstore import KvService
+from benchmarks.run import _percentile
+from benchmarks.stubs import RedisStub
+
+Op = Callable[[KvService, int], Any]
+
+OPERATIONS: Dict[str, Op] = {
+    "put": lambda kv, i: kv.put(f"bench:{i % 1024}", "v" * 64, 60),
+    "get": lambda kv, i: kv.get(f"bench:{i % 1024}"),
+    "mget32": lambda kv, i: kv.mget([f"bench:{(i + k) % 1024}" for k in range(32)]),
+    "incr": lambda kv, i: kv.incr(f"ctr:{i % 16}"),
+}
+
+
+def run_op(kv: KvService, op: Op, *, ops: int, threads: int) -> Dict[str, Any]:
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+    per_thread = ops // threads
+
+    def worker(n: int) -> None:
+        out = latencies[n]
+        base = n * per_thread
+        for i in range(base, base + per_thread):
+            t0 = time.perf_counter()
+            op(kv, i)
+            out.append((time.perf_counter() - t0) * 1000)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - t0
+    ordered = sorted(x for lat in latencies for x in lat)
+    return {
+        "ops": len(ordered),
+        "threads": threads,
+        "throughput_ops": round(len(ordered) / wall, 2) if wall > 0 else None,
+        "latency_ms": {
+            "p50": round(_percentile(ordered, 50), 4),
+            "p99": round(_percentile(ordered, 99), 4),
+            "max": round(ordered[-1], 4) if ordered else 0.0,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--ops", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--redis-url", default="",
+                        help="real Redis to compare against (default: stub)")
+    parser.add_argument("--aof", action="store_true",
+                        help="enable the embedded AOF (fsync everysec)")
+    parser.add_argument("--out", default="", help="write JSON results here (default: stdout)")
+    opts = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    with contextlib.ExitStack() as stack:
+        url = opts.redis_url or stack.enter_context(RedisStub()).url
+        aof = None
+        if opts.aof:
+            aof = Path(stack.enter_context(tempfile.TemporaryDirectory())) / "appendonly.aof"
+        backends = {
+            "redis": KvService(url),
+            "embedded": KvService(backend=EmbeddedKvBackend(aof_path=aof)),
+        }
+        for name, kv in backends.items():
+            for op_name, op in OPERATIONS.items():
+                stats = run_op(kv, op, ops=opts.ops, threads=opts.threads)
+                results.append({"backend": name, "op": op_name, **stats})
+                print(
+                    f"{name:9s} {op_name:7s} {stats['throughput_ops']:>11} ops/s  "
+                    f"p50 {stats['latency_ms']['p50']:>8} ms  "
+                    f"p99 {stats['latency_ms']['p99']:>8} ms",
+                    file=sys.stderr,
+                )
+            kv.close()
+
+    text = json.dumps({"meta": {"ops": opts.ops, "threads": opts.threads, "aof": opts.aof,
+                                "redis": "url" if opts.redis_url else "stub"},
+                       "results": results}, indent=2)
+    if opts.out:
+        with open(opts.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/parse.py
+"""
+Server-side cost of turning a tools/call body into the tool's input model, for large
+payloads: the generic path (json.loads of the envelope, then model validation of the
+arguments dict) vs the one-pass path (build_call_adapter: model_validate_json of the
+whole message). Reports CPU per call and peak traced memory of one call.
+
+End-to-end runs (benchmarks/run.py) include client encoding and the handler, which
+hide this step; this isolates it.
+
+    python -m benchmarks.parse --payload-bytes 2000000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from server.registry import ToolSpec, build_call_adapter
+from server.tools.artifacts import ArtifactLogIn
+from server.tools.files import FsWriteIn
+from server.tools.json_validate import JsonValidateIn
+
+
+def _messages(payload_bytes: int) -> Dict[str, bytes]:
+    arguments = {
+        "fs_write": {"path": "bench/large.txt", "content": "x" * payload_bytes},
+        "json_validate": {
+            "instance": {"items": list(range(max(1, payload_bytes // 8)))},
+            "schema": {"type": "object"},
+        },
+        "artifact_log": {"tag": "bench", "content": {
+            "rows": [{"i": i, "v": "x" * 24} for i in range(payload_bytes // 40)]
+        }},
+    }
+    return {
+        name: json.dumps({"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                          "params": {"name": name, "arguments": args}}).encode()
+        for name, args in arguments.items()
+    }
+
+
+def _measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    fn()
+    cpu0 = time.process_time()
+    for _ in range(repeat):
+        fn()
+    cpu_ms = (time.process_time() - cpu0) / repeat * 1000
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"cpu_ms": round(cpu_ms, 3), "peak_traced_bytes": peak}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--payload-bytes", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    opts = parser.parse_args()
+
+    registry = {
+        name: ToolSpec(name=name, description=name, input_model=model, handler=lambda a: a)
+        for name, model in (("fs_write", FsWriteIn), ("json_validate", JsonValidateIn),
+                            ("artifact_log", ArtifactLogIn))
+    }
+    adapter = build_call_adapter(registry)
+
+    results: List[Dict[str, Any]] = []
+    for name, body in _messages(opts.payload_bytes).items():
+        spec = registry[name]
+
+        def generic(body=body, spec=spec):
+            return spec.validate(json.loads(body)["params"]["arguments"])
+
+        def one_pass(body=body):
+            return adapter.validate_json(body).params.arguments
+
+        for path, fn in (("generic", generic), ("one_pass", one_pass)):
+            stats = _measure(fn, opts.repeat)
+            results.append({"tool": name, "path": path, "body_bytes": len(body), **stats})
+            print(f"{name:14s} {path:9s} {stats['cpu_ms']:>9} ms cpu  "
+                  f"peak {stats['peak_traced_bytes']:>10} B", file=sys.stderr)
+
+    print(json.dumps({"payload_bytes": opts.payload_bytes, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/pipeline.py
+"""
+http_fetch -> json_validate -> artifact_log as three client round trips (the fetched
+body travels to the client and back) vs one tool_pipeline call, against a uvicorn
+subprocess. Reports latency and the bytes each sequence puts on the wire.
+
+    python -m benchmarks.pipeline --body-bytes 1000000 --requests 50
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.run import TOKEN, _free_port, _percentile, _wait_for_port
+from benchmarks.stubs import LocalHttpOrigin
+
+SCHEMA = {"type": "object", "required": ["data"], "properties": {"data": {"type": "string"}}}
+_ids = itertools.count(1)
+
+
+async def _call(client: httpx.AsyncClient, name: str, arguments: Dict[str, Any]) -> Tuple[Any, int]:
+    body = json.dumps({"jsonrpc": "2.0", "id": next(_ids), "method": "tools/call",
+                       "params": {"name": name, "arguments": arguments}}).encode()
+    resp = await client.post("/mcp", content=body, headers={"Authorization": f"Bearer {TOKEN}"})
+    reply = resp.json()
+    if "error" in reply:
+        raise RuntimeError(reply["error"])
+    block = reply["result"]["content"][0]
+    return block.get("json", block.get("text")), len(body) + len(resp.content)
+
+
+async def round_trips(client: httpx.AsyncClient, url: str) -> int:
+    fetched, n1 = await _call(client, "http_fetch", {"url": url})
+    _, n2 = await _call(client, "json_validate", {"instance": fetched["body"], "schema": SCHEMA})
+    _, n3 = await _call(client, "artifact_log", {"tag": "bench", "content": fetched["body"]})
+    return n1 + n2 + n3
+
+
+async def pipeline(client: httpx.AsyncClient, url: str) -> int:
+    _, n = await _call(client, "tool_pipeline", {
+        "steps": [
+            {"id": "fetch", "tool": "http_fetch", "arguments": {"url": url}},
+            {"id": "check", "tool": "json_validate",
+             "arguments": {"instance": {"$ref": "fetch.body"}, "schema": SCHEMA}},
+            {"id": "log", "tool": "artifact_log", "after": ["check"],
+             "arguments": {"tag": "bench", "content": {"$ref": "fetch.body"}}},
+        ],
+        "outputs": ["check.valid", "log.ts"],
+    })
+    return n
+
+
+async def main_async(opts: argparse.Namespace) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    with LocalHttpOrigin() as origin:
+        port = _free_port()
+        env = {**os.environ, "SANDBOX_ROOT": tempfile.mkdtemp(prefix="mcp-bench-"),
+               "REDIS_URL": "", "HTTP_ALLOWLIST": "localhost", "MCP_HTTP_BEARER_TOKEN": TOKEN,
+               "HTTP_MAX_BYTES": str(opts.body_bytes * 2), "LOG_LEVEL": "WARNING",
+               "TOOL_SINGLE_FLIGHT": "false", "TOOL_CACHE_MAX_BYTES": "0"}
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.serve", "http", "--port", str(port)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            await _wait_for_port(port)
+            base_url = f"http://127.0.0.1:{port}"
+            async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+                for name, flow in (("round_trips", round_trips), ("pipeline", pipeline)):
+                    latencies: List[float] = []
+                    wire = 0
+                    for i in range(opts.requests):
+                        t0 = time.perf_counter()
+                        wire = await flow(client, origin.url(f"bytes/{opts.body_bytes}?i={i}"))
+                        latencies.append((time.perf_counter() - t0) * 1000)
+                    ordered = sorted(latencies)
+                    stats = {"flow": name, "wire_bytes": wire,
+                             "p50_ms": round(_percentile(ordered, 50), 3),
+                             "p99_ms": round(_percentile(ordered, 99), 3)}
+                    results.append(stats)
+                    print(f"{name:12s} p50 {stats['p50_ms']:>9} ms  p99 {stats['p99_ms']:>9} ms  "
+                          f"wire {wire:>10} B", file=sys.stderr)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+    return {"body_bytes": opts.body_bytes, "requests": opts.requests, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--body-bytes", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=50)
+    opts = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(opts)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+# benchmarks/run.py
+"""
+Throughput and p50/p99 latency for every registered tool over both transports.
+
+Transports:
+  asgi              server/http_app.py in-process (httpx ASGITransport, no sockets)
+  uvicorn           server/http_app.py behind a real uvicorn subprocess
+  stdio             server/main.py over stdio (FastMCP host)
+  stdio-concurrent  server/main.py over stdio with MCP_STDIO_CONCURRENT=true
+
+Local stand-ins replace external services: a threaded HTTP origin for http_fetch and a
+Redis-compatible stub for kv_* (or the embedded backend with --kv-backend embedded).
+Results are written as JSON (see benchmarks/compare.py).
+
+--client-timeout-ms makes clients give up like real agents do: HTTP clients send the
+deadline header and drop the request at the timeout, stdio clients send
+params._meta.timeoutMs and notifications/cancelled. The `http_fetch_mixed` workload
+(every 4th fetch hangs for 2s) shows whether abandoned calls free server capacity.
+
+    python -m benchmarks.run --requests 200 --concurrency 8 --out bench.json
+    python -m benchmarks.run --transports uvicorn --tools http_fetch_mixed \
+        --client-timeout-ms 250 --concurrency 32
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.stubs import LocalHttpOrigin, RedisStub
+
+TOKEN = "bench-token"
+TRANSPORTS = ("asgi", "uvicorn", "stdio", "stdio-concurrent")
+
+ArgsFactory = Callable[[int], Dict[str, Any]]
+
+
+# ---------- Workloads ----------
+
+def build_workloads(
+    origin: LocalHttpOrigin, payload_bytes: int
+) -> Dict[str, Tuple[str, ArgsFactory]]:
+    """
+    Workload name -> (tool name, arguments for the i-th request).
+    """
+    content = "x" * payload_bytes
+    # ~payload_bytes of JSON once encoded (about 8 bytes per integer)
+    large_instance = {"items": list(range(max(1, payload_bytes // 8)))}
+    schema = {
+        "type": "object",
+        "properties": {"items": {"type": "array", "items": {"type": "integer", "minimum": 0}}},
+        "required": ["items"],
+    }
+    return {
+        "fs_write": ("fs_write", lambda i: {"path": f"bench/w-{i % 16}.txt", "content": content}),
+        "fs_read": ("fs_read", lambda i: {"path": "bench/read.txt"}),
+        "http_fetch": ("http_fetch", lambda i: {"url": origin.url("bytes/4096")}),
+        # Unique URLs so single-flight does not collapse the slow calls
+        "http_fetch_mixed": ("http_fetch", lambda i: {
+            "url": origin.url(f"delay/2000?i={i}" if i % 4 == 0 else f"bytes/4096?i={i}"),
+        }),
+        "json_validate": ("json_validate", lambda i: {
+            "instance": {"items": list(range(100))}, "schema": schema,
+        }),
+        "json_validate_large": ("json_validate", lambda i: {
+            "instance": large_instance, "schema": schema,
+        }),
+        "artifact_log": ("artifact_log", lambda i: {
+            "tag": "bench", "content": {"i": i, "note": "benchmark"}, "corr": "bench",
+        }),
+        "artifact_list": ("artifact_list", lambda i: {"tag": "bench", "limit": 50}),
+        "kv_put": ("kv_put", lambda i: {"key": f"bench:{i % 64}", "value": "v" * 64, "ttlSec": 60}),
+        "kv_get": ("kv_get", lambda i: {"key": f"bench:{i % 64}"}),
+        "kv_mset": ("kv_mset", lambda i: {"items": [
+            {"key": f"bench:{k}", "value": "v" * 64, "ttlSec": 60} for k in range(32)
+        ]}),
+        "kv_mget": ("kv_mget", lambda i: {"keys": [f"bench:{k}" for k in range(32)]}),
+    }
+
+
+def prepare_sandbox(root: str, payload_bytes: int) -> None:
+    os.makedirs(os.path.join(root, "bench"), exist_ok=True)
+    with open(os.path.join(root, "bench", "read.txt"), "w", encoding="utf-8") as f:
+        f.write("x" * payload_bytes)
+
+
+# ---------- Clients ----------
+
+def _is_error(reply: Dict[str, Any]) -> bool:
+    return "error" in reply or bool((reply.get("result") or {}).get("isError"))
+
+
+class HttpMcpClient:
+    """
+    JSON-RPC over HTTP POST, either in-process (ASGI) or against a uvicorn subprocess.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, path: str = "/mcp", timeout_ms: float = 0):
+        self.client = client
+        self.path = path
+        self.timeout_ms = timeout_ms
+        self._ids = itertools.count(1)
+
+    async def call(self, tool: str, arguments: Dict[str, Any]) -> bool:
+        msg = {"jsonrpc": "2.0", "id": next(self._ids), "method": "tools/call",
+               "params": {"name": tool, "arguments": arguments}}
+        headers = {"Authorization": f"Bearer {TOKEN}"}
+        if not self.timeout_ms:
+            resp = await self.client.post(self.path, json=msg, headers=headers)
+            return resp.status_code == 200 and not _is_error(resp.json())
+        # Give up at the deadline and hang up, as a client with a timeout would
+        headers["X-Request-Timeout-Ms"] = str(self.timeout_ms)
+        try:
+            resp = await asyncio.wait_for(
+                self.client.post(self.path, json=msg, headers=headers), self.timeout_ms / 1000
+            )
+        except asyncio.TimeoutError:
+            return False
+        return resp.status_code == 200 and not _is_error(resp.json())
+
+    async def tool_names(self) -> List[str]:
+        resp = await self.client.post(
+            self.path,
+            json={"jsonrpc": "2.0", "id": 0, "method": "tools/list", "params": {}},
+            headers={"Authorization": f"Bearer {TOKEN}"},
+        )
+        return [t["name"] for t in resp.json()["result"]["tools"]]
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class StdioMcpClient:
+    """
+    Newline-delimited JSON-RPC to a server subprocess; replies are matched by id so many
+    requests can be in flight at once.
+    """
+
+    def __init__(self, proc: asyncio.subprocess.Process, wrap_input: bool, timeout_ms: float = 0):
+        self.proc = proc
+        # FastMCP tools take a single `input` parameter (the tool's input model)
+        self.wrap_input = wrap_input
+        self.timeout_ms = timeout_ms
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader = asyncio.create_task(self._read_loop())
+
+    @classmethod
+    async def start(
+        cls, env: Dict[str, str], concurrent: bool, timeout_ms: float = 0
+    ) -> "StdioMcpClient":
+        env = {**env, "MCP_STDIO_CONCURRENT": "true" if concurrent else "false"}
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.serve", "stdio",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL, env=env, limit=1 << 26,
+        )
+        client = cls(proc, wrap_input=not concurrent, timeout_ms=timeout_ms)
+        await client.request("initialize", {
+            "protocolVersion": "2025-03-26",
+            "capabilities": {},
+            "clientInfo": {"name": "acme-bench", "version": "0.1.0"},
+        })
+        await client.notify("notifications/initialized")
+        return client
+
+    async def _read_loop(self) -> None:
+        assert self.proc.stdout is not None
+        while True:
+            line = await self.proc.stdout.readline()
+            if not line:
+                break
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            fut = self._pending.pop(msg.get("id"), None) if isinstance(msg, dict) else None
+            if fut is not None and not fut.done():
+                fut.set_result(msg)
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError("stdio server exited"))
+
+    async def _send(self, msg: Dict[str, Any]) -> None:
+        assert self.proc.stdin is not None
+        self.proc.stdin.write(json.dumps(msg).encode("utf-8") + b"\n")
+        await self.proc.stdin.drain()
+
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None) -> None:
+        await self._send({"jsonrpc": "2.0", "method": method, "params": params or {}})
+
+    async def request(
+        self, method: str, params: Dict[str, Any], timeout_ms: float = 0
+    ) -> Dict[str, Any]:
+        id_ = next(self._ids)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[id_] = fut
+        await self._send({"jsonrpc": "2.0", "id": id_, "method": method, "params": params})
+        if not timeout_ms:
+            return await fut
+        try:
+            return await asyncio.wait_for(fut, timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            self._pending.pop(id_, None)
+            await self.notify("notifications/cancelled", {"requestId": id_, "reason": "timeout"})
+            raise
+
+    async def call(self, tool: str, arguments: Dict[str, Any]) -> bool:
+        args = {"input": arguments} if self.wrap_input else arguments
+        params: Dict[str, Any] = {"name": tool, "arguments": args}
+        if self.timeout_ms:
+            params["_meta"] = {"timeoutMs": self.timeout_ms}
+        try:
+            reply = await self.request("tools/call", params, timeout_ms=self.timeout_ms)
+        except asyncio.TimeoutError:
+            return False
+        return not _is_error(reply)
+
+    async def tool_names(self) -> List[str]:
+        reply = await self.request("tools/list", {})
+        return [t["name"] for t in reply["result"]["tools"]]
+
+    async def close(self) -> None:
+        if self.proc.stdin is not None:
+            self.proc.stdin.close()
+        try:
+            await asyncio.wait_for(self.proc.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            self.proc.kill()
+        self._reader.cancel()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_for_port(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"uvicorn did not start on port {port}")
+
+
+async def open_client(transport: str, env: Dict[str, str], timeout_ms: float = 0):
+    """
+    Returns (client, cleanup) for the given transport.
+    """
+    if transport == "asgi":
+        from benchmarks.serve import allow_loopback_fetch
+
+        allow_loopback_fetch()
+        from server.http_app import app
+
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+        client = HttpMcpClient(http, timeout_ms=timeout_ms)
+        return client, client.close
+
+    if transport == "uvicorn":
+        port = _free_port()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.serve", "http", "--port", str(port)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        await _wait_for_port(port)
+        client = HttpMcpClient(httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            limits=httpx.Limits(max_connections=256),
+            timeout=60,
+        ), timeout_ms=timeout_ms)
+
+        async def cleanup() -> None:
+            await client.close()
+            proc.terminate()
+            proc.wait(timeout=10)
+
+        return client, cleanup
+
+    stdio = await StdioMcpClient.start(env, concurrent=transport == "stdio-concurrent",
+                                       timeout_ms=timeout_ms)
+    return stdio, stdio.close
+
+
+# ---------- Measurement ----------
+
+def _percentile(sorted_ms: List[float], pct: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    idx = min(len(sorted_ms) - 1, max(0, int(round(pct / 100 * len(sorted_ms))) - 1))
+    return sorted_ms[idx]
+
+
+async def run_workload(
+    client, tool: str, args_for: ArgsFactory, *, requests: int, concurrency: int, warmup: int,
+    measure_memory: bool = False,
+) -> Dict[str, Any]:
+    for i in range(warmup):
+        await client.call(tool, args_for(i))
+
+    latencies: List[float] = []
+    errors = 0
+    indices = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in indices:
+            t0 = time.perf_counter()
+            try:
+                ok = await client.call(tool, args_for(i))
+            except Exception:
+                ok = False
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if not ok:
+                errors += 1
+
+    if measure_memory:
+        tracemalloc.start()
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    peak = None
+    if measure_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    ordered = sorted(latencies)
+    result: Dict[str, Any] = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_sec": round(wall, 4),
+        "throughput_rps": round(requests / wall, 2) if wall > 0 else None,
+        "latency_ms": {
+            "p50": round(_percentile(ordered, 50), 3),
+            "p90": round(_percentile(ordered, 90), 3),
+            "p99": round(_percentile(ordered, 99), 3),
+            "max": round(ordered[-1], 3) if ordered else 0.0,
+            "mean": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        },
+        # Benchmark process only: includes the server for `asgi`, the client otherwise
+        "client_cpu_sec": round(cpu, 4),
+    }
+    if peak is not None:
+        result["peak_traced_bytes"] = peak
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def main_async(opts: argparse.Namespace) -> Dict[str, Any]:
+    sandbox = tempfile.mkdtemp(prefix="mcp-bench-")
+    prepare_sandbox(sandbox, opts.payload_bytes)
+    results: List[Dict[str, Any]] = []
+
+    with LocalHttpOrigin() as origin, RedisStub() as redis_stub:
+        env = {
+            **os.environ,
+            "SANDBOX_ROOT": sandbox,
+            "REDIS_URL": redis_stub.url,
+            "KV_BACKEND": opts.kv_backend,
+            "HTTP_ALLOWLIST": "localhost",
+            "MCP_HTTP_BEARER_TOKEN": TOKEN,
+            # Measure the server, not admission control
+            "MCP_HTTP_TOKEN_MAX_CONCURRENCY": "0",
+            "MCP_HTTP_MAX_IN_FLIGHT": "0",
+            "LOG_LEVEL": "WARNING",
+        }
+        # The in-process transport reads settings from this process's environment
+        os.environ.update(env)
+        workloads = build_workloads(origin, opts.payload_bytes)
+        selected = opts.tools.split(",") if opts.tools else list(workloads)
+
+        for transport in opts.transports.split(","):
+            client, cleanup = await open_client(transport, env, opts.client_timeout_ms)
+            try:
+                available = set(await client.tool_names())
+                for name in selected:
+                    tool, args_for = workloads[name]
+                    if tool not in available:
+                        continue
+                    stats = await run_workload(
+                        client, tool, args_for,
+                        requests=opts.requests, concurrency=opts.concurrency,
+                        warmup=opts.warmup,
+                        measure_memory=opts.tracemalloc and transport == "asgi",
+                    )
+                    results.append(
+                        {"transport": transport, "workload": name, "tool": tool, **stats}
+                    )
+                    print(
+                        f"{transport:17s} {name:14s} {stats['throughput_rps']:>9} rps  "
+                        f"p50 {stats['latency_ms']['p50']:>8} ms  "
+                        f"p99 {stats['latency_ms']['p99']:>8} ms  errors {stats['errors']}",
+                        file=sys.stderr,
+                    )
+            finally:
+                await cleanup()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": opts.requests,
+            "concurrency": opts.concurrency,
+            "warmup": opts.warmup,
+            "payload_bytes": opts.payload_bytes,
+            "kv_backend": opts.kv_backend,
+            "client_timeout_ms": opts.client_timeout_ms,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--transports", default=",".join(TRANSPORTS))
+    parser.add_argument("--tools", default="", help="comma-separated workload names (default: all)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--payload-bytes", type=int, default=1024,
+                        help="size of fs_write content / fs_read file")
+    parser.add_argument("--kv-backend", choices=["redis", "embedded"], default="redis",
+                        help="backend behind kv_* (redis = local RESP stub)")
+    parser.add_argument("--client-timeout-ms", type=float, default=0,
+                        help="clients abandon calls after this long (0 = wait forever)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="record peak traced memory for the in-process transport")
+    parser.add_argument("--out", default="", help="write JSON results here (default: stdout)")
+    opts = parser.parse_args()
+
+    report = asyncio.run(main_async(opts))
+    text = json.dumps(report, indent=2)
+    if opts.out:
+        with open(opts.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
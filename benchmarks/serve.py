@@ -0,0 +1,40 @@
+# benchmarks/serve.py
+"""
+Server entrypoints for benchmark subprocesses.
+
+http_fetch refuses loopback targets (SSRF guard), so the benchmark origin on 127.0.0.1
+would be rejected; these wrappers lift that single check in the benchmark process only.
+
+    python -m benchmarks.serve http --port 8181
+    python -m benchmarks.serve stdio
+"""
+from __future__ import annotations
+
+import argparse
+import runpy
+
+
+def allow_loopback_fetch() -> None:
+    import app.services.httpclient as httpclient
+
+    httpclient._host_resolves_to_private = lambda host: False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("transport", choices=["http", "stdio"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8181)
+    args = parser.parse_args()
+
+    allow_loopback_fetch()
+    if args.transport == "http":
+        import uvicorn
+
+        uvicorn.run("server.http_app:app", host=args.host, port=args.port, log_level="warning")
+    else:
+        runpy.run_module("server.main", run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# benchmarks/stubs.py
+from __future__ import annotations
+
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# ---------- Local HTTP origin for http_fetch ----------
+
+class _OriginHandler(BaseHTTPRequestHandler):
+    """
+    GET /bytes/<n>  -> n bytes of JSON-ish payload
+    GET /delay/<ms> -> small JSON body after sleeping ms milliseconds
+    (query strings are ignored, so callers can make URLs unique)
+    anything else   -> {"ok": true}
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "bytes" and parts[1].isdigit():
+            body = (b'{"data":"' + b"x" * max(0, int(parts[1]) - 11) + b'"}')
+        elif len(parts) == 2 and parts[0] == "delay" and parts[1].isdigit():
+            time.sleep(int(parts[1]) / 1000)
+            body = b'{"ok":true}'
+        else:
+            body = b'{"ok":true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (benchmarks with --client-timeout-ms)
+
+    def log_message(self, format, *args):  # keep benchmark output clean
+        pass
+
+
+class LocalHttpOrigin:
+    """
+    Threaded HTTP server on 127.0.0.1 (random port) used as the http_fetch target.
+    """
+
+    def __init__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _OriginHandler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def url(self, path: str = "") -> str:
+        return f"http://localhost:{self.port}/{path.lstrip('/')}"
+
+    def __enter__(self) -> "LocalHttpOrigin":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# ---------- Redis-compatible stub for kv_* ----------
+
+class _Store:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough RESP for redis-py: strings with EX/PX, MGET/MSET, DEL, INCR(BY), TTLs,
+    MULTI/EXEC (WATCH is accepted but not enforced), HELLO and connection housekeeping.
+    """
+
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        # RESP3 (after HELLO 3) encodes nil as "_" instead of "$-1"
+        self.null = b"$-1\r\n"
+        queued: Optional[List[List[bytes]]] = None
+        while True:
+            cmd = self._read_command()
+            if cmd is None:
+                return
+            name = cmd[0].upper()
+            if name == b"MULTI":
+                queued = []
+                self._write(b"+OK\r\n")
+            elif name == b"EXEC" and queued is not None:
+                replies = [self._execute(c) for c in queued]
+                queued = None
+                self._write(b"*%d\r\n" % len(replies) + b"".join(replies))
+            elif name == b"DISCARD":
+                queued = None
+                self._write(b"+OK\r\n")
+            elif queued is not None:
+                queued.append(cmd)
+                self._write(b"+QUEUED\r\n")
+            else:
+                self._write(self._execute(cmd))
+
+    def _read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def _write(self, data: bytes) -> None:
+        self.wfile.write(data)
+
+    def _execute(self, cmd: List[bytes]) -> bytes:
+        store: _Store = self.server.store  # type: ignore[attr-defined]
+        name, args = cmd[0].upper(), cmd[1:]
+        now = time.monotonic()
+        with store.lock:
+            if name == b"PING":
+                return b"+PONG\r\n"
+            if name == b"HELLO":
+                proto = int(args[0]) if args else 2
+                self.null = b"_\r\n" if proto == 3 else b"$-1\r\n"
+                fields = [b"$6\r\nserver\r\n$5\r\nredis\r\n", b"$7\r\nversion\r\n$5\r\n7.2.0\r\n",
+                          b"$5\r\nproto\r\n:%d\r\n" % proto]
+                head = b"%%%d\r\n" % len(fields) if proto == 3 else b"*%d\r\n" % (2 * len(fields))
+                return head + b"".join(fields)
+            if name in (b"SELECT", b"CLIENT", b"WATCH", b"UNWATCH", b"FLUSHDB"):
+                if name == b"FLUSHDB":
+                    store.data.clear()
+                return b"+OK\r\n"
+            if name == b"GET":
+                return self._bulk(store.get(args[0]))
+            if name == b"SET":
+                expires = None
+                opts = [a.upper() for a in args[2:]]
+                for i, opt in enumerate(opts):
+                    if opt == b"EX":
+                        expires = now + int(args[3 + i])
+                    elif opt == b"PX":
+                        expires = now + int(args[3 + i]) / 1000
+                if b"NX" in opts and store.get(args[0]) is not None:
+                    return self.null
+                store.data[args[0]] = (args[1], expires)
+                return b"+OK\r\n"
+            if name == b"MGET":
+                return b"*%d\r\n" % len(args) + b"".join(self._bulk(store.get(k)) for k in args)
+            if name == b"MSET":
+                for k, v in zip(args[::2], args[1::2]):
+                    store.data[k] = (v, None)
+                return b"+OK\r\n"
+            if name == b"DEL":
+                n = 0
+                for k in args:
+                    if store.get(k) is not None:
+                        del store.data[k]
+                        n += 1
+                return b":%d\r\n" % n
+            if name in (b"INCR", b"INCRBY"):
+                step = int(args[1]) if name == b"INCRBY" else 1
+                current = store.get(args[0])
+                expires = store.data[args[0]][1] if current is not None else None
+                value = int(current or b"0") + step
+                store.data[args[0]] = (str(value).encode(), expires)
+                return b":%d\r\n" % value
+            if name in (b"EXPIRE", b"PEXPIRE"):
+                if store.get(args[0]) is None:
+                    return b":0\r\n"
+                secs = int(args[1]) / (1000 if name == b"PEXPIRE" else 1)
+                store.data[args[0]] = (store.data[args[0]][0], now + secs)
+                return b":1\r\n"
+            if name in (b"TTL", b"PTTL"):
+                if store.get(args[0]) is None:
+                    return b":-2\r\n"
+                expires = store.data[args[0]][1]
+                if expires is None:
+                    return b":-1\r\n"
+                scale = 1000 if name == b"PTTL" else 1
+                return b":%d\r\n" % int((expires - now) * scale)
+        return b"-ERR unknown command '" + name + b"'\r\n"
+
+    def _bulk(self, value: Optional[bytes]) -> bytes:
+        if value is None:
+            return self.null
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class _ThreadingTcpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RedisStub:
+    """
+    In-memory Redis stand-in on 127.0.0.1 (random port); good enough for kv_* tools.
+    """
+
+    def __init__(self):
+        self._server = _ThreadingTcpServer(("127.0.0.1", 0), _RespHandler)
+        self._server.store = _Store()  # type: ignore[attr-defined]
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def __enter__(self) -> "RedisStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
@@ -1,14 +1,20 @@
 # server/http_app.py
 from __future__ import annotations
 
-from typing import Any, Dict, Callable
+from typing import Any, Dict, Callable, Optional
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, ValidationError
+import anyio
 import json
+import time
 
-from app.di import build_container
+from app.admission import TokenPolicy, build_admission
+from app.cancellation import CallCancelled, CancelToken, InFlightCalls, timeout_from
+from app.compression import compress_body, enabled_codecs, negotiate
 from app.config import Settings
+from app.metrics import METRICS
+from app.profiling import PROFILER
 
 # Import the input models from existing tools
 from server.tools.files import FsWriteIn
@@ -17,12 +23,40 @@ from server.tools.http_fetch import FetchIn
 from server.tools.json_validate import JsonValidateIn
 from server.tools.artifacts import ArtifactLogIn, ArtifactListIn
 
-from server.registry import build_tool_registry, list_tools_payload, dispatch_tool_call
+from server.registry import (
+    build_call_adapter,
+    build_tool_registry,
+    dispatch_tool_call,
+    jsonrpc_error_code,
+    list_tools_payload,
+    observe_payload_sizes,
+    tool_result_payload,
+)
 
 app = FastAPI(title="MCP HTTP Server", version="0.1.0")
 settings = Settings()
-container = build_container()
 REGISTRY = build_tool_registry()
+CALL_ADAPTER = build_call_adapter(REGISTRY)
+ADMISSION = build_admission(settings)
+ALLOWED_ORIGINS = frozenset(
+    o.strip().lower() for o in settings.MCP_HTTP_ALLOWED_ORIGINS.split(",") if o.strip()
+)
+# In-flight tools/call tokens by (client name, request id), for notifications/cancelled
+IN_FLIGHT = InFlightCalls()
+CODECS = enabled_codecs(settings.MCP_HTTP_COMPRESSION.split(","))
+# Bodies above this are compressed in a worker thread rather than on the event loop
+COMPRESS_INLINE_MAX_BYTES = 256 * 1024
+# Cancellation notifications are tiny; bodies up to this size are peeked before admission
+CANCEL_PEEK_MAX_BYTES = 1024
+_TOO_LARGE = METRICS.counter(
+    "mcp_http_requests_too_large_total",
+    "Requests rejected for exceeding MCP_HTTP_MAX_REQUEST_BYTES",
+    ("client",),
+)
+
+if settings.METRICS_MULTIPROC_DIR:
+    # One snapshot file per uvicorn worker; any worker can serve the merged totals
+    METRICS.enable_multiprocess(settings.METRICS_MULTIPROC_DIR, settings.METRICS_FLUSH_INTERVAL_SEC)
 
 
 PROTOCOL_VERSION = "2025-03-26"  # aligns with current spec draft dates
@@ -33,16 +67,16 @@ def _origin_allowed(req: Request) -> bool:
     origin = req.headers.get("origin")
     if not origin:
         return settings.MCP_HTTP_ALLOW_NO_ORIGIN
-    allowed = {o.strip().lower() for o in settings.MCP_HTTP_ALLOWED_ORIGINS.split(",") if o.strip()}
-    return origin.lower() in allowed
+    return origin.lower() in ALLOWED_ORIGINS
 
-def _require_auth(req: Request):
+def _require_auth(req: Request) -> TokenPolicy:
     auth = req.headers.get("authorization", "")
     if not auth.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing Bearer token")
-    token = auth.split(" ", 1)[1]
-    if token != settings.MCP_HTTP_BEARER_TOKEN:
+    policy = ADMISSION.identify(auth.split(" ", 1)[1])
+    if policy is None:
         raise HTTPException(status_code=401, detail="Invalid Bearer token")
+    return policy
 
 @app.middleware("http")
 async def origin_validation_mw(request: Request, call_next):
@@ -73,17 +107,141 @@ def _jsonrpc_result(id_: Any, result: Any) -> JSONResponse:
 
 @app.post(settings.MCP_HTTP_PATH)
 async def mcp_endpoint(request: Request):
-    _require_auth(request)
+    client = _require_auth(request)
+    # notifications/cancelled frees a slot, so it must not be shed along with the
+    # calls it cancels: small bodies are checked for it before admission
+    if await _cancel_notification(request, client):
+        return Response(status_code=202)
+    # Shed load before reading or parsing the body
+    rejection = ADMISSION.admit(client)
+    if rejection is not None:
+        return JSONResponse(
+            {"jsonrpc": "2.0", "id": None, "error": {
+                "code": -32000,
+                "message": "Server busy" if rejection.status == 503 else "Too many requests",
+                "data": {"reason": rejection.reason, "retryAfterSec": rejection.retry_after},
+            }},
+            status_code=rejection.status,
+            headers={"Retry-After": str(rejection.retry_after)},
+        )
+    try:
+        response = await _handle_message(request, client)
+    finally:
+        ADMISSION.release(client)
+    return await _compress(request, response)
+
+
+async def _cancel_notification(request: Request, client: TokenPolicy) -> bool:
+    """
+    Handle a notifications/cancelled without taking an admission slot; False for
+    anything else (including bodies too large or unannounced to peek at).
+    """
+    declared = request.headers.get("content-length")
+    if declared is None or not declared.isdigit() or int(declared) > CANCEL_PEEK_MAX_BYTES:
+        return False
+    body = await request.body()  # cached: the normal path reads it again from memory
+    if b'"notifications/cancelled"' not in body:
+        return False
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return False
+    if not isinstance(payload, dict) or "id" in payload:
+        return False
+    if payload.get("method") != "notifications/cancelled":
+        return False
+    _cancel_in_flight(client, payload.get("params"))
+    return True
+
+
+def _cancel_in_flight(client: TokenPolicy, params: Any) -> None:
+    if isinstance(params, dict):
+        reason = params.get("reason") or "cancelled"
+        IN_FLIGHT.cancel((client.name, params.get("requestId")), reason)
+
+
+async def _read_body(request: Request, limit: int) -> Optional[bytearray]:
+    """
+    Read the request body chunk by chunk, giving up (None) as soon as it exceeds `limit`
+    bytes, so an oversized or endless upload never sits in memory whole.
+    """
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > limit:
+        return None
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            return None
+    return body
+
+
+async def _compress(request: Request, response: Response) -> Response:
+    """
+    Compress a JSON-RPC response with the best encoding the client accepts, when it
+    is at least MCP_HTTP_COMPRESS_MIN_BYTES.
+    """
+    body = response.body
+    if len(body) < settings.MCP_HTTP_COMPRESS_MIN_BYTES or "content-encoding" in response.headers:
+        return response
+    # The body depends on Accept-Encoding from here on, whether or not it is compressed
+    response.headers["vary"] = "Accept-Encoding"
+    codec = negotiate(request.headers.get("accept-encoding"), CODECS)
+    if codec is None:
+        return response
+    if len(body) > COMPRESS_INLINE_MAX_BYTES:
+        compressed = await anyio.to_thread.run_sync(compress_body, codec, body)
+    else:
+        compressed = compress_body(codec, body)
+    if compressed is not None:
+        response.body = compressed
+        response.headers["content-encoding"] = codec.name
+        response.headers["content-length"] = str(len(compressed))
+    return response
+
+
+async def _handle_message(request: Request, client: TokenPolicy) -> Response:
+    body = await _read_body(request, settings.MCP_HTTP_MAX_REQUEST_BYTES)
+    if body is None:
+        _TOO_LARGE.inc(client.name)
+        return JSONResponse(
+            {"jsonrpc": "2.0", "id": None, "error": {
+                "code": -32600, "message": "Request too large",
+                "data": {"maxBytes": settings.MCP_HTTP_MAX_REQUEST_BYTES},
+            }},
+            status_code=413,
+        )
+    parse_start = time.perf_counter()
+
+    # Fast path: a well-formed tools/call is parsed and validated in one pass from raw
+    # bytes; everything else (and any failure) goes through the generic path below.
+    if b'"tools/call"' in body:
+        try:
+            call = CALL_ADAPTER.validate_json(body)
+        except ValidationError:
+            pass
+        else:
+            parse_sec = time.perf_counter() - parse_start
+            return await _call_tool(request, client, call.id, call.params.name,
+                                    call.params.arguments, call.params.meta, body, parse_sec)
 
     try:
-        payload = await request.json()
+        payload = json.loads(body)
     except Exception:
         return JSONResponse({"jsonrpc":"2.0","id":None,"error":{"code":-32700,"message":"Parse error"}})
 
+    parse_sec = time.perf_counter() - parse_start
+
     id_ = payload.get("id")
     method = payload.get("method")
     params = payload.get("params", {})
 
+    if "id" not in payload:
+        # Notifications get no JSON-RPC response
+        if method == "notifications/cancelled":
+            _cancel_in_flight(client, params)
+        return Response(status_code=202)
+
     if method == "initialize":
         return JSONResponse({
             "jsonrpc": "2.0",
@@ -99,23 +257,94 @@ async def mcp_endpoint(request: Request):
         return JSONResponse({"jsonrpc":"2.0","id":id_, "result": list_tools_payload(REGISTRY)})
 
     if method == "tools/call":
-        name = params.get("name")
-        args = params.get("arguments", {})
+        return await _call_tool(request, client, id_, params.get("name"),
+                                params.get("arguments", {}), params.get("_meta"), body, parse_sec)
+
+    return JSONResponse({"jsonrpc":"2.0","id":id_, "error":{"code":-32601,"message": f"Method not found: {method}"}})
+
+
+async def _call_tool(
+    request: Request,
+    client: TokenPolicy,
+    id_: Any,
+    name: Any,
+    args: Any,
+    meta: Optional[Dict[str, Any]],
+    body: bytearray,
+    parse_sec: float,
+) -> JSONResponse:
+    """
+    Dispatch a tools/call; `args` is a dict (generic path) or a validated model (fast path).
+
+    The handler runs in a worker thread under a CancelToken carrying the client's deadline
+    (header or `params._meta.timeoutMs`); the token is cancelled if the client disconnects
+    or sends notifications/cancelled for this id, so abandoned calls stop early.
+    """
+    token = CancelToken(timeout_from(meta, request.headers.get(settings.MCP_HTTP_TIMEOUT_HEADER)))
+    profile = PROFILER.begin(name) if isinstance(name, str) and name in REGISTRY else None
+    if profile is not None:
+        profile.mark("parse", parse_sec)
+    try:
+        with IN_FLIGHT.track((client.name, id_), token):
+            result = await _run_watched(
+                request, token,
+                lambda: dispatch_tool_call(REGISTRY, name, args, profile=profile, cancel=token),
+            )
+    except KeyError as ke:
+        PROFILER.finish(profile)
+        return JSONResponse({"jsonrpc":"2.0","id":id_, "error":{"code":-32601,"message":str(ke)}})
+    except CallCancelled as e:
+        PROFILER.finish(profile)
+        message = "Request cancelled" if token.reason is not None else "Request timed out"
+        return _jsonrpc_error(id_, jsonrpc_error_code(e), message, str(e))
+    except Exception as e:
+        PROFILER.finish(profile)
+        return _jsonrpc_error(id_, -32603, "Internal error", str(e))
+
+    serialize_start = time.perf_counter()
+    response = JSONResponse({"jsonrpc":"2.0","id":id_, "result": tool_result_payload(result)})
+    if profile is not None:
+        profile.mark("serialize", time.perf_counter() - serialize_start)
+        PROFILER.finish(profile)
+    observe_payload_sizes(REGISTRY, name, len(body), len(response.body))
+    return response
+
+
+async def _run_watched(request: Request, token: CancelToken, fn: Callable[[], Any]) -> Any:
+    """
+    Run `fn` in a worker thread; cancel `token` if the client hangs up meanwhile
+    (e.g. its own timeout fired). Exceptions from `fn` propagate unchanged.
+    """
+    outcome: Dict[str, Any] = {}
+
+    async def run() -> None:
         try:
-            result = dispatch_tool_call(REGISTRY, name, args)
-        except KeyError as ke:
-            return JSONResponse({"jsonrpc":"2.0","id":id_, "error":{"code":-32601,"message":str(ke)}})
+            outcome["result"] = await anyio.to_thread.run_sync(fn)
         except Exception as e:
-            return JSONResponse({"jsonrpc":"2.0","id":id_, "error":{"code":-32603,"message":"Internal error","data":str(e)}})
+            outcome["error"] = e
+        tg.cancel_scope.cancel()
 
-        content_block = (
-            {"type": "json", "json": result}
-            if isinstance(result, (dict, list))
-            else {"type": "text", "text": str(result)}
-        )
-        return JSONResponse({"jsonrpc":"2.0","id":id_, "result":{"content":[content_block], "isError": False}})
+    async def watch() -> None:
+        while not await request.is_disconnected():
+            await anyio.sleep(settings.MCP_HTTP_DISCONNECT_POLL_SEC)
+        token.cancel("client disconnected")
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(run)
+        tg.start_soon(watch)
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+# ---------- Metrics (Prometheus text format) ----------
+
+if settings.METRICS_ENABLED:
+    @app.get(settings.METRICS_PATH)
+    async def metrics_endpoint(request: Request):
+        if settings.METRICS_REQUIRE_AUTH:
+            _require_auth(request)
+        return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
 
-    return JSONResponse({"jsonrpc":"2.0","id":id_, "error":{"code":-32601,"message": f"Method not found: {method}"}})
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,38 +1,27 @@
 # server/main.py
 from fastmcp import FastMCP
-from app.di import build_container
-from server.tools.artifacts import register_artifact_tools
-from server.tools.files import register_file_tools
-from server.tools.json_validate import register_json_tools
-from server.tools.kv import register_kv_tools
-from server.tools.http_fetch import register_http_tools
+from app.config import Settings
+from server.registry import build_tool_registry, register_into_fastmcp
+from server.stdio import run_concurrent_stdio
 
 def create_app() -> FastMCP:
     """
-    Build DI container, create FastMCP host, and register tools.
-    Keep the server (protocol) separate from tool/service logic.
+    Create the FastMCP host and register every tool from the shared registry.
+    Keep the server (protocol) separate from tool/service logic; the HTTP transport
+    reads the same registry, so both expose identical tools and dispatch path.
     """
-    container = build_container()
-
     mcp = FastMCP("AcmeMCP", version="0.1.0")
-
-    # Register tools (thin adapters)
-    register_file_tools(mcp, container.fs_service)
-    register_http_tools(mcp, container.http_service)
-
-    
-    register_json_tools(mcp, container.validator_service)
-    register_artifact_tools(mcp, container.artifact_service)
-
-    
-    # KV tools are optional — only register if Redis URL configured
-    if container.settings.REDIS_URL:
-        register_kv_tools(mcp, container.kv_service)
-
+    register_into_fastmcp(mcp, build_tool_registry())
     return mcp
 
 
 if __name__ == "__main__":
-    app = create_app()
+    settings = Settings()
     # stdio transport: client (agent/IDE) launches this process and speaks JSON-RPC on stdin/stdout
-    app.run(transport="stdio")
+    if settings.MCP_STDIO_CONCURRENT:
+        # Out-of-order responses: a slow tool call does not head-of-line-block the client
+        run_concurrent_stdio(
+            build_tool_registry(), max_concurrency=settings.MCP_STDIO_MAX_CONCURRENCY
+        )
+    else:
+        create_app().run(transport="stdio")
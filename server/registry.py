@@ -1,12 +1,23 @@
 # server/registry.py
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, Type, Optional, List
-from pydantic import BaseModel
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from functools import partial
+from typing import Annotated, Any, Callable, Dict, Literal, Type, Optional, List, Union
+import anyio
+from pydantic import BaseModel, Field, TypeAdapter, create_model
 
+from app.cancellation import CallCancelled, CancelToken, DeadlineExceeded, bind, current_token
 from app.di import build_container
 from app.config import Settings
+from app.logging import log_tool_call
+from app.metrics import METRICS, SIZE_BUCKETS
+from app.profiling import PROFILER, CallProfile
+from app.toolcache import TOOL_CACHE, CachePolicy, Tags
 
 # Import only the Pydantic input models from existing tool modules.
 from server.tools.files import FsWriteIn, FsReadIn
@@ -14,7 +25,25 @@ from server.tools.http_fetch import FetchIn
 from server.tools.json_validate import JsonValidateIn
 from server.tools.artifacts import ArtifactLogIn, ArtifactListIn
 # KV models are optional (only if Redis configured)
-from server.tools.kv import KvPutIn, KvGetIn
+from server.tools.kv import KvPutIn, KvGetIn, KvMgetIn, KvMsetIn, KvDeleteIn, KvIncrIn, KvCasIn
+from server.tools.pipeline import PipelineStepIn, ToolPipelineIn
+
+logger = logging.getLogger("mcp.tools")
+
+_CALLS = METRICS.counter("mcp_tool_calls_total", "Tool calls by outcome", ("tool", "outcome"))
+_ERRORS = METRICS.counter(
+    "mcp_tool_errors_total", "Failed tool calls by JSON-RPC error code", ("tool", "code")
+)
+_LATENCY = METRICS.histogram(
+    "mcp_tool_call_duration_seconds", "Tool call latency (validation + handler)", ("tool",)
+)
+_IN_FLIGHT = METRICS.gauge("mcp_tool_calls_in_flight", "Tool calls currently executing", ("tool",))
+_REQUEST_BYTES = METRICS.histogram(
+    "mcp_tool_request_bytes", "Size of tools/call request messages", ("tool",), SIZE_BUCKETS
+)
+_RESPONSE_BYTES = METRICS.histogram(
+    "mcp_tool_response_bytes", "Size of tools/call response messages", ("tool",), SIZE_BUCKETS
+)
 
 
 @dataclass(frozen=True)
@@ -23,6 +52,30 @@ class ToolSpec:
     description: str
     input_model: Type[BaseModel]
     handler: Callable[[BaseModel], Any]
+    # Idempotent tools: single-flight + optional memoization (see app/toolcache.py)
+    cache: Optional[CachePolicy] = None
+    # Cache tags a (successful or failed) call of this tool invalidates
+    invalidates: Optional[Tags] = None
+    # Server-side cap on how long one call may run (client deadlines can only shorten it)
+    timeout_sec: Optional[float] = None
+    # Built once at registration: argument validator and the tools/list input schema
+    adapter: TypeAdapter = field(init=False, repr=False, compare=False)
+    input_schema: Dict[str, Any] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "adapter", TypeAdapter(self.input_model))
+        object.__setattr__(self, "input_schema", self.input_model.model_json_schema())
+
+    def validate(self, arguments: Dict[str, Any] | BaseModel | bytes | str) -> BaseModel:
+        """
+        Arguments as a dict, raw JSON (validated without building a dict first), or an
+        already-validated model instance (passed through).
+        """
+        if isinstance(arguments, self.input_model):
+            return arguments
+        if isinstance(arguments, (bytes, str)):
+            return self.adapter.validate_json(arguments)
+        return self.adapter.validate_python(arguments)
 
 
 class ToolHandlers:
@@ -33,6 +86,14 @@ class ToolHandlers:
     def __init__(self):
         self.container = build_container()
 
+    # ---- Cache tags (what a call reads or changes)
+    def fs_tags(self, args: FsReadIn | FsWriteIn) -> List[str]:
+        root = self.container.fs_service.root
+        return ["fs:" + os.path.normpath(os.path.join(root, args.path))]
+
+    def artifact_tags(self, args: ArtifactLogIn | ArtifactListIn) -> List[str]:
+        return ["artifacts:" + args.tag]
+
     # ---- Filesystem
     def fs_write(self, args: FsWriteIn) -> str:
         return self.container.fs_service.write_text(args.path, args.content)
@@ -56,7 +117,8 @@ class ToolHandlers:
 
     def artifact_list(self, args: ArtifactListIn) -> dict:
         return self.container.artifact_service.list(
-            args.tag, limit=args.limit, order=args.order, months_back=args.months_back
+            args.tag, limit=args.limit, order=args.order, months_back=args.months_back,
+            resolve_blobs=args.resolve_blobs,
         )
 
     # ---- KV (optional)
@@ -70,9 +132,32 @@ class ToolHandlers:
             raise RuntimeError("KV service not configured")
         return self.container.kv_service.get(args.key) or ""
 
+    def kv_mget(self, args: KvMgetIn) -> dict:
+        if self.container.kv_service is None:
+            raise RuntimeError("KV service not configured")
+        return {"values": self.container.kv_service.mget(args.keys)}
+
+    def kv_mset(self, args: KvMsetIn) -> str:
+        if self.container.kv_service is None:
+            raise RuntimeError("KV service not configured")
+        return self.container.kv_service.mset([(i.key, i.value, i.ttlSec) for i in args.items])
+
+    def kv_delete(self, args: KvDeleteIn) -> dict:
+        if self.container.kv_service is None:
+            raise RuntimeError("KV service not configured")
+        return {"deleted": self.container.kv_service.delete(args.keys)}
 
-def _schema_from_model(model: Type[BaseModel]) -> Dict[str, Any]:
-    return model.model_json_schema()
+    def kv_incr(self, args: KvIncrIn) -> dict:
+        if self.container.kv_service is None:
+            raise RuntimeError("KV service not configured")
+        return {"value": self.container.kv_service.incr(args.key, args.amount, args.ttlSec)}
+
+    def kv_cas(self, args: KvCasIn) -> dict:
+        if self.container.kv_service is None:
+            raise RuntimeError("KV service not configured")
+        return self.container.kv_service.compare_and_set(
+            args.key, args.expected, args.value, args.ttlSec
+        )
 
 
 def build_tool_registry() -> Dict[str, ToolSpec]:
@@ -82,6 +167,17 @@ def build_tool_registry() -> Dict[str, ToolSpec]:
     """
     settings = Settings()
     handlers = ToolHandlers()
+    PROFILER.configure(
+        handlers.container.artifact_service,
+        sample_rate=settings.PROFILE_SAMPLE_RATE,
+        slow_ms=settings.PROFILE_SLOW_MS,
+        capture_cprofile=settings.PROFILE_CPROFILE,
+        tag=settings.PROFILE_ARTIFACT_TAG,
+    )
+    TOOL_CACHE.configure(
+        single_flight=settings.TOOL_SINGLE_FLIGHT, max_bytes=settings.TOOL_CACHE_MAX_BYTES
+    )
+    ttl = settings.TOOL_CACHE_TTL_SEC
 
     reg: Dict[str, ToolSpec] = {
         "fs_write": ToolSpec(
@@ -89,41 +185,49 @@ def build_tool_registry() -> Dict[str, ToolSpec]:
             description="Write a text file under sandbox root",
             input_model=FsWriteIn,
             handler=handlers.fs_write,
+            invalidates=handlers.fs_tags,
         ),
         "fs_read": ToolSpec(
             name="fs_read",
             description="Read a text file under sandbox root",
             input_model=FsReadIn,
             handler=handlers.fs_read,
+            cache=CachePolicy(ttl_sec=ttl.get("fs_read", 0.0), tags=handlers.fs_tags),
         ),
         "http_fetch": ToolSpec(
             name="http_fetch",
             description="Fetch a URL with allowlist, timeouts, and SSRF safeguards",
             input_model=FetchIn,
             handler=handlers.http_fetch,
+            cache=CachePolicy(
+                ttl_sec=ttl.get("http_fetch", 0.0), cacheable=lambda a: a.method.upper() == "GET"
+            ),
         ),
         "json_validate": ToolSpec(
             name="json_validate",
             description="Validate a JSON instance against a JSON Schema (draft 2020-12 by default).",
             input_model=JsonValidateIn,
             handler=handlers.json_validate,
+            cache=CachePolicy(ttl_sec=ttl.get("json_validate", 0.0)),
         ),
         "artifact_log": ToolSpec(
             name="artifact_log",
             description="Append an immutable artifact record (NDJSON) under the sandboxed artifacts directory.",
             input_model=ArtifactLogIn,
             handler=handlers.artifact_log,
+            invalidates=handlers.artifact_tags,
         ),
         "artifact_list": ToolSpec(
             name="artifact_list",
             description="List recent artifact records for a tag (newest first by default).",
             input_model=ArtifactListIn,
             handler=handlers.artifact_list,
+            cache=CachePolicy(ttl_sec=ttl.get("artifact_list", 0.0), tags=handlers.artifact_tags),
         ),
     }
 
-    # Register KV tools only when Redis is configured.
-    if settings.REDIS_URL:
+    # Register KV tools only when a KV backend is configured (Redis or embedded).
+    if handlers.container.kv_service is not None:
         reg["kv_put"] = ToolSpec(
             name="kv_put",
             description="Put a key/value pair with optional TTL (seconds)",
@@ -136,6 +240,51 @@ def build_tool_registry() -> Dict[str, ToolSpec]:
             input_model=KvGetIn,
             handler=handlers.kv_get,
         )
+        reg["kv_mget"] = ToolSpec(
+            name="kv_mget",
+            description="Get many keys in one round trip (missing keys map to null)",
+            input_model=KvMgetIn,
+            handler=handlers.kv_mget,
+        )
+        reg["kv_mset"] = ToolSpec(
+            name="kv_mset",
+            description="Atomically set many key/value pairs, each with optional TTL (seconds)",
+            input_model=KvMsetIn,
+            handler=handlers.kv_mset,
+        )
+        reg["kv_delete"] = ToolSpec(
+            name="kv_delete",
+            description="Delete keys; returns how many existed",
+            input_model=KvDeleteIn,
+            handler=handlers.kv_delete,
+        )
+        reg["kv_incr"] = ToolSpec(
+            name="kv_incr",
+            description="Atomically increment an integer counter (TTL set when created)",
+            input_model=KvIncrIn,
+            handler=handlers.kv_incr,
+        )
+        reg["kv_cas"] = ToolSpec(
+            name="kv_cas",
+            description="Compare-and-set: write value only if the key currently equals expected "
+            "(null = key must not exist)",
+            input_model=KvCasIn,
+            handler=handlers.kv_cas,
+        )
+
+    # Runs a DAG of the tools above server-side (it sees later changes to `reg`)
+    reg["tool_pipeline"] = ToolSpec(
+        name="tool_pipeline",
+        description="Run several tools server-side as a small DAG: a step argument "
+        "{\"$ref\": \"step.field\"} takes an earlier step's result, independent steps run "
+        "concurrently, and only the requested outputs are returned",
+        input_model=ToolPipelineIn,
+        handler=partial(run_pipeline, reg, max_parallel=settings.PIPELINE_MAX_PARALLEL),
+    )
+
+    for name, timeout_sec in settings.TOOL_TIMEOUT_SEC.items():
+        if name in reg and timeout_sec > 0:
+            reg[name] = replace(reg[name], timeout_sec=timeout_sec)
 
     return reg
 
@@ -149,20 +298,283 @@ def list_tools_payload(registry: Dict[str, ToolSpec]) -> Dict[str, Any]:
         tools.append({
             "name": spec.name,
             "description": spec.description,
-            "inputSchema": _schema_from_model(spec.input_model),
+            "inputSchema": spec.input_schema,
         })
     return {"tools": tools}
 
 
-def dispatch_tool_call(registry: Dict[str, ToolSpec], name: str, arguments: Dict[str, Any]) -> Any:
+def build_call_adapter(registry: Dict[str, ToolSpec]) -> TypeAdapter:
+    """
+    Validator for a whole `tools/call` JSON-RPC message, straight from raw bytes.
+
+    `params` is a union of one model per tool, discriminated on `params.name`, so the
+    body is parsed once and `params.arguments` comes out as the tool's input model.
+    Anything that does not match (other methods, unknown tools, invalid arguments)
+    fails validation; callers then take the generic path, which reports the error.
+    """
+    members = tuple(
+        create_model(
+            f"{spec.input_model.__name__}Call",
+            name=(Literal[spec.name], ...),
+            arguments=(spec.input_model, ...),
+            meta=(Optional[Dict[str, Any]], Field(None, alias="_meta")),
+        )
+        for spec in registry.values()
+    )
+    if len(members) > 1:
+        params = Annotated[Union[members], Field(discriminator="name")]
+    else:
+        params = members[0]
+    envelope = create_model(
+        "ToolCallMessage",
+        jsonrpc=(Literal["2.0"], ...),
+        id=(Any, None),
+        method=(Literal["tools/call"], ...),
+        params=(params, ...),
+    )
+    return TypeAdapter(envelope)
+
+
+def tool_result_payload(result: Any) -> Dict[str, Any]:
+    """
+    Wrap a handler result into the `tools/call` result body (single content block).
+    """
+    content_block = (
+        {"type": "json", "json": result}
+        if isinstance(result, (dict, list))
+        else {"type": "text", "text": str(result)}
+    )
+    return {"content": [content_block], "isError": False}
+
+
+def dispatch_tool_call(
+    registry: Dict[str, ToolSpec],
+    name: str,
+    arguments: Dict[str, Any] | BaseModel,
+    *,
+    profile: Optional[CallProfile] = None,
+    cancel: Optional[CancelToken] = None,
+) -> Any:
     """
     Validate args with the tool's Pydantic model, then invoke the named handler.
+    Arguments already validated by a transport (e.g. FastMCP) are passed through as-is.
+
+    Transports that time their own parse/serialize phases pass `profile` and finish it;
+    otherwise a profile (if the profiler picks this call) is started and finished here.
+
+    `cancel` carries the client's deadline / cancellation; the tool's `timeout_sec`
+    tightens it for this call only (on a child token, so callers sharing `cancel`, such
+    as pipeline steps, keep theirs). Services see it via app.cancellation.current_token().
     """
     if name not in registry:
+        _ERRORS.inc("unknown", -32601)
         raise KeyError(f"Tool not found: {name}")
     spec = registry[name]
-    args_obj = spec.input_model(**arguments)
-    return spec.handler(args_obj)
+    owns_profile = profile is None
+    if owns_profile:
+        profile = PROFILER.begin(name)
+    if spec.timeout_sec:
+        cancel = (cancel.child() if cancel is not None else CancelToken()).limit(spec.timeout_sec)
+    _IN_FLIGHT.inc(name)
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        with bind(cancel):
+            if cancel is not None:
+                cancel.check()
+            if profile is None:
+                return _invoke(spec, spec.validate(arguments))
+            return _dispatch_profiled(spec, arguments, profile)
+    except Exception as e:
+        outcome = "cancelled" if isinstance(e, CallCancelled) else "error"
+        _ERRORS.inc(name, jsonrpc_error_code(e))
+        if profile is not None:
+            profile.outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        if owns_profile:
+            PROFILER.finish(profile)
+        _IN_FLIGHT.dec(name)
+        _CALLS.inc(name, outcome)
+        _LATENCY.observe(name, value=elapsed)
+        if logger.isEnabledFor(logging.DEBUG):
+            raw = arguments
+            if isinstance(arguments, BaseModel):
+                raw = arguments.model_dump(mode="json")
+            log_tool_call(logger, name, raw, duration_ms=elapsed * 1000, outcome=outcome,
+                          level=logging.DEBUG)
+
+
+def _dispatch_profiled(spec: ToolSpec, arguments: Any, profile: CallProfile) -> Any:
+    profile.start_cprofile()
+    try:
+        t0 = time.perf_counter()
+        args_obj = spec.validate(arguments)
+        t1 = time.perf_counter()
+        profile.mark("validate", t1 - t0)
+        try:
+            return _invoke(spec, args_obj)
+        finally:
+            profile.mark("handler", time.perf_counter() - t1)
+    finally:
+        profile.stop_cprofile()
+
+
+def _invoke(spec: ToolSpec, args_obj: BaseModel) -> Any:
+    """
+    Run the handler, through the call cache for idempotent tools; writers invalidate
+    the tags they declare even when they fail (the resource may be partly changed).
+    """
+    if spec.cache is not None:
+        return TOOL_CACHE.call(spec.name, spec.cache, args_obj, spec.handler)
+    if spec.invalidates is None:
+        return spec.handler(args_obj)
+    try:
+        return spec.handler(args_obj)
+    finally:
+        TOOL_CACHE.invalidate(spec.invalidates(args_obj))
+
+
+def jsonrpc_error_code(exc: Exception) -> int:
+    """
+    JSON-RPC error code the transports report for a failed tool call.
+    """
+    if isinstance(exc, KeyError):
+        return -32601
+    if isinstance(exc, DeadlineExceeded):
+        return -32001
+    if isinstance(exc, CallCancelled):
+        return -32800
+    return -32603
+
+
+# ---------- Pipelines ----------
+
+_REF = "$ref"
+
+
+def run_pipeline(
+    registry: Dict[str, ToolSpec], args: ToolPipelineIn, *, max_parallel: int = 4
+) -> Dict[str, Any]:
+    """
+    Execute a tool_pipeline: each step starts as soon as the steps it references are done,
+    through dispatch_tool_call (validation, caching, metrics and deadlines as usual).
+
+    Results are handed to later steps as Python objects, never re-encoded. The first
+    failing step cancels the others and fails the pipeline.
+    """
+    steps = {s.id: s for s in args.steps}
+    deps = _pipeline_deps(registry, args.steps)
+    sinks = [s.id for s in args.steps if not any(s.id in d for d in deps.values())]
+    outputs = args.outputs or sinks
+    for ref in outputs:
+        if ref.split(".", 1)[0] not in steps:
+            raise ValueError(f"Unknown step in output ref: {ref}")
+
+    parent = current_token()
+    token = parent.child() if parent is not None else CancelToken()
+    results: Dict[str, Any] = {}
+    pending = dict(deps)
+    running: Dict[Future, PipelineStepIn] = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix="pipeline")
+    with pool:
+        try:
+            while pending or running:
+                for step_id in [i for i, d in pending.items() if d <= results.keys()]:
+                    del pending[step_id]
+                    step = steps[step_id]
+                    arguments = _resolve_refs(step.arguments, results)
+                    running[pool.submit(dispatch_tool_call, registry, step.tool, arguments,
+                                        cancel=token)] = step
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    step = running.pop(fut)
+                    try:
+                        results[step.id] = fut.result()
+                    except CallCancelled:
+                        raise
+                    except Exception as e:
+                        raise RuntimeError(
+                            f"Pipeline step '{step.id}' ({step.tool}) failed: {e}"
+                        ) from e
+        except BaseException:
+            token.cancel("pipeline aborted")
+            raise
+
+    return {"outputs": {ref: _lookup(results, ref) for ref in outputs}}
+
+
+def _pipeline_deps(registry: Dict[str, ToolSpec], steps: List[PipelineStepIn]) -> Dict[str, set]:
+    # Step id -> ids it waits for; rejects unknown tools/steps, nesting and cycles up front
+    ids = [s.id for s in steps]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Pipeline step ids must be unique")
+    deps: Dict[str, set] = {}
+    for step in steps:
+        if step.tool not in registry or step.tool == "tool_pipeline":
+            raise ValueError(f"Step '{step.id}': unknown or unsupported tool '{step.tool}'")
+        wanted = set(step.after) | {r.split(".", 1)[0] for r in _refs(step.arguments)}
+        unknown = wanted - set(ids)
+        if unknown:
+            raise ValueError(f"Step '{step.id}' depends on unknown steps: {sorted(unknown)}")
+        deps[step.id] = wanted
+
+    done: set = set()
+    remaining = dict(deps)
+    while remaining:
+        ready = [i for i, d in remaining.items() if d <= done]
+        if not ready:
+            raise ValueError(f"Pipeline has a dependency cycle among: {sorted(remaining)}")
+        for i in ready:
+            done.add(i)
+            del remaining[i]
+    return deps
+
+
+def _refs(value: Any) -> List[str]:
+    if isinstance(value, dict):
+        if set(value) == {_REF} and isinstance(value[_REF], str):
+            return [value[_REF]]
+        return [r for v in value.values() for r in _refs(v)]
+    if isinstance(value, list):
+        return [r for v in value for r in _refs(v)]
+    return []
+
+
+def _resolve_refs(value: Any, results: Dict[str, Any]) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {_REF} and isinstance(value[_REF], str):
+            return _lookup(results, value[_REF])
+        return {k: _resolve_refs(v, results) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_resolve_refs(v, results) for v in value]
+    return value
+
+
+def _lookup(results: Dict[str, Any], ref: str) -> Any:
+    # "step.a.0.b": dict keys and list indexes into the step's result
+    step_id, *path = ref.split(".")
+    value = results[step_id]
+    for part in path:
+        if isinstance(value, BaseModel):
+            value = value.model_dump()
+        try:
+            value = value[int(part)] if isinstance(value, list) else value[part]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise ValueError(f"Ref '{ref}' not found in the result of step '{step_id}'") from None
+    return value
+
+
+def observe_payload_sizes(
+    registry: Dict[str, ToolSpec], name: Any, request_bytes: int, response_bytes: int
+) -> None:
+    """
+    Record wire sizes of a tools/call exchange (transports know these without re-encoding).
+    """
+    label = name if isinstance(name, str) and name in registry else "unknown"
+    _REQUEST_BYTES.observe(label, value=request_bytes)
+    _RESPONSE_BYTES.observe(label, value=response_bytes)
 
 
 def register_into_fastmcp(mcp, registry: Dict[str, ToolSpec]) -> None:
@@ -171,10 +583,24 @@ def register_into_fastmcp(mcp, registry: Dict[str, ToolSpec]) -> None:
     This keeps stdio and HTTP transports in sync without duplication.
     """
     for spec in registry.values():
-        # Create a local closure so each handler binds to its spec
+        # Create a local closure so each handler binds to its spec.
+        # Handlers are synchronous; run them in a worker thread so a slow tool
+        # does not block the host's event loop (and the other in-flight requests).
         def make_tool(spec: ToolSpec):
-            def tool_handler(input_obj: spec.input_model):
-                return spec.handler(input_obj)
+            async def tool_handler(input):
+                # If the host cancels this request, stop waiting and tell the handler
+                token = CancelToken()
+                try:
+                    return await anyio.to_thread.run_sync(
+                        lambda: dispatch_tool_call(registry, spec.name, input, cancel=token),
+                        abandon_on_cancel=True,
+                    )
+                except BaseException:
+                    token.cancel("request cancelled by host")
+                    raise
+            # Annotations are resolved lazily under `from __future__ import annotations`,
+            # so bind the concrete model explicitly for FastMCP's schema generation.
+            tool_handler.__annotations__ = {"input": spec.input_model, "return": Any}
             return tool_handler
 
         # FastMCP's decorator returns a decorator we can call dynamically.
@@ -0,0 +1,223 @@
+# server/stdio.py
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.cancellation import CallCancelled, CancelToken, InFlightCalls, timeout_from
+from app.profiling import PROFILER, CallProfile
+from server.registry import (
+    ToolSpec,
+    dispatch_tool_call,
+    jsonrpc_error_code,
+    list_tools_payload,
+    observe_payload_sizes,
+    tool_result_payload,
+)
+
+PROTOCOL_VERSION = "2025-03-26"
+
+
+class ConcurrentStdioServer:
+    """
+    Minimal MCP stdio host that keeps several requests in flight at once.
+
+    Every newline-delimited JSON-RPC message is handled in its own task; tool calls run
+    in worker threads (bounded by max_concurrency) and each response is written as soon
+    as it is ready, so responses may come back out of order (clients match them by id).
+
+    A `notifications/cancelled` for an in-flight request cancels its token; the handler
+    stops at its next checkpoint and, per MCP, no response is sent for that request.
+    Requests may carry a deadline in `params._meta.timeoutMs`.
+    """
+
+    def __init__(
+        self,
+        registry: Dict[str, ToolSpec],
+        *,
+        max_concurrency: int = 8,
+        server_name: str = "AcmeMCP",
+        server_version: str = "0.1.0",
+    ):
+        self.registry = registry
+        self.max_concurrency = max(1, max_concurrency)
+        self.server_name = server_name
+        self.server_version = server_version
+        # Bound to the running loop on first use (Python 3.10+)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight = InFlightCalls()
+
+    # ---------- Public API ----------
+
+    async def handle(
+        self, message: Dict[str, Any], profile: Optional[CallProfile] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Handle one JSON-RPC message; returns the response, or None for notifications.
+        """
+        if "id" not in message:
+            # Notifications (e.g. notifications/initialized) never get a response.
+            params = message.get("params")
+            if message.get("method") == "notifications/cancelled" and isinstance(params, dict):
+                reason = params.get("reason") or "cancelled"
+                self._in_flight.cancel(params.get("requestId"), reason)
+            return None
+
+        id_ = message.get("id")
+        method = message.get("method")
+        params = message.get("params") or {}
+
+        if method == "initialize":
+            return _result(id_, {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {"tools": {"listChanged": True}},
+                "serverInfo": {"name": self.server_name, "version": self.server_version},
+            })
+
+        if method == "ping":
+            return _result(id_, {})
+
+        if method == "tools/list":
+            return _result(id_, list_tools_payload(self.registry))
+
+        if method == "tools/call":
+            name = params.get("name")
+            args = params.get("arguments", {})
+            token = CancelToken(timeout_from(params.get("_meta")))
+            try:
+                with self._in_flight.track(id_, token):
+                    async with self._semaphore:
+                        result = await asyncio.to_thread(
+                            dispatch_tool_call, self.registry, name, args,
+                            profile=profile, cancel=token,
+                        )
+            except KeyError as ke:
+                return _error(id_, -32601, str(ke))
+            except CallCancelled as e:
+                if token.reason is not None:
+                    return None  # cancelled by the client: it expects no response
+                return _error(id_, jsonrpc_error_code(e), "Request timed out", str(e))
+            except Exception as e:
+                return _error(id_, -32603, "Internal error", str(e))
+            return _result(id_, tool_result_payload(result))
+
+        return _error(id_, -32601, f"Method not found: {method}")
+
+    async def serve(
+        self,
+        read_line: Callable[[], Awaitable[bytes]],
+        write_line: Callable[[bytes], None],
+    ) -> None:
+        """
+        Read messages until EOF, dispatching each one concurrently.
+        Pending requests are drained before returning.
+        """
+        pending: Set[asyncio.Task] = set()
+
+        def emit(body: Any) -> int:
+            # Single writer call per response keeps lines intact on stdout.
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8") + b"\n"
+            write_line(data)
+            return len(data)
+
+        async def respond(message: Any, size: int, parse_sec: float) -> None:
+            if isinstance(message, list):
+                # JSON-RPC batch: answer with one array once every entry is done
+                replies = await asyncio.gather(*(self._handle_safe(m) for m in message))
+                batch: List[Dict[str, Any]] = [r for r in replies if r is not None]
+                if batch:
+                    emit(batch)
+                return
+            name = _tool_name(message)
+            profile = PROFILER.begin(name) if name in self.registry else None
+            if profile is not None:
+                profile.mark("parse", parse_sec)
+            reply = await self._handle_safe(message, profile)
+            if reply is not None:
+                serialize_start = time.perf_counter()
+                sent = emit(reply)
+                if profile is not None:
+                    profile.mark("serialize", time.perf_counter() - serialize_start)
+                if name is not None:
+                    observe_payload_sizes(self.registry, name, size, sent)
+            PROFILER.finish(profile)
+
+        while True:
+            line = await read_line()
+            if not line:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            parse_start = time.perf_counter()
+            try:
+                message = json.loads(line)
+            except Exception:
+                emit(_error(None, -32700, "Parse error"))
+                continue
+            parse_sec = time.perf_counter() - parse_start
+
+            task = asyncio.create_task(respond(message, len(line), parse_sec))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    # ---------- Internals ----------
+
+    async def _handle_safe(
+        self, message: Any, profile: Optional[CallProfile] = None
+    ) -> Optional[Dict[str, Any]]:
+        if not isinstance(message, dict):
+            return _error(None, -32600, "Invalid Request")
+        try:
+            return await self.handle(message, profile)
+        except Exception as e:
+            if "id" not in message:
+                return None  # notifications never get a response, not even an error
+            return _error(message.get("id"), -32603, "Internal error", str(e))
+
+
+def _tool_name(message: Any) -> Optional[str]:
+    # Name of the tool a tools/call request targets (None for anything else)
+    if not isinstance(message, dict) or message.get("method") != "tools/call":
+        return None
+    params = message.get("params")
+    name = params.get("name") if isinstance(params, dict) else None
+    return name if isinstance(name, str) else None
+
+
+def _result(id_: Any, result: Any) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": id_, "result": result}
+
+
+def _error(id_: Any, code: int, message: str, data: Any | None = None) -> Dict[str, Any]:
+    body: Dict[str, Any] = {
+        "jsonrpc": "2.0", "id": id_, "error": {"code": code, "message": message}
+    }
+    if data is not None:
+        body["error"]["data"] = data
+    return body
+
+
+def run_concurrent_stdio(registry: Dict[str, ToolSpec], *, max_concurrency: int = 8) -> None:
+    """
+    Serve the registry over this process's stdin/stdout.
+    stdin is read from a worker thread, which works for pipes on every platform.
+    """
+    server = ConcurrentStdioServer(registry, max_concurrency=max_concurrency)
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+
+    async def read_line() -> bytes:
+        return await asyncio.to_thread(stdin.readline)
+
+    def write_line(data: bytes) -> None:
+        stdout.write(data)
+        stdout.flush()
+
+    asyncio.run(server.serve(read_line, write_line))
@@ -2,7 +2,6 @@
 from __future__ import annotations
 from typing import Any, Dict, Optional, Literal
 from pydantic import BaseModel, Field
-from fastmcp import FastMCP
 
 class ArtifactLogIn(BaseModel):
     tag: str = Field(..., description="Semantic tag, e.g., 'orders:create', 'errors', 'plan'")
@@ -22,29 +21,8 @@ class ArtifactListIn(BaseModel):
     months_back: int = Field(
         12, ge=1, le=36, description="How many months of history to scan backwards"
     )
-
-
-def register_artifact_tools(mcp: FastMCP, artifact_service):
-    @mcp.tool(
-        name="artifact_log",
-        description="Append an immutable artifact record (NDJSON) under the " \
-        "sandboxed artifacts directory.",
-    )
-    def artifact_log(input: ArtifactLogIn) -> Dict[str, Any]:
-        return artifact_service.append(
-            input.tag,
-            input.content,
-            meta=input.meta,
-            corr=input.corr,
-            actor=input.actor,
-            tool=input.tool,
-        )
-
-    @mcp.tool(
-        name="artifact_list",
-        description="List recent artifact records for a tag (newest first by default).",
+    resolve_blobs: bool = Field(
+        False,
+        description="Inline large contents kept in the blob store; otherwise those records "
+        "carry 'content_blob' {sha256, bytes} instead of 'content'",
     )
-    def artifact_list(input: ArtifactListIn) -> Dict[str, Any]:
-        return artifact_service.list(
-            input.tag, limit=input.limit, order=input.order, months_back=input.months_back
-        )
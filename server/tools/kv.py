@@ -1,6 +1,9 @@
 # server/tools/kv.py
+from typing import Annotated, List
+
 from pydantic import BaseModel, Field
-from fastmcp import FastMCP
+
+Key = Annotated[str, Field(min_length=1)]
 
 
 class KvPutIn(BaseModel):
@@ -15,12 +18,42 @@ class KvGetIn(BaseModel):
     key: str = Field(..., min_length=1, description="Key to get")
 
 
-def register_kv_tools(mcp: FastMCP, kv_service):
-    @mcp.tool(name="kv_put", description="Put a key/value pair with optional TTL (seconds)")
-    def kv_put(input: KvPutIn) -> str:
-        return kv_service.put(input.key, input.value, input.ttlSec)
+class KvItemIn(BaseModel):
+    key: str = Field(..., min_length=1, description="Key to set")
+    value: str = Field(..., description="Value to store")
+    ttlSec: int | None = Field(
+        None, ge=1, le=7 * 24 * 3600, description="Optional TTL in seconds (max 7 days)"
+    )
+
+
+class KvMsetIn(BaseModel):
+    items: List[KvItemIn] = Field(
+        ..., min_length=1, max_length=1000, description="Key/value pairs, each with optional TTL"
+    )
+
+
+class KvMgetIn(BaseModel):
+    keys: List[Key] = Field(..., min_length=1, max_length=1000, description="Keys to get")
 
-    @mcp.tool(name="kv_get", description="Get the value for a key (or empty string if missing)")
-    def kv_get(input: KvGetIn) -> str:
-        val = kv_service.get(input.key)
-        return "" if val is None else val
+
+class KvDeleteIn(BaseModel):
+    keys: List[Key] = Field(..., min_length=1, max_length=1000, description="Keys to delete")
+
+
+class KvIncrIn(BaseModel):
+    key: str = Field(..., min_length=1, description="Counter key")
+    amount: int = Field(1, description="Increment (negative to decrement)")
+    ttlSec: int | None = Field(
+        None, ge=1, le=7 * 24 * 3600, description="TTL applied when the counter is created"
+    )
+
+
+class KvCasIn(BaseModel):
+    key: str = Field(..., min_length=1, description="Key to set")
+    expected: str | None = Field(
+        ..., description="Required current value; null means the key must not exist"
+    )
+    value: str = Field(..., description="New value")
+    ttlSec: int | None = Field(
+        None, ge=1, le=7 * 24 * 3600, description="Optional TTL in seconds (max 7 days)"
+    )
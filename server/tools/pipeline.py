@@ -0,0 +1,30 @@
+# server/tools/pipeline.py
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field
+
+StepId = Field(..., pattern=r"^[A-Za-z_][A-Za-z0-9_\-]*$", max_length=64)
+
+
+class PipelineStepIn(BaseModel):
+    id: str = StepId
+    tool: str = Field(..., description="Registry tool to run, e.g. 'http_fetch'")
+    arguments: Dict[str, Any] = Field(
+        default_factory=dict,
+        description="Tool arguments; any value may be {\"$ref\": \"<step>[.<field>...]\"} "
+        "to use (part of) an earlier step's result",
+    )
+    after: List[str] = Field(
+        default_factory=list, description="Extra steps to wait for (refs are waited for already)"
+    )
+
+
+class ToolPipelineIn(BaseModel):
+    steps: List[PipelineStepIn] = Field(..., min_length=1, max_length=32)
+    outputs: List[str] = Field(
+        default_factory=list,
+        description="Refs to return, e.g. ['validate.valid', 'log.ts'] "
+        "(default: results of steps nothing else depends on)",
+    )
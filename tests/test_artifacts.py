@@ -1,9 +1,10 @@
 # tests/test_artifacts.py
-from pathlib import Path
 import json
+from pathlib import Path
 
 from app.services.artifacts import ArtifactService
 
+
 def test_artifact_append_and_list(tmp_path: Path):
     svc = ArtifactService(sandbox_root=tmp_path, subdir_name="artifacts", max_bytes=1000000)
 
@@ -19,3 +20,127 @@ def test_artifact_append_and_list(tmp_path: Path):
 
     # Redaction check (emails should be redacted in content/meta)
     assert out["records"][0]["content"]["email"] != "jane@example.com"
+
+
+def test_large_contents_go_to_the_blob_store_once(tmp_path: Path):
+    svc = ArtifactService(sandbox_root=tmp_path, blob_min_bytes=1000)
+    page = {"html": "<p>" + "x" * 5000 + "</p>", "from": "ops@example.com"}
+
+    svc.append("pages", page)
+    svc.append("pages", page)
+    svc.append("pages", {"small": True})
+
+    blobs = list((tmp_path / "artifacts" / "blobs").rglob("*.json.gz"))
+    assert len(blobs) == 1  # identical payloads are stored once, compressed
+    assert blobs[0].stat().st_size < 1000
+
+    refs = svc.list("pages", order="asc")["records"]
+    assert "content" not in refs[0] and refs[0]["content_blob"] == refs[1]["content_blob"]
+    assert refs[2]["content"] == {"small": True}
+
+    resolved = svc.list("pages", order="asc", resolve_blobs=True)["records"]
+    assert resolved[0]["content"]["html"] == page["html"]
+    assert resolved[0]["content"]["from"] != "ops@example.com"  # redacted before hashing
+    assert "content_blob" not in resolved[0]
+
+
+def test_catalog_lists_across_segments_and_survives_restart(tmp_path: Path):
+    svc = ArtifactService(sandbox_root=tmp_path, max_bytes=300)
+    for i in range(12):
+        svc.append("runs", {"i": i})
+    svc.append("runs-b", {"other": True})  # tag that shares a prefix
+    svc.close()
+
+    segments = svc.catalog.segments("runs")
+    assert len(segments) > 2 and sum(s.records for s in segments) == 12
+    manifest = next((tmp_path / "artifacts").glob("*/_catalog.json"))
+    assert "runs-b" in json.loads(manifest.read_text())["tags"]
+
+    # A new instance loads the manifests; newest first across rotated files
+    again = ArtifactService(sandbox_root=tmp_path, max_bytes=300)
+    desc = again.list("runs", limit=5)["records"]
+    assert [r["content"]["i"] for r in desc] == [11, 10, 9, 8, 7]
+    asc = again.list("runs", limit=3, order="asc")["records"]
+    assert [r["content"]["i"] for r in asc] == [0, 1, 2]
+    again.append("runs", {"i": 12})
+    assert again.list("runs", limit=1)["records"][0]["content"]["i"] == 12
+
+
+def test_listing_sees_segments_written_by_another_process(tmp_path: Path):
+    import os
+
+    a = ArtifactService(sandbox_root=tmp_path, max_bytes=300)
+    b = ArtifactService(sandbox_root=tmp_path, max_bytes=300)  # e.g. another uvicorn worker
+    assert a.list("orders")["count"] == 0
+    b.append("orders", {"i": 0})
+    assert a.list("orders")["count"] == 1
+
+    # Once directory mtimes are old enough to trust, an unchanged month is not re-listed,
+    # and a segment the other process rotates to still changes it
+    base = tmp_path / "artifacts"
+    for d in [base, *base.iterdir()]:
+        os.utime(d, ns=(0, 0))
+    assert a.list("orders")["count"] == 1
+    for i in range(1, 8):
+        b.append("orders", {"i": i})
+    assert len(b.catalog.segments("orders")) > 1
+    desc = a.list("orders", limit=3)["records"]
+    assert [r["content"]["i"] for r in desc] == [7, 6, 5]
+
+
+def test_retention_compaction_trims_old_records_and_blobs(tmp_path: Path):
+    from datetime import datetime, timedelta, timezone
+
+    from app.services.artifacts import RetentionPolicy
+
+    svc = ArtifactService(sandbox_root=tmp_path, max_bytes=400, blob_min_bytes=500,
+                          blob_grace_sec=0, retention=RetentionPolicy(max_records_per_tag=5),
+                          compact_interval_sec=0)
+    svc.append("big", {"page": "y" * 2000})
+    for i in range(20):
+        svc.append("runs", {"i": i})
+
+    stats = svc.compact()
+    assert stats["records"] == 15  # "big" has a single record
+    kept = svc.list("runs", limit=50)["records"]
+    assert [r["content"]["i"] for r in kept] == [19, 18, 17, 16, 15]
+    assert sum(s.records for s in svc.catalog.segments("runs")) == 5
+
+    # Age rule: everything is older than a day from "two days later"
+    svc.retention = RetentionPolicy(max_age_days=1)
+    stats = svc.compact(now=datetime.now(timezone.utc) + timedelta(days=2))
+    assert stats["age"] == 6 and stats["blobs"] == 1
+    assert svc.list("runs")["count"] == 0 and svc.catalog.tags() == []
+    assert not list((tmp_path / "artifacts" / "blobs").rglob("*.json.gz"))
+
+
+def test_retention_rewrite_keeps_appends_from_another_instance(tmp_path: Path):
+    # Two instances on one sandbox stand in for two processes (separate lock handles)
+    import threading
+
+    from app.services.artifacts import RetentionPolicy
+
+    writer = ArtifactService(sandbox_root=tmp_path)
+    compactor = ArtifactService(sandbox_root=tmp_path)
+    total = 1500
+    thread = threading.Thread(
+        target=lambda: [writer.append("runs", {"i": i}) for i in range(total)]
+    )
+    thread.start()
+    dropped = 0
+    while thread.is_alive():
+        compactor.catalog.refresh()
+        for seg in compactor.catalog.segments("runs")[:1]:
+            dropped += compactor._trim("runs", seg, lambda lines: min(len(lines), 1))
+    assert dropped > 0
+    kept = [r["content"]["i"] for r in writer.list("runs", limit=total, order="asc")["records"]]
+    assert kept == list(range(dropped, total))
+
+    # One compactor at a time: a pass is skipped while another process holds the lock
+    assert compactor._compact_lock.try_exclusive()
+    try:
+        writer.retention = RetentionPolicy(max_records_per_tag=1)
+        assert writer.compact() == {"age": 0, "bytes": 0, "records": 0, "blobs": 0}
+    finally:
+        compactor._compact_lock.release()
+    assert writer.compact()["records"] == total - dropped - 1
@@ -0,0 +1,167 @@
+# tests/test_cancellation.py
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from pydantic import BaseModel
+
+from app.cancellation import (
+    CallCancelled,
+    CancelToken,
+    DeadlineExceeded,
+    bind,
+    checkpoint,
+    timeout_from,
+)
+from app.services import httpclient
+from app.services.artifacts import ArtifactService
+from app.toolcache import CachePolicy, ToolCache
+from server.registry import ToolSpec, dispatch_tool_call, jsonrpc_error_code
+from server.stdio import ConcurrentStdioServer
+
+
+class WaitIn(BaseModel):
+    label: str = "x"
+
+
+def _waiting(args: WaitIn) -> str:
+    # Stands in for a service loop that checks for cancellation between steps
+    while True:
+        checkpoint()
+        time.sleep(0.01)
+
+
+def test_token_deadline_cancel_and_callbacks():
+    token = CancelToken(0.05)
+    assert not token.cancelled and 0 < token.remaining() <= 0.05
+    assert token.limit(10).remaining() <= 0.05  # limit only tightens
+    time.sleep(0.06)
+    with pytest.raises(DeadlineExceeded):
+        token.check()
+
+    fired = []
+    token = CancelToken()
+    unregister = token.on_cancel(lambda: fired.append("a"))
+    token.on_cancel(lambda: fired.append("b"))
+    unregister()
+    token.cancel("bye")
+    token.cancel("again")
+    assert fired == ["b"] and token.reason == "bye"
+    with pytest.raises(CallCancelled) as exc:
+        token.check()
+    assert not isinstance(exc.value, DeadlineExceeded)
+
+    assert timeout_from({"timeoutMs": 2500}, "1000") == 1.0
+    assert timeout_from({"timeoutMs": "junk"}, None) is None
+    assert timeout_from(None, "0") is None
+
+
+def test_dispatch_enforces_tool_timeout():
+    registry = {"wait": ToolSpec(name="wait", description="waits", input_model=WaitIn,
+                                 handler=_waiting, timeout_sec=0.05)}
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded) as exc:
+        dispatch_tool_call(registry, "wait", {})
+    assert time.monotonic() - start < 1
+    assert jsonrpc_error_code(exc.value) == -32001
+
+    token = CancelToken()
+    token.cancel("client gone")
+    with pytest.raises(CallCancelled) as exc:
+        dispatch_tool_call(registry, "wait", {}, cancel=token)
+    assert jsonrpc_error_code(exc.value) == -32800
+
+
+def test_stdio_cancelled_notification_suppresses_the_reply():
+    registry = {
+        "wait": ToolSpec(name="wait", description="waits", input_model=WaitIn, handler=_waiting)
+    }
+    server = ConcurrentStdioServer(registry)
+
+    async def run():
+        call = asyncio.create_task(server.handle(
+            {"jsonrpc": "2.0", "id": 9, "method": "tools/call", "params": {"name": "wait"}}))
+        await asyncio.sleep(0.05)
+        assert await server.handle({"jsonrpc": "2.0", "method": "notifications/cancelled",
+                                    "params": {"requestId": 9, "reason": "user abort"}}) is None
+        return await asyncio.wait_for(call, 2)
+
+    assert asyncio.run(run()) is None
+    # Malformed params are ignored: a notification never gets a reply, not even an error
+    for params in (None, [9], "9"):
+        note = {"jsonrpc": "2.0", "method": "notifications/cancelled", "params": params}
+        assert asyncio.run(server._handle_safe(note)) is None
+
+    timed_out = asyncio.run(server.handle(
+        {"jsonrpc": "2.0", "id": 10, "method": "tools/call",
+         "params": {"name": "wait", "_meta": {"timeoutMs": 50}}}))
+    assert timed_out["error"]["code"] == -32001
+
+
+def test_single_flight_follower_keeps_its_own_deadline():
+    cache = ToolCache()
+    release = threading.Event()
+    calls = []
+
+    def slow(args):
+        calls.append(args.label)
+        release.wait(5)
+        return "done"
+
+    leader = threading.Thread(target=cache.call, args=("t", CachePolicy(), WaitIn(), slow))
+    leader.start()
+    time.sleep(0.05)
+    with bind(CancelToken(0.05)), pytest.raises(DeadlineExceeded):
+        cache.call("t", CachePolicy(), WaitIn(), slow)
+    release.set()
+    leader.join()
+    assert calls == ["x"]
+
+
+def test_artifact_scan_stops_when_cancelled(tmp_path):
+    svc = ArtifactService(sandbox_root=tmp_path)
+    svc.append("t", {"n": 1})
+    token = CancelToken()
+    token.cancel()
+    with bind(token), pytest.raises(CallCancelled):
+        svc.list("t")
+    assert svc.list("t")["count"] == 1
+
+
+def test_http_fetch_cancel_interrupts_a_request_waiting_for_headers(monkeypatch):
+    release = threading.Event()
+
+    class Origin(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path == "/slow":
+                release.wait(3)  # no headers until released
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(httpclient, "_host_resolves_to_private", lambda host: False)
+    svc = httpclient.SafeHttpService({"localhost"}, timeout_sec=10)
+    base = f"http://localhost:{server.server_address[1]}"
+    try:
+        assert svc.fetch(base + "/fast")["body"] == "ok"  # pooled connection reused below
+        token = CancelToken()
+        threading.Timer(0.2, token.cancel).start()
+        start = time.monotonic()
+        with bind(token), pytest.raises(CallCancelled):
+            svc.fetch(base + "/slow")
+        assert time.monotonic() - start < 1
+        assert svc.fetch(base + "/fast")["body"] == "ok"
+    finally:
+        release.set()
+        svc.close()
+        server.shutdown()
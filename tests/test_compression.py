@@ -0,0 +1,26 @@
+# tests/test_compression.py
+import gzip
+
+from app.compression import AVAILABLE, Codec, compress_body, negotiate
+
+GZIP = AVAILABLE["gzip"]
+ZSTD = Codec("zstd", lambda data: data[:1])  # stand-ins: negotiation only looks at names
+BR = Codec("br", lambda data: data[:1])
+
+
+def test_negotiate_honours_q_values_then_server_order():
+    codecs = [ZSTD, BR, GZIP]
+    assert negotiate("gzip, br", codecs) is BR
+    assert negotiate("gzip;q=1.0, br;q=0.5", codecs) is GZIP
+    assert negotiate("*", codecs) is ZSTD
+    assert negotiate("*;q=0.5, zstd;q=0", codecs) is BR
+    assert negotiate("deflate, identity", codecs) is None
+    assert negotiate("gzip;q=0", codecs) is None
+    assert negotiate(None, codecs) is None
+    assert negotiate("gzip", []) is None
+
+
+def test_compress_body_skips_output_that_is_not_smaller():
+    text = b'{"result": "' + b"abc" * 1000 + b'"}'
+    assert gzip.decompress(compress_body(GZIP, text)) == text
+    assert compress_body(GZIP, gzip.compress(text)) is None
@@ -0,0 +1,207 @@
+# tests/test_http.py
+import importlib
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.admission import AdmissionController, TokenPolicy
+
+TOKENS = {"agent-a-token": {"name": "agent-a", "rate_per_sec": 0.5, "burst": 2}}
+
+
+@pytest.fixture()
+def http_app(tmp_path, monkeypatch):
+    monkeypatch.setenv("SANDBOX_ROOT", str(tmp_path))
+    monkeypatch.setenv("REDIS_URL", "")
+    monkeypatch.setenv("MCP_HTTP_BEARER_TOKEN", "main-token")
+    monkeypatch.setenv("MCP_HTTP_TOKENS", json.dumps(TOKENS))
+    monkeypatch.setenv("MCP_HTTP_ALLOWED_ORIGINS", "http://localhost")
+    import server.http_app as module
+    return importlib.reload(module)
+
+
+def _post(client, token, payload, **headers):
+    body = payload if isinstance(payload, (bytes, str)) else json.dumps(payload)
+    return client.post("/mcp", content=body,
+                       headers={"Authorization": f"Bearer {token}", **headers})
+
+
+def _call(name, arguments, id_=1):
+    return {"jsonrpc": "2.0", "id": id_, "method": "tools/call",
+            "params": {"name": name, "arguments": arguments}}
+
+
+def test_tools_call_fast_and_generic_paths(http_app):
+    client = TestClient(http_app.app)
+    ok = _post(client, "main-token", _call("fs_write", {"path": "a.txt", "content": "hi"}))
+    assert ok.json()["result"]["content"][0]["text"] == "OK"
+    read = _post(client, "main-token", _call("fs_read", {"path": "a.txt"}, id_="r"))
+    assert read.json() == {"jsonrpc": "2.0", "id": "r", "result": {
+        "content": [{"type": "text", "text": "hi"}], "isError": False}}
+    # Invalid arguments fall back to the generic path and report an internal error
+    bad = _post(client, "main-token", _call("fs_read", {}))
+    assert bad.json()["error"]["code"] == -32603
+    unknown = _post(client, "main-token", _call("nope", {}))
+    assert unknown.json()["error"]["code"] == -32601
+
+
+def test_auth_and_origin(http_app):
+    client = TestClient(http_app.app)
+    assert _post(client, "wrong", _call("fs_read", {"path": "a"})).status_code == 401
+    assert _post(client, "main-token", _call("fs_read", {"path": "a"}),
+                 Origin="http://evil.example").status_code == 403
+    assert _post(client, "main-token", _call("fs_read", {"path": "a"}),
+                 Origin="http://localhost").status_code == 200
+
+
+def test_rate_limited_token_is_shed_before_parsing(http_app):
+    client = TestClient(http_app.app)
+    ping = {"jsonrpc": "2.0", "id": 1, "method": "tools/list"}
+    assert _post(client, "agent-a-token", ping).status_code == 200
+    assert _post(client, "agent-a-token", ping).status_code == 200
+    shed = _post(client, "agent-a-token", b"{not json")
+    assert shed.status_code == 429
+    assert int(shed.headers["Retry-After"]) >= 1
+    assert shed.json()["error"]["data"]["reason"] == "rate"
+    # Other tokens have their own budget
+    assert _post(client, "main-token", ping).status_code == 200
+
+
+def test_concurrency_and_global_caps():
+    a = TokenPolicy(name="a", max_concurrency=1)
+    b = TokenPolicy(name="b", max_concurrency=5)
+    ctl = AdmissionController({"ta": a, "tb": b}, max_in_flight=2)
+    assert ctl.admit(a) is None
+    assert ctl.admit(a).reason == "concurrency"
+    assert ctl.admit(b) is None
+    rejected = ctl.admit(b)
+    assert (rejected.status, rejected.reason) == (503, "global")
+    ctl.release(a)
+    assert ctl.admit(b) is None
+
+
+def test_admission_is_thread_safe():
+    policy = TokenPolicy(name="t", max_concurrency=0)
+    ctl = AdmissionController({"t": policy}, max_in_flight=1000)
+
+    def worker():
+        for _ in range(200):
+            assert ctl.admit(policy) is None
+            ctl.release(policy)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert ctl._in_flight == 0
+
+
+def test_deadline_header_and_cancel_notification(http_app):
+    from app.cancellation import checkpoint
+    from server.registry import ToolSpec
+    from server.tools.kv import KvGetIn
+
+    def wait(args):
+        while True:
+            checkpoint()
+            time.sleep(0.01)
+
+    http_app.REGISTRY["wait"] = ToolSpec(
+        name="wait", description="waits", input_model=KvGetIn, handler=wait
+    )
+    client = TestClient(http_app.app)
+    start = time.monotonic()
+    timed_out = _post(client, "main-token", _call("wait", {"key": "k"}),
+                      **{"X-Request-Timeout-Ms": "100"})
+    assert timed_out.json()["error"]["code"] == -32001
+    assert time.monotonic() - start < 2
+
+    replies = {}
+
+    def call():
+        replies["call"] = _post(client, "main-token", _call("wait", {"key": "k"}, id_="w1"))
+
+    caller = threading.Thread(target=call)
+    caller.start()
+    time.sleep(0.2)
+    # Another client cannot cancel this call; the owner can
+    note = {"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": "w1"}}
+    assert _post(client, "agent-a-token", note).status_code == 202
+    assert caller.is_alive()
+    assert _post(client, "main-token", note).status_code == 202
+    caller.join(2)
+    assert replies["call"].json()["error"]["code"] == -32800
+
+
+def test_large_responses_are_compressed_when_accepted(http_app):
+    client = TestClient(http_app.app)
+    _post(client, "main-token", _call("fs_write", {"path": "big.txt", "content": "line\n" * 5000}))
+    read = _call("fs_read", {"path": "big.txt"})
+    packed = _post(client, "main-token", read, **{"Accept-Encoding": "gzip"})
+    assert packed.headers["content-encoding"] == "gzip"
+    assert int(packed.headers["content-length"]) < 25_000
+    assert packed.json()["result"]["content"][0]["text"] == "line\n" * 5000
+    plain = _post(client, "main-token", read, **{"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert packed.headers["vary"] == plain.headers["vary"] == "Accept-Encoding"
+    small = _post(client, "main-token", _call("fs_read", {"path": "missing"}),
+                  **{"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+
+def test_oversized_requests_are_rejected_while_streaming(http_app, monkeypatch):
+    monkeypatch.setattr(http_app.settings, "MCP_HTTP_MAX_REQUEST_BYTES", 10_000)
+    client = TestClient(http_app.app)
+    big = json.dumps(_call("fs_write", {"path": "x.txt", "content": "x" * 20_000}))
+    declared = _post(client, "main-token", big)
+    assert declared.status_code == 413
+    assert declared.json()["error"]["data"] == {"maxBytes": 10_000}
+
+    def chunks():  # no Content-Length: the limit applies as chunks arrive
+        for i in range(0, len(big), 1000):
+            yield big[i:i + 1000].encode()
+
+    streamed = client.post("/mcp", content=chunks(), headers={"Authorization": "Bearer main-token"})
+    assert streamed.status_code == 413
+    assert not (http_app.settings.SANDBOX_ROOT / "x.txt").exists()
+
+
+def test_cancel_notification_bypasses_admission_at_the_cap(http_app, monkeypatch):
+    from app.cancellation import checkpoint
+    from server.registry import ToolSpec
+    from server.tools.kv import KvGetIn
+
+    monkeypatch.setenv("MCP_HTTP_TOKEN_MAX_CONCURRENCY", "1")
+    http_app = importlib.reload(http_app)
+
+    def wait(args):
+        while True:
+            checkpoint()
+            time.sleep(0.01)
+
+    http_app.REGISTRY["wait"] = ToolSpec(
+        name="wait", description="waits", input_model=KvGetIn, handler=wait
+    )
+    client = TestClient(http_app.app)
+    replies = {}
+
+    def call():
+        replies["call"] = _post(client, "main-token", _call("wait", {"key": "k"}, id_="w1"),
+                                **{"X-Request-Timeout-Ms": "3000"})
+
+    caller = threading.Thread(target=call)
+    caller.start()
+    time.sleep(0.2)
+    # The token's only slot is taken: other requests are shed, the cancel is not
+    listing = {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+    assert _post(client, "main-token", listing).status_code == 429
+    start = time.monotonic()
+    note = {"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": "w1"}}
+    assert _post(client, "main-token", note).status_code == 202
+    caller.join(3)
+    assert replies["call"].json()["error"]["code"] == -32800
+    assert time.monotonic() - start < 1
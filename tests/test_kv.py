@@ -0,0 +1,114 @@
+# tests/test_kv.py
+import time
+
+import fakeredis
+
+from app.services.kvstore import KvService
+from app.services.nearcache import NearCacheConfig
+
+
+def _svc() -> KvService:
+    return KvService(client=fakeredis.FakeRedis(decode_responses=True))
+
+
+def test_put_get_roundtrip():
+    kv = _svc()
+    assert kv.put("a", "1", ttl_sec=60) == "OK"
+    assert kv.get("a") == "1"
+    assert kv.get("missing") is None
+
+
+def test_batch_mset_mget_delete():
+    kv = _svc()
+    kv.mset([("a", "1", None), ("b", "2", 30)])
+    assert kv.mget(["a", "b", "c"]) == {"a": "1", "b": "2", "c": None}
+    assert 0 < kv.backend._client.ttl("b") <= 30
+    assert kv.backend._client.ttl("a") == -1
+    assert kv.delete(["a", "c"]) == 1
+    assert kv.mget(["a", "b"]) == {"a": None, "b": "2"}
+
+
+def test_incr_sets_ttl_on_create_only():
+    kv = _svc()
+    assert kv.incr("hits", ttl_sec=60) == 1
+    kv.backend._client.expire("hits", 10)
+    assert kv.incr("hits", amount=4, ttl_sec=60) == 5
+    assert kv.backend._client.ttl("hits") <= 10
+    # An existing key whose value happens to equal `amount` afterwards keeps no TTL
+    kv.put("c", "0")
+    assert kv.incr("c", amount=5, ttl_sec=60) == 5
+    assert kv.backend._client.ttl("c") == -1
+
+
+def test_compare_and_set():
+    kv = _svc()
+    assert kv.compare_and_set("lock", None, "owner-1")["swapped"] is True
+    out = kv.compare_and_set("lock", None, "owner-2")
+    assert out == {"swapped": False, "current": "owner-1"}
+    assert kv.compare_and_set("lock", "owner-1", "owner-2", ttl_sec=5)["swapped"] is True
+    assert kv.get("lock") == "owner-2"
+
+
+def _cached(**overrides) -> KvService:
+    config = NearCacheConfig(**{"invalidation": "tracking", "fallback_ttl_sec": 30.0, **overrides})
+    return KvService(client=fakeredis.FakeRedis(decode_responses=True), near_cache=config)
+
+
+def test_near_cache_falls_back_to_ttl_and_serves_hits():
+    # fakeredis has no CLIENT TRACKING, so the cache must fall back to local TTLs
+    kv = _cached()
+    assert kv.cache_stats()["mode"] == "ttl"
+    kv.put("a", "1")
+    assert kv.get("a") == "1"
+    kv.backend._client.set("a", "changed-elsewhere")
+    assert kv.get("a") == "1"  # served locally within the fallback TTL
+    stats = kv.cache_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_near_cache_invalidates_on_own_writes():
+    kv = _cached()
+    kv.mset([("a", "1", None), ("b", "2", None)])
+    assert kv.mget(["a", "b", "a"]) == {"a": "1", "b": "2"}
+    kv.put("a", "3")
+    kv.delete(["b"])
+    assert kv.mget(["a", "b"]) == {"a": "3", "b": None}
+    kv.incr("n")
+    assert kv.get("n") == "1"
+    kv.incr("n")
+    assert kv.get("n") == "2"
+    assert kv.compare_and_set("a", "3", "4")["swapped"] is True
+    assert kv.get("a") == "4"
+
+
+def test_near_cache_never_outlives_redis_ttl():
+    kv = _cached()
+    kv.backend._client.set("short", "v", px=50)
+    assert kv.get("short") == "v"
+    time.sleep(0.08)
+    assert kv.get("short") is None
+
+
+def test_near_cache_is_bounded_and_applies_server_invalidations():
+    kv = _cached(max_entries=2)
+    kv.mset([("a", "1", None), ("b", "2", None), ("c", "3", None)])
+    kv.mget(["a", "b", "c"])
+    stats = kv.cache_stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+
+    near = kv.backend._near
+    kv.backend._client.set("c", "30")
+    near._on_message(["message", "__redis__:invalidate", ["c"]])
+    assert kv.get("c") == "30"
+    kv.backend._client.set("b", "20")
+    near._on_message(["message", "__redis__:invalidate", None])  # FLUSHDB
+    assert kv.get("b") == "20"
+
+
+def test_near_cache_skips_values_read_before_an_invalidation():
+    kv = _cached()
+    near = kv.backend._near
+    epoch = near.epoch()
+    near.invalidate(["k"], source="server")
+    near.store("k", "stale", -1, epoch)
+    assert near.lookup("k") == (False, None)
@@ -0,0 +1,107 @@
+# tests/test_kv_embedded.py
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services.kvembedded import EmbeddedKvBackend
+from app.services.kvstore import KvService
+
+
+def _svc(**kwargs) -> KvService:
+    return KvService(backend=EmbeddedKvBackend(tick_sec=0.01, **kwargs))
+
+
+def test_redis_string_semantics():
+    kv = _svc()
+    assert kv.put("a", "1", ttl_sec=60) == "OK"
+    assert kv.get("a") == "1"
+    assert kv.get("missing") is None
+    kv.mset([("a", "1", None), ("b", "2", 30)])
+    assert kv.backend.ttl("a") == -1  # plain SET clears the TTL
+    assert 0 < kv.backend.ttl("b") <= 30
+    assert kv.mget(["a", "b", "c"]) == {"a": "1", "b": "2", "c": None}
+    assert kv.delete(["a", "c"]) == 1
+    assert kv.incr("n", ttl_sec=60) == 1
+    assert kv.incr("n", amount=4) == 5
+    assert 0 < kv.backend.ttl("n") <= 60  # INCR keeps the TTL
+    kv.put("z", "0")
+    assert kv.incr("z", amount=5, ttl_sec=60) == 5
+    assert kv.backend.ttl("z") == -1  # existing key: no TTL added, same as Redis
+    kv.put("s", "abc")
+    with pytest.raises(ValueError):
+        kv.incr("s")
+    assert kv.compare_and_set("lock", None, "x")["swapped"] is True
+    assert kv.compare_and_set("lock", None, "y") == {"swapped": False, "current": "x"}
+    kv.close()
+
+
+def test_timer_wheel_expires_keys_without_access():
+    kv = _svc()
+    backend = kv.backend
+    backend._write(backend._shard("k"), "k", "v", time.monotonic() + 0.05)
+    assert backend.stats()["keys"] == 1
+    time.sleep(0.2)
+    assert backend.stats()["keys"] == 0
+    kv.close()
+
+
+def test_memory_cap_evicts_least_recently_used():
+    kv = _svc(shards=1, max_bytes=3 * (96 + 2 + 10))
+    for k in ("k1", "k2", "k3"):
+        kv.put(k, "x" * 10)
+    kv.get("k1")
+    kv.put("k4", "x" * 10)
+    assert kv.mget(["k1", "k2", "k3", "k4"]) == {
+        "k1": "x" * 10, "k2": None, "k3": "x" * 10, "k4": "x" * 10,
+    }
+    kv.close()
+
+
+def test_concurrent_increments_are_atomic():
+    kv = _svc(shards=4)
+
+    def worker():
+        for _ in range(500):
+            kv.incr("ctr")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert kv.get("ctr") == "4000"
+    kv.close()
+
+
+def test_aof_replay_restores_state(tmp_path: Path):
+    aof = tmp_path / ".kv" / "appendonly.aof"
+    kv = _svc(aof_path=aof, aof_fsync="always")
+    kv.mset([("a", "1", None), ("b", "2", None), ("short", "s", 1)])
+    kv.put("c", "3", ttl_sec=60)
+    kv.delete(["b"])
+    kv.incr("n", amount=7)
+    kv.close()
+    with open(aof, "ab") as f:
+        f.write(b'["set","torn"')  # crash mid-write
+
+    time.sleep(1.1)
+    kv = _svc(aof_path=aof)
+    assert kv.mget(["a", "b", "c", "n", "short", "torn"]) == {
+        "a": "1", "b": None, "c": "3", "n": "7", "short": None, "torn": None,
+    }
+    assert 0 < kv.backend.ttl("c") <= 60
+    kv.close()
+    # Startup compaction leaves one record per live key
+    assert len(aof.read_text().splitlines()) == 3
+
+
+def test_aof_is_locked_against_a_second_process(tmp_path: Path):
+    aof = tmp_path / ".kv" / "appendonly.aof"
+    kv = _svc(aof_path=aof)
+    # flock locks are per open file, so a second open in this process stands in for another one
+    with pytest.raises(RuntimeError, match="in use by another process"):
+        EmbeddedKvBackend(aof_path=aof)
+    kv.close()
+    _svc(aof_path=aof).close()  # released on close
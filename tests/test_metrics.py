@@ -0,0 +1,63 @@
+# tests/test_metrics.py
+import json
+from pathlib import Path
+
+import pytest
+from pydantic import BaseModel
+
+from app.metrics import METRICS, MetricsRegistry
+from server.registry import ToolSpec, dispatch_tool_call
+
+
+def test_render_counter_and_histogram():
+    reg = MetricsRegistry()
+    calls = reg.counter("demo_calls_total", "Calls", ("tool",))
+    latency = reg.histogram("demo_latency_seconds", "Latency", ("tool",), buckets=(0.1, 1.0))
+    calls.inc("fs_read")
+    calls.inc("fs_read")
+    latency.observe("fs_read", value=0.05)
+    latency.observe("fs_read", value=0.5)
+
+    text = reg.render()
+    assert 'demo_calls_total{tool="fs_read"} 2' in text
+    assert 'demo_latency_seconds_bucket{tool="fs_read",le="0.1"} 1' in text
+    assert 'demo_latency_seconds_bucket{tool="fs_read",le="+Inf"} 2' in text
+    assert 'demo_latency_seconds_count{tool="fs_read"} 2' in text
+
+
+def test_multiprocess_snapshots_are_merged(tmp_path: Path):
+    worker_a, worker_b = MetricsRegistry(), MetricsRegistry()
+    for reg, n in ((worker_a, 1), (worker_b, 2)):
+        reg.counter("demo_total", "Demo").inc(amount=n)
+        reg.gauge("demo_in_flight", "Demo").set(value=n)
+    # Another (exited) worker's snapshot next to ours
+    other = {"pid": 0, "metrics": worker_b.snapshot()}
+    (tmp_path / "metrics-0.json").write_text(json.dumps(other), encoding="utf-8")
+    worker_a.enable_multiprocess(tmp_path, flush_interval_sec=0)
+
+    text = worker_a.render()
+    assert "demo_total 3" in text
+    # Gauges from dead workers are dropped
+    assert "demo_in_flight 1" in text
+
+
+class EchoIn(BaseModel):
+    text: str
+
+
+def test_dispatch_records_calls_and_errors():
+    def boom(args: EchoIn) -> str:
+        raise RuntimeError(args.text)
+
+    registry = {
+        "echo": ToolSpec(name="echo", description="", input_model=EchoIn, handler=lambda a: a.text),
+        "boom": ToolSpec(name="boom", description="", input_model=EchoIn, handler=boom),
+    }
+    assert dispatch_tool_call(registry, "echo", {"text": "hi"}) == "hi"
+    with pytest.raises(RuntimeError):
+        dispatch_tool_call(registry, "boom", {"text": "x"})
+
+    text = METRICS.render()
+    assert 'mcp_tool_calls_total{tool="echo",outcome="ok"}' in text
+    assert 'mcp_tool_errors_total{tool="boom",code="-32603"}' in text
+    assert 'mcp_tool_calls_in_flight{tool="echo"} 0' in text
@@ -0,0 +1,64 @@
+# tests/test_profiling.py
+import time
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from app.profiling import RequestProfiler
+from app.services.artifacts import ArtifactService
+
+
+class NapIn(BaseModel):
+    ms: int
+
+
+def _nap(args: NapIn) -> str:
+    time.sleep(args.ms / 1000)
+    return "ok"
+
+
+def test_disabled_profiler_returns_no_profile(tmp_path: Path):
+    prof = RequestProfiler()
+    prof.configure(ArtifactService(sandbox_root=tmp_path))
+    assert prof.enabled is False
+    assert prof.begin("fs_read") is None
+
+
+def test_slow_call_is_written_as_artifact(tmp_path: Path):
+    artifacts = ArtifactService(sandbox_root=tmp_path)
+    prof = RequestProfiler()
+    prof.configure(artifacts, slow_ms=20, tag="profile:test")
+
+    fast = prof.begin("nap")
+    fast.mark("handler", 0.0)
+    prof.finish(fast)
+
+    slow = prof.begin("nap")
+    slow.start_cprofile()
+    _nap(NapIn(ms=30))
+    slow.stop_cprofile()
+    slow.mark("handler", 0.03)
+    prof.finish(slow)
+
+    out = artifacts.list("profile:test")
+    assert out["count"] == 1
+    record = out["records"][0]["content"]
+    assert record["reason"] == "slow"
+    assert record["total_ms"] >= 20
+    assert "handler" in record["phases_ms"]
+
+
+def test_sampled_call_includes_cprofile(tmp_path: Path):
+    artifacts = ArtifactService(sandbox_root=tmp_path)
+    prof = RequestProfiler()
+    prof.configure(artifacts, sample_rate=1.0, capture_cprofile=True, tag="profile:test")
+
+    profile = prof.begin("nap")
+    profile.start_cprofile()
+    _nap(NapIn(ms=1))
+    profile.stop_cprofile()
+    prof.finish(profile)
+
+    record = artifacts.list("profile:test")["records"][0]["content"]
+    assert record["reason"] == "sampled"
+    assert "_nap" in record["cprofile"]
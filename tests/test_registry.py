@@ -0,0 +1,143 @@
+# tests/test_registry.py
+import json
+import threading
+import time
+from dataclasses import replace
+from functools import partial
+
+import pytest
+from pydantic import BaseModel, Field, ValidationError
+
+from app.cancellation import CancelToken, checkpoint
+from server.registry import ToolSpec, build_call_adapter, dispatch_tool_call, run_pipeline
+from server.tools.pipeline import ToolPipelineIn
+
+
+class EchoIn(BaseModel):
+    text: str = Field(min_length=1)
+
+
+class AddIn(BaseModel):
+    a: int
+    b: int
+
+
+def _registry():
+    return {
+        "echo": ToolSpec(name="echo", description="echo", input_model=EchoIn,
+                         handler=lambda a: a.text),
+        "add": ToolSpec(name="add", description="add", input_model=AddIn,
+                        handler=lambda a: a.a + a.b),
+    }
+
+
+def test_spec_validates_dicts_raw_json_and_models():
+    spec = _registry()["add"]
+    assert spec.validate({"a": 1, "b": 2}) == AddIn(a=1, b=2)
+    assert spec.validate(b'{"a": 1, "b": 2}') == AddIn(a=1, b=2)
+    model = AddIn(a=3, b=4)
+    assert spec.validate(model) is model
+    assert spec.input_schema["required"] == ["a", "b"]
+
+
+def test_call_adapter_parses_arguments_into_tool_model():
+    registry = _registry()
+    adapter = build_call_adapter(registry)
+    body = json.dumps({"jsonrpc": "2.0", "id": "req-1", "method": "tools/call",
+                       "params": {"name": "add", "arguments": {"a": 2, "b": 5}}}).encode()
+    call = adapter.validate_json(body)
+    assert call.id == "req-1"
+    assert isinstance(call.params.arguments, AddIn)
+    assert dispatch_tool_call(registry, call.params.name, call.params.arguments) == 7
+
+
+@pytest.mark.parametrize("params", [
+    {"name": "nope", "arguments": {}},              # unknown tool
+    {"name": "echo", "arguments": {"text": ""}},    # invalid arguments
+    {"name": "add"},                                # missing arguments
+])
+def test_call_adapter_rejects_what_the_generic_path_must_report(params):
+    adapter = build_call_adapter(_registry())
+    body = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": params})
+    with pytest.raises(ValidationError):
+        adapter.validate_json(body)
+
+
+class WaitIn(BaseModel):
+    label: str
+
+
+def _pipeline_registry(barrier: threading.Barrier):
+    def fetch(args: WaitIn) -> dict:
+        barrier.wait(timeout=2)  # both branches must be running at once
+        return {"body": {"label": args.label, "size": len(args.label)}}
+
+    def fail(args: WaitIn) -> str:
+        raise ValueError("boom")
+
+    registry = _registry()
+    registry["fetch"] = ToolSpec(name="fetch", description="fetch", input_model=WaitIn,
+                                 handler=fetch)
+    registry["fail"] = ToolSpec(name="fail", description="fail", input_model=WaitIn, handler=fail)
+    registry["tool_pipeline"] = ToolSpec(name="tool_pipeline", description="dag",
+                                         input_model=ToolPipelineIn,
+                                         handler=partial(run_pipeline, registry))
+    return registry
+
+
+def test_pipeline_runs_branches_concurrently_and_passes_results_by_ref():
+    registry = _pipeline_registry(threading.Barrier(2))
+    result = dispatch_tool_call(registry, "tool_pipeline", {
+        "steps": [
+            {"id": "a", "tool": "fetch", "arguments": {"label": "left"}},
+            {"id": "b", "tool": "fetch", "arguments": {"label": "right!"}},
+            {"id": "sum", "tool": "add", "arguments": {"a": {"$ref": "a.body.size"},
+                                                       "b": {"$ref": "b.body.size"}}},
+            {"id": "echo", "tool": "echo", "arguments": {"text": {"$ref": "b.body.label"}}},
+        ],
+    })
+    # Only sinks are returned by default; intermediate bodies stay server-side
+    assert result == {"outputs": {"sum": 10, "echo": "right!"}}
+
+    picked = dispatch_tool_call(registry, "tool_pipeline", {
+        "steps": [{"id": "a", "tool": "fetch", "arguments": {"label": "x"}},
+                  {"id": "b", "tool": "fetch", "arguments": {"label": "y"}}],
+        "outputs": ["b.body.label"],
+    })
+    assert picked == {"outputs": {"b.body.label": "y"}}
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([{"id": "a", "tool": "nope"}], "unknown or unsupported tool"),
+    ([{"id": "a", "tool": "tool_pipeline", "arguments": {"steps": []}}],
+     "unknown or unsupported tool"),
+    ([{"id": "a", "tool": "echo", "arguments": {"text": {"$ref": "zz"}}}], "unknown steps"),
+    ([{"id": "a", "tool": "echo", "after": ["b"]},
+      {"id": "b", "tool": "echo", "after": ["a"]}], "cycle"),
+    ([{"id": "a", "tool": "fail", "arguments": {"label": "x"}}], "step 'a' (fail) failed: boom"),
+])
+def test_pipeline_rejects_bad_graphs_and_reports_failed_steps(steps, message):
+    registry = _pipeline_registry(threading.Barrier(1))
+    with pytest.raises(Exception) as exc:
+        dispatch_tool_call(registry, "tool_pipeline", {"steps": steps})
+    assert message in str(exc.value)
+
+
+def test_tool_timeout_applies_to_its_own_step_only():
+    def slow(args: WaitIn) -> str:
+        for _ in range(30):
+            checkpoint()
+            time.sleep(0.01)
+        return args.label
+
+    registry = _pipeline_registry(threading.Barrier(1))
+    registry["quick"] = replace(registry["echo"], name="quick", timeout_sec=0.1)
+    registry["slow"] = ToolSpec(name="slow", description="slow", input_model=WaitIn, handler=slow)
+    token = CancelToken()
+    assert dispatch_tool_call(registry, "quick", {"text": "hi"}, cancel=token) == "hi"
+    assert token.deadline is None
+    result = dispatch_tool_call(registry, "tool_pipeline", {
+        "steps": [{"id": "q", "tool": "quick", "arguments": {"text": "hi"}},
+                  {"id": "s", "tool": "slow", "after": ["q"], "arguments": {"label": "done"}}],
+    })
+    assert result == {"outputs": {"s": "done"}}
@@ -0,0 +1,64 @@
+# tests/test_stdio.py
+import asyncio
+import json
+import threading
+
+from pydantic import BaseModel
+
+from server.registry import ToolSpec
+from server.stdio import ConcurrentStdioServer
+
+
+class SleepIn(BaseModel):
+    label: str
+
+
+def _registry(release: threading.Event):
+    def slow(args: SleepIn) -> str:
+        release.wait(timeout=5)
+        return args.label
+
+    def fast(args: SleepIn) -> str:
+        return args.label
+
+    return {
+        "slow": ToolSpec(name="slow", description="blocks", input_model=SleepIn, handler=slow),
+        "fast": ToolSpec(name="fast", description="returns", input_model=SleepIn, handler=fast),
+    }
+
+
+def _call(id_, name):
+    msg = {"jsonrpc": "2.0", "id": id_, "method": "tools/call",
+           "params": {"name": name, "arguments": {"label": name}}}
+    return json.dumps(msg).encode() + b"\n"
+
+
+def test_slow_call_does_not_block_later_requests():
+    release = threading.Event()
+    server = ConcurrentStdioServer(_registry(release), max_concurrency=4)
+    lines = [_call(1, "slow"), _call(2, "fast")]
+    written = []
+
+    async def read_line() -> bytes:
+        if lines:
+            return lines.pop(0)
+        return b""
+
+    def write_line(data: bytes) -> None:
+        written.append(json.loads(data))
+        # The fast reply arrives while the slow call is still running
+        release.set()
+
+    asyncio.run(server.serve(read_line, write_line))
+
+    assert [r["id"] for r in written] == [2, 1]
+    assert written[1]["result"]["content"][0]["text"] == "slow"
+
+
+def test_unknown_tool_and_notification():
+    server = ConcurrentStdioServer({})
+    reply = asyncio.run(server.handle({"jsonrpc": "2.0", "id": 7, "method": "tools/call",
+                                       "params": {"name": "nope", "arguments": {}}}))
+    assert reply["error"]["code"] == -32601
+    initialized = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+    assert asyncio.run(server.handle(initialized)) is None
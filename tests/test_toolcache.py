@@ -0,0 +1,145 @@
+# tests/test_toolcache.py
+import threading
+import time
+
+import pytest
+from pydantic import BaseModel
+
+from app.toolcache import TOOL_CACHE, CachePolicy, ToolCache
+from server.registry import ToolSpec, dispatch_tool_call
+
+
+class PathIn(BaseModel):
+    path: str
+    opts: dict = {}
+
+
+def _counting(result="ok", gate: threading.Event | None = None):
+    calls = []
+
+    def handler(args: PathIn):
+        calls.append(args.path)
+        if gate is not None:
+            gate.wait(timeout=5)
+        return f"{result}:{args.path}"
+
+    return handler, calls
+
+
+def test_concurrent_identical_calls_run_once():
+    cache = ToolCache()
+    gate = threading.Event()
+    handler, calls = _counting(gate=gate)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            cache.call("read", CachePolicy(), PathIn(path="a"), handler)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert calls == ["a"]
+    assert results == ["ok:a"] * 5
+
+
+def test_errors_reach_followers_and_are_not_memoized():
+    cache = ToolCache()
+    cache.configure(max_bytes=1_000)
+    attempts = []
+
+    def boom(args: PathIn):
+        attempts.append(1)
+        raise RuntimeError("nope")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            cache.call("read", CachePolicy(ttl_sec=60), PathIn(path="a"), boom)
+    assert len(attempts) == 2
+
+
+def test_memo_ttl_and_canonical_keys():
+    cache = ToolCache()
+    cache.configure(max_bytes=10_000)
+    handler, calls = _counting()
+    policy = CachePolicy(ttl_sec=0.05)
+    cache.call("read", policy, PathIn(path="a", opts={"x": 1, "y": 2}), handler)
+    cache.call("read", policy, PathIn(path="a", opts={"y": 2, "x": 1}), handler)
+    assert calls == ["a"]
+    time.sleep(0.08)
+    cache.call("read", policy, PathIn(path="a", opts={"x": 1, "y": 2}), handler)
+    assert calls == ["a", "a"]
+
+
+def test_memo_is_byte_bounded_lru():
+    cache = ToolCache()
+    cache.configure(max_bytes=2 * (64 + 6))  # two "ok:pN" results
+    handler, calls = _counting()
+    policy = CachePolicy(ttl_sec=60)
+    for path in ("p1", "p2", "p1", "p3", "p1", "p2"):
+        cache.call("read", policy, PathIn(path=path), handler)
+    # p2 was least recently used when p3 arrived
+    assert calls == ["p1", "p2", "p3", "p2"]
+    assert cache.stats()["entries"] == 2
+
+
+def test_invalidation_drops_memo_and_detaches_in_flight_calls():
+    cache = ToolCache()
+    cache.configure(max_bytes=10_000)
+    policy = CachePolicy(ttl_sec=60, tags=lambda a: ["fs:" + a.path])
+    handler, calls = _counting()
+    cache.call("read", policy, PathIn(path="a"), handler)
+    cache.invalidate(["fs:b"])
+    cache.call("read", policy, PathIn(path="a"), handler)
+    assert calls == ["a"]
+    cache.invalidate(["fs:a"])
+    cache.call("read", policy, PathIn(path="a"), handler)
+    assert calls == ["a", "a"]
+
+    # A read already running when the write lands must not serve later callers
+    gate = threading.Event()
+    slow, slow_calls = _counting("old", gate=gate)
+    t = threading.Thread(target=cache.call, args=("read", policy, PathIn(path="c"), slow))
+    t.start()
+    time.sleep(0.05)
+    cache.invalidate(["fs:c"])
+    fresh, fresh_calls = _counting("new")
+    assert cache.call("read", policy, PathIn(path="c"), fresh) == "new:c"
+    gate.set()
+    t.join()
+    assert cache.call("read", policy, PathIn(path="c"), fresh) == "new:c"
+    assert fresh_calls == ["c"]
+
+
+def test_dispatch_write_invalidates_read():
+    TOOL_CACHE.configure(max_bytes=10_000)
+    store = {"a": "v1"}
+
+    def tags(a):
+        return ["fs:" + a.path]
+
+    class WriteIn(BaseModel):
+        path: str
+        content: str
+
+    def write(args: WriteIn):
+        store[args.path] = args.content
+        return "OK"
+
+    registry = {
+        "read": ToolSpec(name="read", description="", input_model=PathIn,
+                         handler=lambda a: store[a.path], cache=CachePolicy(ttl_sec=60, tags=tags)),
+        "write": ToolSpec(name="write", description="", input_model=WriteIn,
+                          handler=write, invalidates=tags),
+    }
+    try:
+        assert dispatch_tool_call(registry, "read", {"path": "a"}) == "v1"
+        store["a"] = "changed-behind-our-back"
+        assert dispatch_tool_call(registry, "read", {"path": "a"}) == "v1"
+        dispatch_tool_call(registry, "write", {"path": "a", "content": "v2"})
+        assert dispatch_tool_call(registry, "read", {"path": "a"}) == "v2"
+    finally:
+        TOOL_CACHE.configure()